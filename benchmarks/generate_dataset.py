@@ -0,0 +1,202 @@
+"""Write a synthetic AppData tree for benchmarking.
+
+Usage:
+    python -m benchmarks.generate_dataset --appdata /tmp/bench --students 10000 --groups 300
+
+The tree has the same layout as the real one (``<appdata>/DanceSchool/data``
+and ``<appdata>/DanceSchool/attendances``), so point LOCALAPPDATA at it to
+run the app or the benchmarks against it.
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from utils.payment_utils import HEBREW_WEEKDAYS
+
+DAYS_OF_WEEK = ["ראשון", "שני", "שלישי", "רביעי", "חמישי", "שישי"]
+FIRST_NAMES = ["נועה", "מאיה", "תמר", "שירה", "יעל", "אביגיל", "רוני", "הילה", "ליה", "אורי", "מיכל", "שקד"]
+LAST_NAMES = ["כהן", "לוי", "מזרחי", "פרץ", "ביטון", "דהן", "אברהם", "פרידמן", "שפירא", "גולן"]
+STYLES = ["בלט", "היפ הופ", "ג'אז", "מודרני", "אקרובטיקה"]
+LOCATIONS = ["סטודיו 1", "סטודיו 2", "אולם גדול", "מתנ\"ס"]
+PAYMENT_METHODS = ["מזומן", "צ'ק", "העברה בנקאית", "אשראי"]
+PAYMENT_STATUSES = ["שולם", "שולם חלקית", "חוב"]
+
+
+def _fmt(date):
+    return date.strftime("%d/%m/%Y")
+
+
+def _phone(rng):
+    return "05" + "".join(str(rng.randint(0, 9)) for _ in range(8))
+
+
+def generate_groups(rng, count, today, years):
+    """Groups spread over the last `years` years, most of them with an end date"""
+    groups = []
+    for group_id in range(1, count + 1):
+        start = today - timedelta(days=rng.randint(0, 365 * years))
+        end = start + timedelta(days=rng.randint(120, 400)) if rng.random() < 0.8 else None
+        groups.append({
+            "id": group_id,
+            "name": f"{rng.choice(STYLES)} {group_id}",
+            "location": rng.choice(LOCATIONS),
+            "price": 180,
+            "age_group": f"{rng.randint(4, 12)}-{rng.randint(13, 18)}",
+            "teacher": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "group_start_date": _fmt(start),
+            "group_end_date": _fmt(end) if end else "",
+            "day_of_week": rng.choice(DAYS_OF_WEEK),
+            "teacher_phone": _phone(rng),
+            "teacher_email": f"teacher{group_id}@example.com",
+        })
+    return groups
+
+
+def generate_students(rng, count, groups, payments_per_student, today):
+    """Students with 1-3 groups each, sisters sharing a last name and phone, and payment histories"""
+    students = []
+    joining_dates = {}
+    sister_of = None
+
+    for index in range(count):
+        student_id = str(200000000 + index)
+        if sister_of is not None and rng.random() < 0.5:
+            last_name, phone = sister_of["name"].split(" ", 1)[1], sister_of["phone"]
+            sister_of["has_sister"] = True
+            has_sister = True
+            sister_of = None
+        else:
+            last_name, phone = rng.choice(LAST_NAMES), _phone(rng)
+            has_sister = False
+
+        student_groups = rng.sample(groups, rng.choice([1, 1, 1, 2, 2, 3]))
+        payments = []
+        for _ in range(max(0, int(rng.gauss(payments_per_student, payments_per_student / 4)))):
+            payment = {
+                "amount": str(rng.choice([90, 160, 180, 280, 360, 500, 1000])),
+                "date": _fmt(today - timedelta(days=rng.randint(0, 365 * 2))),
+                "payment_method": rng.choice(PAYMENT_METHODS),
+            }
+            if payment["payment_method"] == "צ'ק":
+                payment["check_number"] = str(rng.randint(1000, 99999))
+            if rng.random() < 0.1:
+                payment["note"] = "תשלום עבור " + rng.choice(["ספטמבר", "אוקטובר", "מופע סוף שנה", "תחפושת"])
+            payments.append(payment)
+
+        student = {
+            "id": student_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {last_name}",
+            "phone": phone,
+            "groups": [g["name"] for g in student_groups],
+            "payment_status": rng.choice(PAYMENT_STATUSES),
+            "join_date": "",
+            "has_sister": has_sister,
+            "payments": payments,
+        }
+
+        join_dates = []
+        for group in student_groups:
+            group_start = datetime.strptime(group["group_start_date"], "%d/%m/%Y")
+            join_date = group_start + timedelta(days=rng.randint(-14, 90))
+            join_dates.append(join_date)
+            joining_dates.setdefault(str(group["id"]), []).append({
+                "student_id": student_id,
+                "student_name": student["name"],
+                "join_date": _fmt(join_date),
+            })
+        student["join_date"] = _fmt(min(join_dates))
+
+        students.append(student)
+        if not has_sister and rng.random() < 0.3:
+            sister_of = student
+
+    return students, joining_dates
+
+
+def generate_attendance(rng, groups, joining_dates, today, attendance_rate):
+    """Weekly attendance per group from its start date until its end date (or today)"""
+    attendance = {}
+    for group in groups:
+        start = datetime.strptime(group["group_start_date"], "%d/%m/%Y")
+        end = datetime.strptime(group["group_end_date"], "%d/%m/%Y") if group["group_end_date"] else today
+        end = min(end, today)
+        members = joining_dates.get(str(group["id"]), [])
+
+        date = start + timedelta(days=(HEBREW_WEEKDAYS[group["day_of_week"]] - start.weekday()) % 7)
+        group_attendance = {}
+        while date <= end:
+            group_attendance[_fmt(date)] = {
+                member["student_id"]: rng.random() < attendance_rate
+                for member in members
+            }
+            date += timedelta(days=7)
+        attendance[group["id"]] = group_attendance
+    return attendance
+
+
+def write_dataset(appdata, students=10000, groups=300, years=5, payments_per_student=20,
+                  attendance_rate=0.85, seed=1, int_ids=0.0):
+    """Generate a dataset and write it under `appdata`/DanceSchool; returns its sizes.
+
+    `int_ids` is the share of students whose id is stored in students.json as
+    an int, like older data files (join records and attendance keep text ids).
+    """
+    rng = random.Random(seed)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    group_records = generate_groups(rng, groups, today, years)
+    student_records, joining_dates = generate_students(rng, students, group_records, payments_per_student, today)
+    attendance = generate_attendance(rng, group_records, joining_dates, today, attendance_rate)
+    for student in student_records:
+        if rng.random() < int_ids:
+            student["id"] = int(student["id"])
+
+    base = Path(appdata) / "DanceSchool"
+    data_dir = base / "data"
+    attendances_dir = base / "attendances"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    attendances_dir.mkdir(parents=True, exist_ok=True)
+
+    def dump(path, data, indent=2):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+
+    dump(data_dir / "students.json", {"students": student_records}, indent=4)
+    dump(data_dir / "groups.json", {"groups": group_records})
+    dump(data_dir / "joining_dates.json", joining_dates)
+    dump(data_dir / "pricing.json", {"single": 180, "two": 280, "three": 360, "sister": 20})
+    for group_id, group_attendance in attendance.items():
+        dump(attendances_dir / f"attendance_{group_id}.json", group_attendance)
+
+    for stale in ("payments_ledger.jsonl", "payment_status_cache.json", "rollups.json"):
+        (data_dir / stale).unlink(missing_ok=True)
+
+    return {
+        "students": len(student_records),
+        "groups": len(group_records),
+        "payments": sum(len(s["payments"]) for s in student_records),
+        "attendance_records": sum(len(day) for g in attendance.values() for day in g.values()),
+        "seed": seed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic DanceSchool AppData tree")
+    parser.add_argument("--appdata", required=True, help="Folder to use as LOCALAPPDATA")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--groups", type=int, default=300)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--payments", type=int, default=20, help="Average payments per student")
+    parser.add_argument("--attendance-rate", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--int-ids", type=float, default=0.0, help="Share of student ids stored as ints (legacy data)")
+    args = parser.parse_args(argv)
+
+    sizes = write_dataset(args.appdata, args.students, args.groups, args.years,
+                          args.payments, args.attendance_rate, args.seed, args.int_ids)
+    print(json.dumps(sizes, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Time the data and payment layers against an AppData tree.
+
+Usage:
+    python -m benchmarks.generate_dataset --appdata /tmp/bench
+    python -m benchmarks.run_benchmarks --appdata /tmp/bench
+
+Each benchmark is run once "cold" (fresh DataStore, files parsed from disk)
+and then ``--repeat`` times warm. Results are written as JSON to
+``benchmarks/results/<timestamp>.json`` (or ``--output``) so runs can be
+compared over time.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+SEARCH_QUERIES = ["כהן", "2000012", "050", "בלט 1", "לא קיים"]
+
+
+def _timed(func):
+    # The data layer reports problems with print(); keep them out of the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+
+class BenchmarkRunner:
+    """Runs the registered benchmarks and collects their timings"""
+
+    def __init__(self, repeat=5, sample_size=200, seed=1):
+        from utils.data_store import DataStore
+
+        self.DataStore = DataStore
+        self.repeat = repeat
+        self.sample_size = sample_size
+        self.rng = random.Random(seed)
+        self.results = {}
+
+        store = DataStore.instance()
+        students = store.load_students()
+        groups = store.load_groups()
+        self.student_ids = [s["id"] for s in self.rng.sample(students, min(sample_size, len(students)))]
+        self.group_names = [g["name"] for g in self.rng.sample(groups, min(20, len(groups)))]
+        self.group_ids = [g["id"] for g in self.rng.sample(groups, min(sample_size, len(groups)))]
+        self.dataset = {
+            "students": len(students),
+            "groups": len(groups),
+            "payments": sum(len(s.get("payments", [])) for s in students),
+        }
+
+    def run(self, name, func, setup=None):
+        """Time `func` once cold and `repeat` times warm; `setup` runs untimed before each call"""
+        self.DataStore.reset()
+        if setup:
+            setup()
+        cold = _timed(func)
+
+        warm = []
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            warm.append(_timed(func))
+
+        self.results[name] = {
+            "cold_ms": round(cold * 1000, 3),
+            "warm_min_ms": round(min(warm) * 1000, 3),
+            "warm_median_ms": round(statistics.median(warm) * 1000, 3),
+            "warm_max_ms": round(max(warm) * 1000, 3),
+            "runs": self.repeat,
+        }
+        print(f"{name:<55} cold {cold * 1000:>10.1f} ms   warm median "
+              f"{statistics.median(warm) * 1000:>10.1f} ms")
+        return self.results[name]
+
+    def run_all(self, only=None):
+        from utils.dashboard_data import get_all_dashboard_data
+        from utils.students_data_manager import StudentsDataManager
+        from utils.payment_utils import PaymentCalculator
+        from utils.attendance_utils import AttendanceUtils
+        from utils.forecast import ReceivablesForecast
+
+        def dashboard():
+            get_all_dashboard_data()
+
+        def students_by_group():
+            manager = StudentsDataManager()
+            for group_name in self.group_names:
+                manager.get_students_by_group(group_name)
+
+        def drop_status_cache():
+            cache_file = self.DataStore.instance().data_dir / "payment_status_cache.json"
+            cache_file.unlink(missing_ok=True)
+            self.DataStore.reset()
+
+        def payment_summary():
+            PaymentCalculator().get_all_students_payment_summary()
+
+        def filter_students():
+            manager = StudentsDataManager()
+            students = manager.get_all_students()
+            for query in SEARCH_QUERIES:
+                manager.filter_students(students, query)
+
+        def discount_periods():
+            calculator = PaymentCalculator()
+            for student_id in self.student_ids:
+                calculator.create_discount_periods_for_student(student_id)
+
+        def attendance_stats():
+            manager = StudentsDataManager()
+            groups_by_id = self.DataStore.instance().groups_by_id()
+            for group_id in self.group_ids:
+                group_name = groups_by_id[group_id]["name"]
+                students = [s for s in manager.get_all_students() if group_name in s.get("groups", [])]
+                attendance = AttendanceUtils.load_attendance_matrix(str(group_id))
+                AttendanceUtils.calculate_attendance_stats(attendance, students)
+
+        def receivables_forecast():
+            ReceivablesForecast().project()
+
+        benchmarks = [
+            ("get_all_dashboard_data", dashboard, None),
+            (f"get_students_by_group x{len(self.group_names)} (status cache cold)", students_by_group, drop_status_cache),
+            (f"get_students_by_group x{len(self.group_names)} (status cache warm)", students_by_group, None),
+            ("get_all_students_payment_summary", payment_summary, None),
+            (f"filter_students x{len(SEARCH_QUERIES)}", filter_students, None),
+            (f"create_discount_periods_for_student x{len(self.student_ids)}", discount_periods, None),
+            (f"calculate_attendance_stats x{len(self.group_ids)}", attendance_stats, None),
+            ("ReceivablesForecast.project", receivables_forecast, None),
+        ]
+        for name, func, setup in benchmarks:
+            if only and not any(part in name for part in only):
+                continue
+            self.run(name, func, setup)
+        return self.results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DanceSchool data and payment layers")
+    parser.add_argument("--appdata", help="Folder to use as LOCALAPPDATA (defaults to the current one)")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm runs per benchmark")
+    parser.add_argument("--sample", type=int, default=200, help="Students/groups sampled by per-item benchmarks")
+    parser.add_argument("--only", nargs="*", help="Run only benchmarks whose name contains one of these")
+    parser.add_argument("--output", help="Results file (defaults to benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--label", default="", help="Free text stored with the results, e.g. a commit id")
+    args = parser.parse_args(argv)
+
+    if args.appdata:
+        os.environ["LOCALAPPDATA"] = str(Path(args.appdata).resolve())
+    if not os.getenv("LOCALAPPDATA"):
+        parser.error("LOCALAPPDATA is not set; pass --appdata")
+
+    runner = BenchmarkRunner(repeat=args.repeat, sample_size=args.sample)
+    results = runner.run_all(args.only)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "label": args.label,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "dataset": runner.dataset,
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from datetime import datetime
 import flet as ft
-import json
-from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
+from utils.data_events import GROUPS_CHANGED, REMOVED, UPDATED, DataChange
 
 class GroupDialogs:
     @staticmethod
@@ -204,14 +204,7 @@ class GroupDialogs:
         def check_group_name_exists(new_name, current_name):
             """Check if group name already exists (excluding current group)"""
             try:
-                data_dir = ManageJSON.get_appdata_path() / "data"
-                data_dir.mkdir(parents=True, exist_ok=True)
-                groups_file = data_dir / "groups.json"
-                
-                with open(groups_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                existing_groups = data.get("groups", [])
+                existing_groups = DataStore.instance().load_groups()
                 return any(g.get('name', '').strip().lower() == new_name.lower() 
                           for g in existing_groups 
                           if g.get('name', '').strip().lower() != current_name.lower())
@@ -249,19 +242,13 @@ class GroupDialogs:
                     show_error_dialog("קבוצה בשם זה כבר קיימת במערכת")
                     return
                 
-                data_dir = ManageJSON.get_appdata_path() / "data"
-                data_dir.mkdir(parents=True, exist_ok=True)
-                groups_file = data_dir / "groups.json"
-                
-                with open(groups_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                store = DataStore.instance()
+                data = store.read(store.groups_file, {}, copy=True)
                 
                 groups = data.get("groups", [])
-                old_group_name = None
                 
                 for i, g in enumerate(groups):
                     if g.get("id") == group.get("id") or g.get("name") == group.get("name"):
-                        old_group_name = g.get("name")
                         updated_group = {
                             "id": g.get("id", group.get("id")),
                             "name": new_group_name,
@@ -279,36 +266,10 @@ class GroupDialogs:
                         groups[i] = updated_group
                         break
                 
-                with open(groups_file, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                
-                if old_group_name and old_group_name != new_group_name:
-                    try:
-                        students_file = data_dir / "students.json"
-                        if students_file.exists():
-                            with open(students_file, "r", encoding="utf-8") as f:
-                                students_data = json.load(f)
-                            
-                            students_updated = False
-                            for student in students_data.get("students", []):
-                                student_groups = student.get("groups", [])
-                                
-                                if isinstance(student_groups, list):
-                                    for j, group_name in enumerate(student_groups):
-                                        if group_name.strip() == old_group_name.strip():
-                                            student_groups[j] = new_group_name
-                                            students_updated = True
-                                elif isinstance(student_groups, str):
-                                    if student_groups.strip() == old_group_name.strip():
-                                        student["groups"] = new_group_name
-                                        students_updated = True
-                            
-                            if students_updated:
-                                with open(students_file, "w", encoding="utf-8") as f:
-                                    json.dump(students_data, f, ensure_ascii=False, indent=2)
-                            
-                    except Exception as students_ex:
-                        print(f"⚠️ Error in update: {str(students_ex)}")
+                # Students reference groups by id, so a rename only rewrites groups.json
+                store.migrate_enrollments()
+                store.write(store.groups_file, data, indent=2,
+                            change=DataChange(GROUPS_CHANGED, UPDATED, group_ids=[group.get("id")]))
                 
                 page.close(edit_dialog)
                 on_success_callback("הקבוצה עודכנה בהצלחה")
@@ -595,19 +556,16 @@ class GroupDialogs:
         
         def delete_group(e):
             try:
-                data_dir = ManageJSON.get_appdata_path() / "data"
-                data_dir.mkdir(parents=True, exist_ok=True)
-                groups_file = data_dir / "groups.json"
-                
-                with open(groups_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                store = DataStore.instance()
+                data = store.read(store.groups_file, {}, copy=True)
                 
                 groups = data.get("groups", [])
+                removed_ids = [g.get("id") for g in groups if g["name"] == group["name"]]
                 groups = [g for g in groups if g["name"] != group["name"]]
                 data["groups"] = groups
                 
-                with open(groups_file, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                store.write(store.groups_file, data, indent=2,
+                            change=DataChange(GROUPS_CHANGED, REMOVED, group_ids=removed_ids))
                 
                 page.close(delete_dialog)
                 
@@ -1,13 +1,34 @@
 import flet as ft
 from typing import List, Dict, Any
-from utils.payment_utils import PaymentCalculator
+from utils.data_store import DataStore
+from utils.payment_status_engine import PaymentStatusEngine
+from utils.payment_totals import PaymentTotals
 
 class StudentsTable:
-    """Students table component"""
+    """Students table component.
+
+    Rows live in an ``ft.ListView`` and are built a page at a time: the
+    first page when the students are set, the next ones as the list is
+    scrolled near its end. Payment summaries are fetched per page, so
+    students that never scroll into view are never priced.
+    """
+
+    PAGE_SIZE = 40
+    LOAD_MORE_THRESHOLD = 600
 
     def __init__(self):
-        self.table_container = ft.Column(controls=[], spacing=0, scroll=ft.ScrollMode.AUTO)
-        self.payment_calculator = PaymentCalculator()
+        self.list_view = ft.ListView(
+            controls=[],
+            spacing=0,
+            expand=True,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=50,
+        )
+        self.store = DataStore.instance()
+        self.status_engine = PaymentStatusEngine()
+        self.students = []
+        self.rendered_count = 0
+        self._summaries = {}
 
     def create_header(self) -> ft.Container:
         """Create table header row"""
@@ -72,10 +93,9 @@ class StudentsTable:
         """Create a table row for a student"""
         row_color =  ft.Colors.WHITE
         student_id = student.get("id") 
-        payment_status = student.get("payment_status", "")
-        amount = self.calculate_total_paid_advanced(student.get("payments", []))
+        summary = self._summaries.get(student_id) or self.status_engine.compute(student)
         payment_color, payment_bg, payment_icon, display_text = self._get_payment_style(
-            payment_status, amount, student.get('groups', []), student.get("join_date"), student_id
+            summary, student.get("payment_status", "")
         )
 
         cell_style = {
@@ -179,81 +199,74 @@ class StudentsTable:
             border=ft.border.only(bottom=ft.BorderSide(1, ft.Colors.with_opacity(0.1, ft.Colors.GREY_400))),
         )
 
-    def _get_payment_style(self, payment_status: str, amount, student_groups, join_date, student_id=None):
+    def _get_payment_style(self, summary: Dict[str, Any], payment_status: str = ""):
         """Get payment status styling"""
-        try:
-            if student_id:
-                total_owed_until_now = self.payment_calculator.get_student_payment_amount_until_now(student_id)
-            else:
-                total_owed_until_now = 0
-                for group_name in student_groups:
-                    group_id = self.payment_calculator.get_group_id_by_name(group_name)
-                    if group_id:
-                        actual_join_date = self.payment_calculator.get_student_join_date_for_group(student_id, group_id) if student_id else join_date
-                        if actual_join_date:
-                            total_owed_until_now += self.payment_calculator.get_payment_amount_until_now(group_id, actual_join_date)
-        except Exception:
-            total_owed_until_now = 0
-
-        try:
-            paid_amount = float(amount) if amount is not None else 0.0
-        except Exception:
-            paid_amount = 0.0
+        status = summary.get("status")
 
-        total_course_payment = 0
-        try:
-            groups_with_dates = self.payment_calculator.get_student_groups_with_join_dates(student_id)
-            latest_end_date = None
-            for g in groups_with_dates:
-                end = g.get("end_date")
-                if end:
-                    try:
-                        from datetime import datetime
-                        dt = datetime.strptime(end, "%d/%m/%Y")
-                        if latest_end_date is None or dt > latest_end_date:
-                            latest_end_date = dt
-                    except Exception:
-                        continue
-
-            if latest_end_date:
-                periods = self.payment_calculator.create_discount_periods_for_student(student_id, latest_end_date)
-                for period in periods:
-                    pr = self.payment_calculator.calculate_period_payment_with_discount_rules(student_id, period)
-                    if pr.get("success"):
-                        total_course_payment += pr.get("total_payment", 0)
-        except Exception:
-            total_course_payment = 0
-
-        if total_owed_until_now > 0:
-            if total_course_payment > 0 and paid_amount >= total_course_payment:
-                if paid_amount == total_course_payment:
-                    return ft.Colors.GREEN_600, ft.Colors.with_opacity(0.1, ft.Colors.GREEN_600), ft.Icons.CHECK_CIRCLE, "שולם במלואו"
-                else:
-                    return ft.Colors.GREEN_600, ft.Colors.with_opacity(0.1, ft.Colors.GREEN_600), ft.Icons.CHECK_CIRCLE, "שילם יותר (זיכוי)"
+        if summary.get("owed_until_now", 0) > 0:
+            if status in ("שולם במלואו", "שילם יותר (זיכוי)"):
+                return ft.Colors.GREEN_600, ft.Colors.with_opacity(0.1, ft.Colors.GREEN_600), ft.Icons.CHECK_CIRCLE, status
+            elif status == "שולם חלקית":
+                return ft.Colors.ORANGE_600, ft.Colors.with_opacity(0.1, ft.Colors.ORANGE_600), ft.Icons.PENDING, status
             else:
-                if paid_amount == total_owed_until_now:
-                    return ft.Colors.ORANGE_600, ft.Colors.with_opacity(0.1, ft.Colors.ORANGE_600), ft.Icons.PENDING, "שולם חלקית"
-                elif paid_amount > total_owed_until_now:
-                    return ft.Colors.ORANGE_600, ft.Colors.with_opacity(0.1, ft.Colors.ORANGE_600), ft.Icons.PENDING, "שולם חלקית"
-                else:
-                    return ft.Colors.RED_600, ft.Colors.with_opacity(0.1, ft.Colors.RED_600), ft.Icons.ERROR, "חוב"
+                return ft.Colors.RED_600, ft.Colors.with_opacity(0.1, ft.Colors.RED_600), ft.Icons.ERROR, "חוב"
         else:
             display = payment_status or "אין מידע"
             return ft.Colors.GREY_600, ft.Colors.with_opacity(0.1, ft.Colors.GREY_600), ft.Icons.HELP, display
 
+    def refresh_summaries(self, students: List[Dict[str, Any]]):
+        """Get payment summaries for some students, recomputing only stale ones"""
+        self._summaries.update(self.store.payment_status_cache().summaries(students))
+        return self._summaries
+
+    def _append_page(self) -> bool:
+        """Build the rows of the next page of students; returns False when all rows exist"""
+        page_students = self.students[self.rendered_count:self.rendered_count + self.PAGE_SIZE]
+        if not page_students:
+            return False
+
+        self.refresh_summaries(page_students)
+        for offset, student in enumerate(page_students):
+            self.list_view.controls.append(self.create_row(student, self.rendered_count + offset))
+        self.rendered_count += len(page_students)
+        return True
+
+    def _on_scroll(self, e):
+        """Build the next page when the list is scrolled close to its end"""
+        if self.rendered_count >= len(self.students):
+            return
+        if e.max_scroll_extent is None or e.pixels < e.max_scroll_extent - self.LOAD_MORE_THRESHOLD:
+            return
+        if self._append_page():
+            self.list_view.update()
 
     def update(self, students: List[Dict[str, Any]]):
-        """Update table with students data"""
-        self.table_container.controls = [self.create_header()]
+        """Show a new list of students, building only the first page of rows"""
+        self.students = students or []
+        self.rendered_count = 0
+        self._summaries = {}
+        self.list_view.controls = []
+        self._append_page()
+
+    def patch_rows(self, students: List[Dict[str, Any]], student_ids):
+        """Rebuild only the rendered rows of some students (same list order, updated records)"""
+        self.students = students or []
+        student_ids = {str(student_id) for student_id in student_ids}
+        for student_id in list(self._summaries):
+            if str(student_id) in student_ids:
+                del self._summaries[student_id]
 
-        if students:
-            for index, student in enumerate(students):
-                self.table_container.controls.append(self.create_row(student, index))
+        positions = [i for i, student in enumerate(self.students[:self.rendered_count])
+                     if str(student.get("id")) in student_ids]
+        self.refresh_summaries([self.students[i] for i in positions])
+        for i in positions:
+            self.list_view.controls[i] = self.create_row(self.students[i], i)
+        return positions
 
     def get_container(self) -> ft.Container:
         """Get the table container"""
         return ft.Container(
-            content=ft.Column([self.table_container], scroll=ft.ScrollMode.AUTO),
+            content=ft.Column([self.create_header(), self.list_view], spacing=0, expand=True),
             bgcolor=ft.Colors.WHITE,
             border_radius=12,
             border=ft.border.all(1, ft.Colors.with_opacity(0.1, ft.Colors.GREY_400)),
@@ -263,21 +276,7 @@ class StudentsTable:
     
 
     def calculate_total_paid_advanced(self, payments_array):
-        total_paid = 0.0
-        
         if not payments_array or not isinstance(payments_array, list):
             return 0.0
-        
-        for payment in payments_array:
-            if isinstance(payment, dict) and 'amount' in payment:
-                amount_str = payment.get('amount', '0')
-                
-                try:
-                    clean_amount = str(amount_str).replace(',', '.')
-                    amount = float(clean_amount)
-                    total_paid += amount
-                except (ValueError, TypeError):
-                    continue
-        
-        return total_paid
+        return PaymentTotals.of_payments(payments_array).paid
 
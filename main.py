@@ -1,13 +1,13 @@
+from utils.startup_timer import startup_timer
 import flet as ft
 import os
 from typing import Optional
-import os
-import json
-from pages.choose_group_attendance_page import AttendancePage
-from pages.groups_page import GroupsPage  
-from pages.students_list import StudentsListPage
-from pages.payment_page import PaymentPage
-from utils.dashboard_data import get_all_dashboard_data
+from utils.data_store import DataStore
+from utils.atomic_io import atomic_write_json
+from utils.background_tasks import BackgroundTasks
+from utils.data_events import ALL_TOPICS, GROUPS_CHANGED, PAYMENTS_CHANGED, PRICING_CHANGED, STUDENTS_CHANGED
+
+startup_timer.mark("imports")
 
 def ensure_pricing_file():
     base_dir = os.path.join(os.environ["LOCALAPPDATA"], "DanceSchool", "data")
@@ -17,8 +17,7 @@ def ensure_pricing_file():
 
     if not os.path.exists(pricing_file):
         default_data = {"single": 180, "two": 280, "three": 360, "sister": 20}
-        with open(pricing_file, "w", encoding="utf-8") as f:
-            json.dump(default_data, f, indent=4)
+        atomic_write_json(pricing_file, default_data, indent=4)
 
     return pricing_file
 
@@ -27,6 +26,17 @@ def format_currency(amount):
 
 
 class MainApp:
+    # Data each sidebar page shows; a cached page is rebuilt only after one of these changed.
+    # The groups and students pages subscribe to changes themselves and patch their own cards/rows.
+    PAGE_DEPENDENCIES = {
+        0: ALL_TOPICS,
+        1: (),
+        2: (GROUPS_CHANGED,),
+        3: (STUDENTS_CHANGED, PAYMENTS_CHANGED, GROUPS_CHANGED),
+        4: (),
+        5: (PRICING_CHANGED,),
+    }
+
     def __init__(self, page: ft.Page):
         self.page = page
         self.page.title = "זה הריקוד שלך"
@@ -39,18 +49,24 @@ class MainApp:
         self.page.fonts = {
             "Segoe UI": "fonts/SegoeUI.ttf" if os.path.exists("fonts/SegoeUI.ttf") else None
         }
-        self.dashboard_data = get_all_dashboard_data()
+        self.dashboard_data = None
+        self.dashboard_texts = {}
         self.current_page_index = 0
         self.sidebar_buttons = []
         self.progress_bar = None
         self.progress_text = None
-        self.groups_page = None
+        self.page_cache = {}
+        self.stale_pages = set()
+        self.home_view = None
+        self.forecast_container = None
+        DataStore.instance().events().subscribe(ALL_TOPICS, self.on_data_changed)
         self.setup_page()
 
     def setup_page(self):
         self.sidebar = self.create_sidebar()
+        self.home_view = self.create_home_page()
         self.content_area = ft.Container(
-            content=self.create_home_page(),
+            content=self.home_view,
             bgcolor="#f8fafc",
             expand=True,
             padding=ft.padding.all(30),
@@ -62,6 +78,9 @@ class MainApp:
         ], spacing=0, expand=True)
         
         self.page.add(main_row)
+        startup_timer.mark("first frame")
+        self.load_dashboard_data()
+        self.load_forecast_data()
 
     def create_sidebar_button(self, text: str, icon: str, index: int, is_selected: bool = False):
         """Create an animated sidebar button using built-in Flet components"""
@@ -174,32 +193,56 @@ class MainApp:
 
     def navigate_to_page(self, page_index: int):
         """Navigate to a specific page"""
+        DataStore.instance().flush_attendance()
         self.current_page_index = page_index
         self.sidebar.content = self.create_sidebar().content
         if page_index == 0:
-            self.content_area.content = self.create_home_page()
-            self.refresh_home_page()
-        elif page_index == 1:
-            if self.groups_page is None:
-                self.groups_page = GroupsPage(self.page, self.handle_navigation)
-            self.content_area.content = self.groups_page.get_view()
+            if self.home_view is None or 0 in self.stale_pages:
+                self.stale_pages.discard(0)
+                self.refresh_home_page()
+            else:
+                self.content_area.content = self.home_view
+        else:
+            self.content_area.content = self.get_cached_page(page_index).get_view()
+        self.page.update()
+
+    def build_page(self, page_index: int):
+        """Create the page object of a sidebar entry"""
+        if page_index == 1:
+            from pages.groups_page import GroupsPage
+            return GroupsPage(self.page, self.handle_navigation)
         elif page_index == 2:
-            attendance_page = AttendancePage(self.page, self.handle_navigation)
-            self.content_area.content = attendance_page.get_view()
+            from pages.choose_group_attendance_page import AttendancePage
+            return AttendancePage(self.page, self.handle_navigation)
         elif page_index == 3:
-            payment_page = PaymentPage(self.page, self.handle_navigation)
-            self.content_area.content = payment_page.get_view()
+            from pages.payment_page import PaymentPage
+            return PaymentPage(self.page, self.handle_navigation)
         elif page_index == 4:
-            students_page = StudentsListPage(self.page, self.handle_navigation)
-            self.content_area.content = students_page.get_view()
+            from pages.students_list import StudentsListPage
+            return StudentsListPage(self.page, self.handle_navigation)
         elif page_index == 5:
             from pages.pricing_settings_page import PricingSettingsPage
-            pricing_page = PricingSettingsPage(self.page, self.handle_navigation)
-            self.content_area.content = pricing_page.get_view()
-        self.page.update()
+            return PricingSettingsPage(self.page, self.handle_navigation)
+        raise ValueError(f"Unknown page index: {page_index}")
+
+    def get_cached_page(self, page_index: int):
+        """Reuse a built page unless the data it shows has changed since it was built"""
+        page_instance = self.page_cache.get(page_index)
+        if page_instance is None or page_index in self.stale_pages:
+            self.stale_pages.discard(page_index)
+            page_instance = self.build_page(page_index)
+            self.page_cache[page_index] = page_instance
+        return page_instance
+
+    def on_data_changed(self, change):
+        """Mark the cached pages that show the changed data"""
+        for page_index, topics in self.PAGE_DEPENDENCIES.items():
+            if change.topic in topics:
+                self.stale_pages.add(page_index)
 
     def handle_navigation(self, page_instance, page_index=None):
         """Handle navigation from sub-pages"""
+        DataStore.instance().flush_attendance()
         if page_index is not None:
             self.navigate_to_page(page_index)
         elif page_instance is not None:
@@ -238,7 +281,107 @@ class MainApp:
             ink=True if on_click else False,
         )
 
+    def format_dashboard_value(self, key):
+        """Text of a dashboard number ("..." until the numbers are calculated)"""
+        if self.dashboard_data is None:
+            return "..."
+        value = self.dashboard_data[key]
+        if key == 'monthly_payments':
+            return format_currency(value)
+        if key == 'attendance_percentage':
+            return f"{value}%"
+        return str(value)
+
+    def create_dashboard_value(self, key, size):
+        text = ft.Text(self.format_dashboard_value(key), size=size, 
+                       weight=ft.FontWeight.BOLD, color="#1a202c")
+        self.dashboard_texts[key] = text
+        return text
+
+    def load_dashboard_data(self):
+        """Calculate the dashboard numbers in the background and fill in the home page cards"""
+        from utils.dashboard_data import get_all_dashboard_data
+        
+        def show_dashboard_data(data):
+            self.dashboard_data = data
+            for key, text in self.dashboard_texts.items():
+                text.value = self.format_dashboard_value(key)
+            self.page.update()
+            if not startup_timer.reported:
+                startup_timer.mark("dashboard filled")
+                startup_timer.report(DataStore.instance().data_dir / "startup_timings.jsonl")
+        
+        BackgroundTasks.instance().run("dashboard", get_all_dashboard_data, on_result=show_dashboard_data)
+
+    def load_forecast_data(self):
+        """Calculate the revenue trend and forecast in the background and draw the chart"""
+        from utils.forecast import get_forecast_data
+
+        def show_forecast_data(data):
+            if self.forecast_container is None:
+                return
+            self.forecast_container.content = self.create_forecast_chart(data)
+            self.page.update()
+
+        BackgroundTasks.instance().run("forecast", get_forecast_data, on_result=show_forecast_data)
+
+    def create_forecast_section(self):
+        """Card with the monthly revenue of the last two years and the expected charges until the groups end"""
+        self.forecast_container = ft.Container(
+            content=ft.Row([
+                ft.ProgressRing(width=18, height=18, stroke_width=2),
+                ft.Text("מחשב תחזית...", size=14, color="#718096"),
+            ], spacing=10),
+            height=220,
+            alignment=ft.alignment.center,
+        )
+        return self.create_animated_card(
+            content=ft.Column([
+                ft.Text("מגמת הכנסות ותחזית", size=24, weight=ft.FontWeight.BOLD, color="#1a202c"),
+                ft.Text("הכנסות ב-24 החודשים האחרונים וחיובים צפויים עד סיום הקבוצות", size=14, color="#718096"),
+                self.forecast_container,
+            ], spacing=10),
+        )
+
+    def create_forecast_chart(self, data):
+        """Bars of the revenue history (blue) followed by the forecast (orange)"""
+        bars = [(month, amount, "#4299e1") for month, amount in data["history"]]
+        bars += [(month, amount, "#ed8936") for month, amount in data["forecast"]]
+        if not bars:
+            return ft.Text("אין נתוני הכנסות להצגה", size=16, color="#718096")
+
+        max_amount = max(amount for _, amount, _ in bars) or 1
+        columns = []
+        for month, amount, color in bars:
+            columns.append(ft.Container(
+                content=ft.Container(
+                    bgcolor=color,
+                    border_radius=ft.border_radius.only(top_left=3, top_right=3),
+                    height=max(2, 160 * amount / max_amount),
+                    tooltip=f"{month}: {format_currency(round(amount))}",
+                ),
+                alignment=ft.alignment.bottom_center,
+                height=160,
+                expand=1,
+            ))
+
+        legend = ft.Row([
+            ft.Container(width=12, height=12, bgcolor="#4299e1", border_radius=2),
+            ft.Text("הכנסות בפועל", size=12, color="#718096"),
+            ft.Container(width=12, height=12, bgcolor="#ed8936", border_radius=2),
+            ft.Text(f"חיובים צפויים ({data['forecast_students']} תלמידות)", size=12, color="#718096"),
+        ], spacing=8)
+        return ft.Column([
+            ft.Row(columns, spacing=2, vertical_alignment=ft.CrossAxisAlignment.END),
+            ft.Row([
+                ft.Text(bars[0][0], size=11, color="#718096"),
+                ft.Text(bars[-1][0], size=11, color="#718096"),
+            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+            legend,
+        ], spacing=8)
+
     def create_home_page(self):
+        self.dashboard_texts = {}
         welcome_section = ft.Container(
             content=ft.Column([
                 ft.Text(
@@ -267,8 +410,7 @@ class MainApp:
                     ),
                     ft.Column([
                         ft.Text("תלמידות", size=14, color="#718096"),
-                        ft.Text(str(self.dashboard_data['total_students']), size=28, 
-                               weight=ft.FontWeight.BOLD, color="#1a202c"),
+                        self.create_dashboard_value("total_students", size=28),
                     ], spacing=2, expand=True),
                 ], spacing=12, alignment=ft.MainAxisAlignment.START),
             ], spacing=5),
@@ -286,8 +428,7 @@ class MainApp:
                     ),
                     ft.Column([
                         ft.Text("קבוצות פעילות", size=14, color="#718096"),
-                        ft.Text(str(self.dashboard_data['total_groups']), size=28, 
-                               weight=ft.FontWeight.BOLD, color="#1a202c"),
+                        self.create_dashboard_value("total_groups", size=28),
                     ], spacing=2, expand=True),
                 ], spacing=12, alignment=ft.MainAxisAlignment.START),
             ], spacing=5),
@@ -305,8 +446,7 @@ class MainApp:
                     ),
                     ft.Column([
                         ft.Text("הכנסות החודש", size=14, color="#718096"),
-                        ft.Text(format_currency(self.dashboard_data['monthly_payments']), size=24, 
-                               weight=ft.FontWeight.BOLD, color="#1a202c"),
+                        self.create_dashboard_value("monthly_payments", size=24),
                     ], spacing=2, expand=True),
                 ], spacing=12, alignment=ft.MainAxisAlignment.START),
             ], spacing=5),
@@ -324,8 +464,7 @@ class MainApp:
                     ),
                     ft.Column([
                         ft.Text("נוכחות חודשית", size=14, color="#718096"),
-                        ft.Text(f"{self.dashboard_data['attendance_percentage']}%", size=28, 
-                               weight=ft.FontWeight.BOLD, color="#1a202c"),
+                        self.create_dashboard_value("attendance_percentage", size=28),
                     ], spacing=2, expand=True),
                 ], spacing=12, alignment=ft.MainAxisAlignment.START),
             ], spacing=5),
@@ -339,11 +478,13 @@ class MainApp:
             ft.Container(content=attendance_card, expand=1),
         ], spacing=20)
 
+        forecast_section = self.create_forecast_section()
         groups_section = self.create_groups_section()
 
         return ft.Column([
             welcome_section,
             stats_grid,
+            forecast_section,
             groups_section,
         ], spacing=40, scroll=ft.ScrollMode.AUTO)
 
@@ -452,10 +593,12 @@ class MainApp:
     def refresh_home_page(self):
         """Refresh home page data"""
         try:
-            self.dashboard_data = get_all_dashboard_data()
             if self.current_page_index == 0:
-                self.content_area.content = self.create_home_page()
+                self.home_view = self.create_home_page()
+                self.content_area.content = self.home_view
                 self.content_area.update()
+                self.load_dashboard_data()
+                self.load_forecast_data()
         except Exception as e:
             print(f"שגיאה בעדכון עמוד הבית: {e}")
 
@@ -472,6 +615,7 @@ class MainApp:
     
     def navigate_to_group_page(self, group_data):
         """Navigate to group details page with tabs"""
+        DataStore.instance().flush_attendance()
         from pages.group_details_page import GroupDetailsPage
         group_page = GroupDetailsPage(self.page, self.handle_navigation, group_data)
         self.content_area.content = group_page.get_view()
@@ -480,6 +624,11 @@ class MainApp:
 def main(page: ft.Page):
     pricing_file = ensure_pricing_file() 
     print("Pricing file ready at:", pricing_file)
+    DataStore.instance().migrate_enrollments()
+    DataStore.instance().migrate_payment_amounts()
+    DataStore.instance().payment_ledger().compact_if_needed()
+    startup_timer.mark("data ready")
+    page.on_disconnect = lambda e: DataStore.instance().flush_attendance()
     app = MainApp(page)
 
 if __name__ == '__main__':
@@ -404,9 +404,7 @@ class AddGroupPage:
         self._navigate_to_groups()
 
     def _navigate_to_groups(self):
-        """Navigate to groups page"""
-        if self.groups_page:
-            self.groups_page.refresh()
+        """Navigate to groups page (it updates itself when the new group is saved)"""
         self.navigation_callback(None, 1)
 
     def _reset_form(self):
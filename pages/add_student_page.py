@@ -1,11 +1,8 @@
 import flet as ft
-import json
-import os
 from components.modern_dialog import ModernDialog
 from components.form_fields import FormFields
 from views.add_student_view import AddStudentView
 from utils.students_data_manager import StudentsDataManager
-from utils.manage_json import ManageJSON
 import re
 from datetime import datetime
 
@@ -18,11 +15,6 @@ class AddStudentPage:
         self.dialog = ModernDialog(page)
         self.data_manager = StudentsDataManager()
         self.view = AddStudentView(self)
-        
-        base_dir = ManageJSON.get_appdata_path()
-        data_dir = base_dir / "data"
-        data_dir.mkdir(parents=True, exist_ok=True)
-        self.joining_dates_file = data_dir / "joining_dates.json"
 
         self.layout = ft.Column(
             spacing=24,
@@ -126,68 +118,6 @@ class AddStudentPage:
             traceback.print_exc()
             return None
 
-    def load_joining_dates(self):
-        """Load joining dates from JSON file"""
-        try:
-            if not os.path.exists(self.joining_dates_file):
-                os.makedirs(os.path.dirname(self.joining_dates_file), exist_ok=True)
-                with open(self.joining_dates_file, 'w', encoding='utf-8') as f:
-                    json.dump({}, f, ensure_ascii=False, indent=2)
-                return {}
-            
-            with open(self.joining_dates_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading joining dates: {e}")
-            return {}
-
-    def save_joining_dates(self, joining_dates_data):
-        """Save joining dates to JSON file"""
-        try:
-            os.makedirs(os.path.dirname(self.joining_dates_file), exist_ok=True)
-            with open(self.joining_dates_file, 'w', encoding='utf-8') as f:
-                json.dump(joining_dates_data, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"Error saving joining dates: {e}")
-            return False
-
-    def add_joining_date_record(self, group_id, student_name, student_id, join_date):
-        """Add joining date record for student in specific group"""
-        try:
-            joining_dates_data = self.load_joining_dates()
-            
-            group_id_str = str(group_id)
-            
-            if group_id_str not in joining_dates_data:
-                joining_dates_data[group_id_str] = []
-            
-            existing_student = None
-            for student in joining_dates_data[group_id_str]:
-                if student.get("student_id") == student_id:
-                    existing_student = student
-                    break
-            
-            if existing_student:
-                existing_student["join_date"] = join_date
-                existing_student["student_name"] = student_name
-            else:
-                joining_dates_data[group_id_str].append({
-                    "student_id": student_id,
-                    "student_name": student_name,
-                    "join_date": join_date
-                })
-            
-            success = self.save_joining_dates(joining_dates_data)
-            return success
-            
-        except Exception as e:
-            print(f"Error adding joining date record: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-
-
     def show_add_student_form(self):
         """Show the add student form"""
         self.clear_layout()
@@ -210,24 +140,11 @@ class AddStudentPage:
             self.dialog.show_error(f"שגיאה בזיהוי הקבוצה '{form_data['group']}'. אנא בדקי שהקבוצה קיימת במערכת.")
             return
 
-        if self.data_manager.add_student(form_data):
-            joining_success = self.add_joining_date_record(
-                group_id, 
-                form_data["name"], 
-                form_data["id"], 
-                form_data["join_date"]
+        if self.data_manager.add_student(form_data, group_id):
+            self.dialog.show_success(
+                "התלמידה נוספה בהצלחה למערכת!",
+                callback=self.go_back
             )
-            
-            if joining_success:
-                self.dialog.show_success(
-                    "התלמידה נוספה בהצלחה למערכת!",
-                    callback=self.go_back
-                )
-            else:
-                self.dialog.show_success(
-                    "התלמידה נוספה למערכת, אך הייתה בעיה בשמירת תאריך ההצטרפות",
-                    callback=self.go_back
-                )
         else:
             self.dialog.show_error("שגיאה בשמירת התלמידה")
 
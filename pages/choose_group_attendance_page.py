@@ -1,18 +1,12 @@
-import json
 import flet as ft
 from typing import Dict, Any
 from pages.group_attendance_page import GroupAttendancePage
-from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
 
 def load_groups():
-    """Load groups from JSON file"""
+    """Load the groups"""
     try:
-        data_dir = ManageJSON.get_appdata_path() / "data"
-        groups_file = data_dir / "groups.json"
-        
-        with open(groups_file, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            return data.get("groups", [])
+        return DataStore.instance().load_groups(copy=True)
     except Exception as e:
         print("Error on Load groups", e)
         return []
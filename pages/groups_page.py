@@ -1,11 +1,10 @@
 from datetime import datetime
-import json
 import flet as ft
-from pages.students_page import StudentsPage
-from pages.add_group_page import AddGroupPage
 from components.groups_dialogs import GroupDialogs
 from utils.payment_utils import PaymentCalculator
-from utils.manage_json import ManageJSON
+from utils.background_tasks import BackgroundTasks
+from utils.data_store import DataStore
+from utils.data_events import GROUPS_CHANGED, PRICING_CHANGED, UPDATED
 
 class GroupsPage:
     def __init__(self, page, navigation_callback):
@@ -13,6 +12,15 @@ class GroupsPage:
         self.navigation_callback = navigation_callback
         self.add_group_page = None
         self.payment_calculator = PaymentCalculator() 
+        self.price_texts = []
+        self.group_cards = {}
+        
+        self.progress_bar = ft.ProgressBar(
+            value=0,
+            color="#4299e1",
+            bgcolor="#e2e8f0",
+            visible=False
+        )
         
         self.groups_container = ft.Column(
             alignment=ft.MainAxisAlignment.START,
@@ -31,6 +39,7 @@ class GroupsPage:
         self.main_layout = ft.Column(
             controls=[
                 self.create_header(),
+                self.progress_bar,
                 self.scroll_area,
                 self.create_footer()
             ],
@@ -39,6 +48,39 @@ class GroupsPage:
         )
         
         self.build_group_buttons()
+        DataStore.instance().events().subscribe(GROUPS_CHANGED, self.on_data_changed)
+        DataStore.instance().events().subscribe(PRICING_CHANGED, self.on_pricing_changed)
+
+    def on_data_changed(self, change):
+        """Replace the cards of edited groups; rebuild the list when groups were added or removed"""
+        try:
+            if change.action != UPDATED or change.group_ids is None:
+                self.build_group_buttons()
+                return
+            
+            groups_by_id = {str(g.get("id")): g for g in DataStore.instance().load_groups()}
+            cards = []
+            for group_id in change.group_ids:
+                wrapper = self.group_cards.get(group_id)
+                group = groups_by_id.get(group_id)
+                if wrapper is None or group is None:
+                    continue
+                self.price_texts = [card for card in self.price_texts if str(card[0].get("id")) != group_id]
+                wrapper.content = self.create_group_card(group)
+                cards.append(self.price_texts[-1])
+            
+            self.page.update()
+            self.load_prices(cards, key=f"groups_page_prices:{','.join(sorted(change.group_ids))}")
+        except Exception as e:
+            print(f"Error applying group change: {e}")
+
+    def on_pricing_changed(self, change):
+        """Reprice every card with the saved pricing"""
+        try:
+            self.payment_calculator.load_pricing_config()
+            self.load_prices()
+        except Exception as e:
+            print(f"Error applying pricing change: {e}")
 
     def get_course_total_price(self, group):
         """Calculating the full course price"""
@@ -139,6 +181,14 @@ class GroupsPage:
             except Exception as e:
                 print("Error parsing end date:", e)
 
+        price_text = ft.Text(
+            "₪...",
+            size=16,
+            weight=ft.FontWeight.BOLD,
+            color="#48bb78"
+        )
+        self.price_texts.append((group, price_text))
+
         return ft.Container(
             content=ft.Column([
                 ft.Row([
@@ -187,11 +237,7 @@ class GroupsPage:
                         ),
                     ], spacing=4, expand=True),
                     ft.Column([
-                        ft.Text(
-                            size=16,
-                            weight=ft.FontWeight.BOLD,
-                            color="#48bb78"
-                        ),
+                        price_text,
                       
                         ft.Text(
                             f"התחלה: {group.get('group_start_date', 'לא צוין')}",
@@ -249,8 +295,6 @@ class GroupsPage:
         """Open edit dialog for group"""
         def on_success(message, is_error=False):
             self.show_success_message(message, is_error)
-            if not is_error:
-                self.build_group_buttons()
         
         dialog = GroupDialogs.create_edit_dialog(self.page, group, on_success)
         self.page.open(dialog)
@@ -259,8 +303,6 @@ class GroupsPage:
         """Show confirmation dialog before deleting group"""
         def on_success(message, is_error=False):
             self.show_success_message(message, is_error)
-            if not is_error:
-                self.build_group_buttons()
         
         dialog = GroupDialogs.create_delete_confirmation_dialog(self.page, group, on_success)
         self.page.open(dialog)
@@ -270,13 +312,10 @@ class GroupsPage:
 
     def build_group_buttons(self):
         self.groups_container.controls.clear()
+        self.price_texts = []
+        self.group_cards = {}
         try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            groups_file = data_dir / "groups.json"
-            
-            with open(groups_file, encoding="utf-8") as f:
-                data = json.load(f)
-                groups = data.get("groups", [])
+            groups = DataStore.instance().load_groups(copy=True)
         except Exception as e:
             groups = []
             error_container = ft.Container(
@@ -345,7 +384,9 @@ class GroupsPage:
             
             for i, group in enumerate(groups):
                 group_card = self.create_group_card(group)
-                current_row.append(ft.Container(content=group_card, expand=True))
+                wrapper = ft.Container(content=group_card, expand=True)
+                self.group_cards[str(group.get("id"))] = wrapper
+                current_row.append(wrapper)
                 
                 if len(current_row) >= max_cols or i == len(groups) - 1:
                     while len(current_row) < max_cols:
@@ -362,8 +403,40 @@ class GroupsPage:
         
         if hasattr(self, 'page'):
             self.page.update()
+        
+        self.load_prices()
+
+    def load_prices(self, cards=None, key="groups_page_prices"):
+        """Calculate the course prices in the background and fill in the cards as they finish"""
+        cards = list(self.price_texts if cards is None else cards)
+        if not cards:
+            return
+        
+        self.progress_bar.value = 0
+        self.progress_bar.visible = True
+        
+        def show_price(card, price):
+            card[1].value = price
+        
+        def show_progress(done, total):
+            self.progress_bar.value = done / total
+            self.page.update()
+        
+        def hide_progress():
+            self.progress_bar.visible = False
+            self.page.update()
+        
+        BackgroundTasks.instance().run_many(
+            key,
+            cards,
+            lambda card: self.get_course_total_price(card[0]),
+            on_result=show_price,
+            on_progress=show_progress,
+            on_complete=hide_progress
+        )
 
     def show_students(self, group_name):
+        from pages.students_page import StudentsPage
         students_page = StudentsPage(self.page, self.navigation_callback, group_name)
         self.navigation_callback(students_page)
 
@@ -371,6 +444,7 @@ class GroupsPage:
         self.navigation_callback(None, 0)
 
     def add_group_page_func(self, e=None):
+        from pages.add_group_page import AddGroupPage
         self.add_group_page = AddGroupPage(self.page, self.navigation_callback, self)
         self.navigation_callback(self.add_group_page)
     
@@ -1,67 +1,79 @@
-import json
 import flet as ft
+from datetime import datetime
 from typing import Dict, Any
-from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
+from utils.payment_ledger import PaymentLedger
+from utils.money import format_shekels, normalize_payment, to_agorot
 
 class PaymentPage:
     def __init__(self, page: ft.Page, navigation_handler=None):
         self.page = page
         self.navigation_handler = navigation_handler
+        self.store = DataStore.instance()
         self.payments_data = []
         self.edit_dialog = None
         self.delete_dialog = None
         self.note_dialog = None
         self.table_container = None
         self.stats_section = None
+        self.export_picker = None
         
         self.load_payments()
         
     def load_payments(self):
-        """Load payments data from students.json"""
+        """Load payments data from the students data (including the payment ledger)"""
         try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            students_file = data_dir / "students.json"
-            
             self.payments_data = []
             
-            if students_file.exists():
-                with open(students_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+            for student in self.store.load_students():
+                student_id = student.get("id")
+                student_name = student.get("name", "")
+                student_groups = student.get("groups", [])
+                
+                for payment_idx, payment in enumerate(student.get("payments", [])):
+                    payment_data = {
+                        "student_name": student_name,
+                        "student_id": student_id,
+                        "payment_id": PaymentLedger.payment_id(student_id, payment, payment_idx),
+                        "amount": payment.get("amount", "0"),
+                        "date": payment.get("date", ""),
+                        "payment_method": payment.get("payment_method", ""),
+                        "groups": student_groups,
+                        "groups_display": ", ".join(student_groups),
+                        "note": payment.get("note", "")
+                    }
                     
-                    for student_idx, student in enumerate(data.get("students", [])):
-                        student_name = student.get("name", "")
-                        student_groups = student.get("groups", [])
-                        
-                        for payment_idx, payment in enumerate(student.get("payments", [])):
-                            payment_data = {
-                                "student_name": student_name,
-                                "student_idx": student_idx,
-                                "payment_idx": payment_idx,
-                                "amount": payment.get("amount", "0"),
-                                "date": payment.get("date", ""),
-                                "payment_method": payment.get("payment_method", ""),
-                                "groups": student_groups,
-                                "groups_display": ", ".join(student_groups),
-                                "note": payment.get("note", "")
-                            }
-                            
-                            if payment.get("check_number"):
-                                payment_data["check_number"] = payment.get("check_number")
-                            
-                            self.payments_data.append(payment_data)
+                    if payment.get("check_number"):
+                        payment_data["check_number"] = payment.get("check_number")
+                    
+                    self.payments_data.append(payment_data)
         except Exception as e:
             print(f"Error loading payments: {e}")
 
-    def save_payment_changes(self, student_idx, payment_idx, new_amount, new_method, new_check_number=None, new_note=None):
+    def _find_payment(self, student_id, payment_id):
+        """(student, payment) as currently loaded, or (None, None)"""
+        student = self.store.students_by_id().get(student_id)
+        if not student:
+            return None, None
+        for payment_idx, payment in enumerate(student.get("payments", [])):
+            if PaymentLedger.payment_id(student_id, payment, payment_idx) == payment_id:
+                return student, payment
+        return None, None
+
+    def save_payment_changes(self, student_id, payment_id, new_amount, new_method, new_check_number=None, new_note=None):
         """Save changes to a payment (without date)"""
         try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            students_file = data_dir / "students.json"
-            
-            with open(students_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            if to_agorot(new_amount) is None:
+                print(f"Invalid payment amount: {new_amount}")
+                return False
+
+            totals = self.store.payment_totals()
+            student, current = self._find_payment(student_id, payment_id)
+            if current is None:
+                print(f"Payment {payment_id} of student {student_id} not found")
+                return False
             
-            payment = data["students"][student_idx]["payments"][payment_idx]
+            payment = dict(current)
             payment["amount"] = new_amount
             payment["payment_method"] = new_method
             
@@ -75,28 +87,25 @@ class PaymentPage:
             elif "note" in payment and not new_note:
                 del payment["note"]
             
-            with open(students_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
+            payment = normalize_payment(payment)
+            self.store.payment_ledger().edit(student_id, payment_id, payment)
+            totals.record_edit(student, current, payment)
             return True
         except Exception as e:
             print(f"Error saving payment: {e}")
             return False
 
-    def delete_payment(self, student_idx, payment_idx):
+    def delete_payment(self, student_id, payment_id):
         """Delete a payment"""
         try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            students_file = data_dir / "students.json"
-            
-            with open(students_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
-            del data["students"][student_idx]["payments"][payment_idx]
-            
-            with open(students_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            totals = self.store.payment_totals()
+            student, payment = self._find_payment(student_id, payment_id)
+            if payment is None:
+                print(f"Payment {payment_id} of student {student_id} not found")
+                return False
             
+            self.store.payment_ledger().delete(student_id, payment_id)
+            totals.record_delete(student, payment)
             return True
         except Exception as e:
             print(f"Error deleting payment: {e}")
@@ -208,8 +217,8 @@ class PaymentPage:
             note_value = note_field.value.strip() if note_field.value else None
             
             success = self.save_payment_changes(
-                payment["student_idx"],
-                payment["payment_idx"],
+                payment["student_id"],
+                payment["payment_id"],
                 amount_field.value,
                 payment_method_dropdown.value,
                 check_num,
@@ -279,7 +288,7 @@ class PaymentPage:
     def show_delete_dialog(self, payment: Dict[str, Any]):
         """Show confirmation dialog to delete payment"""
         def confirm_delete(e):
-            success = self.delete_payment(payment["student_idx"], payment["payment_idx"])
+            success = self.delete_payment(payment["student_id"], payment["payment_id"])
             
             if success:
                 self.page.close(self.delete_dialog)
@@ -386,24 +395,13 @@ class PaymentPage:
                 "transfer_payments": "0"
             }
             
-        total_amount = 0
-        cash_count = 0
-        transfer_count = 0
-        
-        for payment in self.payments_data:
-            try:
-                total_amount += float(payment["amount"])
-            except ValueError:
-                pass
-                
-            if payment["payment_method"] == "מזומן":
-                cash_count += 1
-            else:
-                transfer_count += 1
+        totals = self.store.payment_totals().school_totals()
+        cash_count = totals.method_count("מזומן")
+        transfer_count = totals.count - cash_count
         
         return {
-            "total_amount": f"{total_amount:,.0f}₪",
-            "total_payments": str(len(self.payments_data)),
+            "total_amount": format_shekels(totals.paid_agorot),
+            "total_payments": str(totals.count),
             "cash_payments": str(cash_count),
             "transfer_payments": str(transfer_count)
         }
@@ -690,6 +688,44 @@ class PaymentPage:
             scroll=ft.ScrollMode.AUTO,
         )
 
+    def show_message(self, text, color):
+        snackbar = ft.SnackBar(
+            content=ft.Text(text, color=ft.Colors.WHITE, rtl=True),
+            bgcolor=color,
+        )
+        self.page.overlay.append(snackbar)
+        snackbar.open = True
+        self.page.update()
+
+    def export_debt_aging(self, e):
+        """Ask where to save the debt aging report for the accountant"""
+        if self.export_picker is None:
+            self.export_picker = ft.FilePicker(on_result=self.on_export_path_selected)
+            self.page.overlay.append(self.export_picker)
+            self.page.update()
+        self.export_picker.save_file(
+            dialog_title="שמירת דוח גיל חובות",
+            file_name=f"debt_aging_{datetime.now().strftime('%Y-%m-%d')}.csv",
+            allowed_extensions=["csv"],
+        )
+
+    def on_export_path_selected(self, e):
+        if not e.path:
+            return
+        from utils.background_tasks import BackgroundTasks
+        from utils.debt_aging import export_debt_aging_csv
+
+        path = e.path if e.path.lower().endswith(".csv") else e.path + ".csv"
+
+        def on_exported(report):
+            self.show_message(f"דוח גיל חובות נשמר ({len(report['rows'])} תלמידות עם יתרת חוב)", ft.Colors.GREEN_600)
+
+        def on_error(error):
+            print(f"Error exporting debt aging report: {error}")
+            self.show_message("שגיאה בשמירת הדוח", ft.Colors.RED_600)
+
+        BackgroundTasks.instance().run("debt_aging", lambda: export_debt_aging_csv(path), on_result=on_exported, on_error=on_error)
+
     def go_home(self, e):
         """Navigate back to home page"""
         if self.navigation_handler:
@@ -766,10 +802,28 @@ class PaymentPage:
             margin=ft.margin.only(top=20)
         )
 
+        export_button = ft.Container(
+            content=ft.OutlinedButton(
+                content=ft.Row([
+                    ft.Icon(ft.Icons.DOWNLOAD, size=16, color=ft.Colors.BLUE_600),
+                    ft.Text("ייצוא דוח גיל חובות (CSV)", size=12, color=ft.Colors.BLUE_600, rtl=True)
+                ], alignment=ft.MainAxisAlignment.CENTER, spacing=6, tight=True),
+                on_click=self.export_debt_aging,
+                style=ft.ButtonStyle(
+                    shape=ft.RoundedRectangleBorder(radius=6),
+                    padding=ft.padding.symmetric(horizontal=16, vertical=8),
+                ),
+                height=36,
+            ),
+            alignment=ft.alignment.center,
+            margin=ft.margin.only(bottom=16)
+        )
+
         main_content = ft.Container(
             content=ft.Column([
                 title_container,
                 self.stats_section,
+                export_button,
                 self.table_container,
                 back_button,
             ], 
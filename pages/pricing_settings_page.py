@@ -23,8 +23,8 @@ class PricingSettingsPage:
             self.save_config()
     
     def save_config(self):
-        with open(self.config_file, "w") as f:
-            json.dump(self.config, f)
+        from utils.data_store import DataStore
+        DataStore.instance().write(self.config_file, self.config)
     
     def get_view(self):
         header = ft.Row([
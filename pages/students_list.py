@@ -15,7 +15,6 @@ class StudentsListPage:
             controls=[],
             spacing=0,
             expand=True,
-            scroll=ft.ScrollMode.AUTO
         )
         
         self.view = StudentsListView(self)
@@ -1,6 +1,6 @@
 import flet as ft
 from pages.add_student_page import AddStudentPage
-from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
 from utils.students_data_manager import StudentsDataManager
 from views.students_group_view import StudentsGroupView
 from views.student_edit_view import StudentEditView
@@ -116,12 +116,7 @@ class StudentsPage:
         self.layout.controls.clear()
 
     def get_group_id_by_name(self, group_name: str):
-        groups_file = ManageJSON.get_appdata_path() / "data" / "groups.json"
-        if groups_file.exists():
-            import json
-            with open(groups_file, "r", encoding="utf-8") as f:
-                groups_data = json.load(f)
-            for group in groups_data.get("groups", []):
-                if group.get("name") == group_name:
-                    return str(group.get("id"))
+        for group in DataStore.instance().load_groups():
+            if group.get("name") == group_name:
+                return str(group.get("id"))
         return None
\ No newline at end of file
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+
+JOURNAL_NAME = "journal.json"
+
+
+def _fsync_dir(directory):
+    """Make a rename in `directory` durable (not supported on Windows, where it is skipped)"""
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path, payload: bytes):
+    """Replace a file with `payload`: temp file in the same folder, fsync, rename"""
+    path = str(path)
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directory)
+
+
+def dumps_json(data, indent=None) -> bytes:
+    """Serialise data the way the data files are stored (UTF-8, Hebrew kept readable)"""
+    separators = (",", ":") if indent is None else None
+    return json.dumps(data, ensure_ascii=False, indent=indent, separators=separators).encode("utf-8")
+
+
+def atomic_write_json(path, data, indent=None):
+    """Atomically replace a JSON file; a crash leaves either the old or the new file"""
+    atomic_write_bytes(path, dumps_json(data, indent))
+
+
+class JournaledWrite:
+    """All-or-nothing update of several JSON files.
+
+    ``write`` stages files in memory. ``commit`` first writes every new
+    content to a journal file and fsyncs it, then replaces the target files
+    one by one and finally deletes the journal. If the process dies before
+    the journal is complete, no target was touched (rolled back); if it dies
+    after, ``recover`` replays the journal on the next start (rolled forward).
+    """
+
+    def __init__(self, journal_path, on_written=None, prepare=None):
+        self.journal_path = str(journal_path)
+        self.on_written = on_written
+        self.prepare = prepare
+        self._files = {}
+
+    def write(self, path, data, indent=None):
+        """Stage the new content of a file"""
+        if self.prepare:
+            data = self.prepare(path, data)
+        self._files[str(path)] = (data, indent)
+
+    def commit(self):
+        if not self._files:
+            return
+        entries = [{"path": path, "indent": indent, "data": data} for path, (data, indent) in self._files.items()]
+        atomic_write_json(self.journal_path, {"committed": True, "files": entries})
+        _apply(entries, self.on_written)
+        os.remove(self.journal_path)
+        _fsync_dir(os.path.dirname(self.journal_path) or ".")
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self._files = {}
+        return False
+
+
+def _apply(entries, on_written=None):
+    for entry in entries:
+        atomic_write_json(entry["path"], entry["data"], entry.get("indent"))
+        if on_written:
+            on_written(entry["path"], entry["data"])
+
+
+def recover(journal_path, on_written=None) -> bool:
+    """Finish or discard a multi-file update interrupted by a crash; True if one was replayed"""
+    journal_path = str(journal_path)
+    if not os.path.exists(journal_path):
+        return False
+    try:
+        with open(journal_path, "r", encoding="utf-8") as f:
+            journal = json.load(f)
+    except Exception as e:
+        print(f"Discarding incomplete journal {journal_path}: {e}")
+        os.remove(journal_path)
+        return False
+
+    replayed = False
+    if isinstance(journal, dict) and journal.get("committed"):
+        _apply(journal.get("files", []), on_written)
+        replayed = True
+    os.remove(journal_path)
+    return replayed
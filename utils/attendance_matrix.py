@@ -0,0 +1,138 @@
+from typing import Dict, Any, Iterable
+
+
+class AttendanceMatrix:
+    """Attendance of one group as bit arrays.
+
+    Students are mapped to columns in the order they first appear in the
+    file, and dates to rows in file order. For every row there is one int
+    whose bits are the students marked present and one whose bits are the
+    students that have any mark; the same bits are also kept per column
+    (one bit per date). Counting is then ``int.bit_count`` over a few ints
+    instead of a dict lookup per date and student. ``from_dict`` and
+    ``to_dict`` convert from and to the JSON file format.
+    """
+
+    def __init__(self):
+        self.dates = []
+        self.columns = {}
+        self.present_rows = []
+        self.recorded_rows = []
+        self.present_cols = []
+        self.recorded_cols = []
+        self._date_masks = {}
+
+    @classmethod
+    def from_dict(cls, attendance_data: Dict[str, Any]) -> "AttendanceMatrix":
+        """Build a matrix from the attendance file format (date -> student id -> bool)"""
+        matrix = cls()
+        columns = matrix.columns
+        present_cols = matrix.present_cols
+        recorded_cols = matrix.recorded_cols
+
+        for date, records in (attendance_data or {}).items():
+            if not isinstance(records, dict):
+                continue
+            row = len(matrix.dates)
+            row_bit = 1 << row
+            present = 0
+            recorded = 0
+            for student_id, is_present in records.items():
+                column = columns.get(student_id)
+                if column is None:
+                    column = columns[student_id] = len(columns)
+                    present_cols.append(0)
+                    recorded_cols.append(0)
+                bit = 1 << column
+                recorded |= bit
+                recorded_cols[column] |= row_bit
+                if is_present:
+                    present |= bit
+                    present_cols[column] |= row_bit
+            matrix.dates.append(date)
+            matrix.present_rows.append(present)
+            matrix.recorded_rows.append(recorded)
+        return matrix
+
+    def to_dict(self) -> Dict[str, Dict[str, bool]]:
+        """Export back to the attendance file format"""
+        student_ids = sorted(self.columns, key=self.columns.get)
+        data = {}
+        for present, recorded, date in zip(self.present_rows, self.recorded_rows, self.dates):
+            data[date] = {
+                student_id: bool(present >> column & 1)
+                for column, student_id in enumerate(student_ids)
+                if recorded >> column & 1
+            }
+        return data
+
+    def date_mask(self, predicate=None) -> int:
+        """Bits of the dates accepted by `predicate` (all dates when None)"""
+        if predicate is None:
+            return (1 << len(self.dates)) - 1
+        mask = 0
+        for row, date in enumerate(self.dates):
+            if predicate(date):
+                mask |= 1 << row
+        return mask
+
+    def month_mask(self, month: str) -> int:
+        """Bits of the dates in a month given as "MM/YYYY" """
+        mask = self._date_masks.get(month)
+        if mask is None:
+            mask = self._date_masks[month] = self.date_mask(lambda date: date.endswith(month))
+        return mask
+
+    def column_mask(self, student_ids: Iterable) -> int:
+        """Bits of the given students (ids not in the file are ignored)"""
+        mask = 0
+        for student_id in student_ids:
+            column = self.columns.get(str(student_id))
+            if column is not None:
+                mask |= 1 << column
+        return mask
+
+    def student_present(self, student_id, dates_mask=None) -> int:
+        """Number of dates a student was marked present"""
+        column = self.columns.get(str(student_id))
+        if column is None:
+            return 0
+        bits = self.present_cols[column]
+        return (bits & dates_mask if dates_mask is not None else bits).bit_count()
+
+    def present_count(self, dates_mask=None, students_mask=None) -> int:
+        """Present marks, optionally limited to some dates and students"""
+        return self._count(self.present_rows, dates_mask, students_mask)
+
+    def recorded_count(self, dates_mask=None, students_mask=None) -> int:
+        """Present and absent marks, optionally limited to some dates and students"""
+        return self._count(self.recorded_rows, dates_mask, students_mask)
+
+    def _count(self, rows, dates_mask, students_mask):
+        total = 0
+        for row, bits in enumerate(rows):
+            if dates_mask is not None and not dates_mask >> row & 1:
+                continue
+            if students_mask is not None:
+                bits &= students_mask
+            total += bits.bit_count()
+        return total
+
+    def rate(self, dates_mask=None, students_mask=None, default=0.0) -> float:
+        """Percentage of present marks out of all marks"""
+        recorded = self.recorded_count(dates_mask, students_mask)
+        if not recorded:
+            return default
+        return self.present_count(dates_mask, students_mask) / recorded * 100
+
+    def monthly_rates(self) -> Dict[str, float]:
+        """Attendance percentage per "MM/YYYY" month that has any marks"""
+        months = {}
+        for date in self.dates:
+            months.setdefault(date[-7:], None)
+        rates = {}
+        for month in months:
+            recorded = self.recorded_count(self.month_mask(month))
+            if recorded:
+                rates[month] = self.present_count(self.month_mask(month)) / recorded * 100
+        return rates
@@ -1,7 +1,8 @@
-import json
 from typing import Dict, List, Any
 import datetime
-from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
+from utils.data_events import ATTENDANCE_CHANGED, SAVED, UPDATED, DataChange
+from utils.attendance_matrix import AttendanceMatrix
 
 class AttendanceUtils:
     """Utility functions for attendance management"""
@@ -88,10 +89,18 @@ class AttendanceUtils:
             return attendance_data
     
     @staticmethod
-    def calculate_attendance_stats(attendance_data: Dict[str, Any], students: List[Dict]) -> Dict[str, Any]:
+    def as_matrix(attendance_data) -> AttendanceMatrix:
+        """Attendance as an AttendanceMatrix (accepts the file format or a matrix)"""
+        if isinstance(attendance_data, AttendanceMatrix):
+            return attendance_data
+        return AttendanceMatrix.from_dict(attendance_data)
+
+    @staticmethod
+    def calculate_attendance_stats(attendance_data, students: List[Dict]) -> Dict[str, Any]:
         """Calculate attendance statistics"""
         try:
-            valid_dates = [d for d in attendance_data.keys() if AttendanceUtils.validate_date(d)]
+            matrix = AttendanceUtils.as_matrix(attendance_data)
+            valid_dates = [d for d in matrix.dates if AttendanceUtils.validate_date(d)]
             total_classes = len(valid_dates)
             total_students = len(students)
             
@@ -103,11 +112,8 @@ class AttendanceUtils:
                     'attendance_rate': 0.0
                 }
             
-            total_present = 0
-            for date in valid_dates:
-                for student in students:
-                    if attendance_data[date].get(str(student["id"]), False):
-                        total_present += 1
+            valid_mask = matrix.date_mask(AttendanceUtils.validate_date)
+            total_present = sum(matrix.student_present(student["id"], valid_mask) for student in students)
             
             total_possible = total_classes * total_students
             attendance_rate = (total_present / total_possible * 100) if total_possible > 0 else 0
@@ -129,17 +135,28 @@ class AttendanceUtils:
             }
     
     @staticmethod
-    def save_attendance_file(group_id: str, attendance_data: Dict[str, Any]) -> bool:
-        """Save attendance data to file"""
+    def set_attendance(group_id: str, date: str, student_id: str, is_present: bool, source=None) -> bool:
+        """Record a single attendance mark (written to file after a short debounce)"""
+        try:
+            store = DataStore.instance()
+            store.attendance_buffer().set(group_id, date, student_id, is_present)
+            store.events().publish(DataChange(
+                ATTENDANCE_CHANGED, UPDATED, student_ids=[student_id], group_ids=[group_id],
+                source=source, date=date, is_present=is_present,
+            ))
+            return True
+        except Exception as e:
+            print(f"Error recording attendance: {e}")
+            return False
+
+    @staticmethod
+    def save_attendance_file(group_id: str, attendance_data: Dict[str, Any], source=None) -> bool:
+        """Save attendance data (written to file after a short debounce)"""
         try:
-            attendances_dir = ManageJSON.get_appdata_path() / "attendances"
-            attendances_dir.mkdir(parents=True, exist_ok=True)
-            attendance_file = attendances_dir / f"attendance_{group_id}.json"
-            
             cleaned_data = AttendanceUtils.clean_attendance_data(attendance_data)
-            
-            with open(attendance_file, "w", encoding="utf-8") as f:
-                json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+            store = DataStore.instance()
+            store.attendance_buffer().stage(group_id, cleaned_data)
+            store.events().publish(DataChange(ATTENDANCE_CHANGED, SAVED, group_ids=[group_id], source=source))
             
             return True
             
@@ -151,27 +168,31 @@ class AttendanceUtils:
     def load_attendance_file(group_id: str) -> Dict[str, Any]:
         """Load attendance data from file"""
         try:
-            attendances_dir = ManageJSON.get_appdata_path() / "attendances"
-            attendance_file = attendances_dir / f"attendance_{group_id}.json"
-            
-            if attendance_file.exists():
-                with open(attendance_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                return AttendanceUtils.clean_attendance_data(data)
-            
-            return {}
+            data = DataStore.instance().load_attendance(group_id)
+            cleaned_data = AttendanceUtils.clean_attendance_data(data)
+            # Callers edit the returned mapping in place, so hand out copies of the per-date dicts
+            return {date: dict(records) for date, records in cleaned_data.items()}
             
         except Exception as e:
             print(f"Error loading attendance file: {e}")
             return {}
 
     @staticmethod
-    def get_attendance_statistics(attendance_data: Dict[str, Any], students: List[Dict]) -> Dict[str, Any]:
+    def load_attendance_matrix(group_id: str) -> AttendanceMatrix:
+        """Load a group's attendance as a (shared, read-only) AttendanceMatrix"""
+        try:
+            return DataStore.instance().attendance_matrix(group_id)
+        except Exception as e:
+            print(f"Error loading attendance matrix: {e}")
+            return AttendanceMatrix()
+
+    @staticmethod
+    def get_attendance_statistics(attendance_data, students: List[Dict]) -> Dict[str, Any]:
         """Get comprehensive attendance statistics"""
         try:
-            cleaned_data = AttendanceUtils.clean_attendance_data(attendance_data)
-            valid_dates = [d for d in cleaned_data.keys() if AttendanceUtils.validate_date(d)]
+            matrix = AttendanceUtils.as_matrix(attendance_data)
+            valid_mask = matrix.date_mask(AttendanceUtils.validate_date)
+            valid_dates = [d for d in matrix.dates if AttendanceUtils.validate_date(d)]
             
             total_classes = len(valid_dates)
             total_students = len(students)
@@ -199,18 +220,12 @@ class AttendanceUtils:
                     'attendance_rate': 0.0
                 }
             
-            for date in valid_dates:
-                date_data = cleaned_data.get(date, {})
-                for student in students:
-                    student_id = str(student["id"])
-                    is_present = date_data.get(student_id, False)
-                    
-                    if is_present:
-                        total_present += 1
-                        student_stats[student["id"]]['present'] += 1
-                    else:
-                        total_absent += 1
-                        student_stats[student["id"]]['absent'] += 1
+            for student in students:
+                present = matrix.student_present(student["id"], valid_mask)
+                total_present += present
+                total_absent += total_classes - present
+                student_stats[student["id"]]['present'] += present
+                student_stats[student["id"]]['absent'] += total_classes - present
             
             total_possible = total_classes * total_students
             attendance_rate = (total_present / total_possible * 100) if total_possible > 0 else 0
@@ -0,0 +1,87 @@
+import atexit
+import threading
+from utils.data_events import ATTENDANCE_CHANGED, FLUSHED, DataChange
+
+
+class AttendanceWriteBuffer:
+    """Write-behind buffer for attendance files.
+
+    Single toggles (``set``) and whole-file saves (``stage``) are kept in
+    memory and written once per group after ``DEBOUNCE_SECONDS`` without
+    further changes, so taking roll for a class is one file write instead of
+    one per click. Pending changes are also flushed on navigation, on app
+    exit, and before a group's attendance is read through the DataStore.
+    Use ``DataStore.attendance_buffer()`` to get the shared instance.
+    """
+
+    DEBOUNCE_SECONDS = 1.5
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._snapshots = {}
+        self._toggles = {}
+        self._timer = None
+        atexit.register(self.flush)
+
+    def set(self, group_id, date, student_id, is_present):
+        """Record one attendance mark"""
+        with self._lock:
+            group_toggles = self._toggles.setdefault(str(group_id), {})
+            group_toggles.setdefault(date, {})[str(student_id)] = is_present
+            self._schedule()
+
+    def stage(self, group_id, attendance_data):
+        """Replace a group's whole attendance mapping (supersedes earlier toggles)"""
+        with self._lock:
+            self._snapshots[str(group_id)] = {date: dict(records) for date, records in attendance_data.items()}
+            self._toggles.pop(str(group_id), None)
+            self._schedule()
+
+    def has_pending(self, group_id=None):
+        with self._lock:
+            if group_id is None:
+                return bool(self._snapshots or self._toggles)
+            return str(group_id) in self._snapshots or str(group_id) in self._toggles
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.DEBOUNCE_SECONDS, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _merged(self, group_id):
+        data = self._snapshots.pop(group_id, None)
+        if data is None:
+            data = self.store.read(self.store.attendance_file(group_id), {}, copy=True)
+            if not isinstance(data, dict):
+                data = {}
+        for date, records in self._toggles.pop(group_id, {}).items():
+            data.setdefault(date, {}).update(records)
+        return data
+
+    def flush(self, group_id=None):
+        """Write pending changes of one group, or of every group"""
+        with self._lock:
+            if group_id is None:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                group_ids = list(dict.fromkeys(list(self._snapshots) + list(self._toggles)))
+            elif self.has_pending(group_id):
+                group_ids = [str(group_id)]
+            else:
+                return True
+
+            success = True
+            for gid in group_ids:
+                data = self._merged(gid)
+                try:
+                    self.store.write(self.store.attendance_file(gid), data,
+                                     change=DataChange(ATTENDANCE_CHANGED, FLUSHED, group_ids=[gid]))
+                except Exception as e:
+                    print(f"Error saving attendance for group {gid}: {e}")
+                    self._snapshots[gid] = data
+                    success = False
+            return success
@@ -0,0 +1,139 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskBatch:
+    """Handle of jobs started with ``BackgroundTasks.run_many``"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self._cancelled = threading.Event()
+        self._futures = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def finished(self):
+        return self.done >= self.total
+
+    def cancel(self):
+        """Stop delivering results; jobs that have not started yet are dropped"""
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+
+
+class BackgroundTasks:
+    """Runs slow computations (payment math) off the Flet event handlers.
+
+    ``run_many`` starts one job per item on a small thread pool and calls
+    ``on_result`` as each job finishes, so a page can render placeholders
+    first and fill them in progressively. Callbacks run on the worker
+    thread; they may change controls and call ``update()`` as usual in
+    Flet. Starting a batch under a key cancels the previous batch with the
+    same key, so re-rendering a view drops results meant for the old one.
+    A thread pool is used rather than processes because the jobs read the
+    in-memory DataStore snapshots.
+    """
+
+    MAX_WORKERS = 2
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_workers=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or self.MAX_WORKERS,
+                                            thread_name_prefix="background")
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        """Get the shared task runner"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def run_many(self, key, items, func, on_result, on_progress=None, on_complete=None, on_error=None):
+        """Run `func(item)` for every item; results arrive through `on_result(item, result)`"""
+        items = list(items)
+        batch = TaskBatch(len(items))
+        with self._lock:
+            previous = self._batches.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._batches[key] = batch
+
+        if not items:
+            self._notify(on_complete)
+            return batch
+
+        for item in items:
+            future = self._executor.submit(self._call, batch, func, item)
+            future.add_done_callback(
+                lambda f, item=item: self._deliver(key, batch, item, f, on_result, on_progress, on_complete, on_error)
+            )
+            batch._futures.append(future)
+        return batch
+
+    def run(self, key, func, on_result, on_error=None):
+        """Run a single `func()` in the background; the result arrives through `on_result(result)`"""
+        return self.run_many(
+            key,
+            [None],
+            lambda _: func(),
+            lambda _, result: on_result(result),
+            on_error=(lambda _, error: on_error(error)) if on_error else None,
+        )
+
+    def cancel(self, key):
+        """Cancel the batch started under `key`, if any"""
+        with self._lock:
+            batch = self._batches.pop(key, None)
+        if batch is not None:
+            batch.cancel()
+
+    @staticmethod
+    def _call(batch, func, item):
+        if batch.cancelled:
+            return None
+        return func(item)
+
+    def _deliver(self, key, batch, item, future, on_result, on_progress, on_complete, on_error):
+        if batch.cancelled or future.cancelled():
+            return
+        with batch._lock:
+            error = future.exception()
+            try:
+                if error is None:
+                    on_result(item, future.result())
+                elif on_error:
+                    on_error(item, error)
+                else:
+                    print(f"Error in background task {key}: {error}")
+            except Exception as e:
+                print(f"Error delivering background result for {key}: {e}")
+
+            batch.done += 1
+            if on_progress:
+                self._notify(on_progress, batch.done, batch.total)
+            if batch.finished:
+                with self._lock:
+                    if self._batches.get(key) is batch:
+                        del self._batches[key]
+                self._notify(on_complete)
+
+    @staticmethod
+    def _notify(callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Error in background task callback: {e}")
@@ -1,281 +1,137 @@
-import json
-import os
 from datetime import datetime
-from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
+from utils.money import whole_shekels
+
+DEFAULT_ATTENDANCE_PERCENTAGE = 75
+
+
+def _current_month():
+    return datetime.now().strftime("%m/%Y")
+
+
+def _aggregate_students(students):
+    """Student count and payment status buckets, over Student records"""
+    paid_count = 0
+    debt_count = 0
+    for student in students:
+        payment_status = student.payment_status
+        if payment_status == 'שולם':
+            paid_count += 1
+        elif 'חוב' in payment_status:
+            debt_count += 1
+
+    return {
+        'total_students': len(students),
+        'payment_status': {"paid": paid_count, "debt": debt_count}
+    }
+
+
+def _aggregate_revenue(revenue, current_month):
+    """Monthly and all-time payment totals, from the monthly revenue rollup"""
+    monthly_agorot = revenue.get(current_month, {}).get('total', 0)
+    total_agorot = sum(bucket['total'] for bucket in revenue.values())
+    return {
+        'monthly_payments': whole_shekels(monthly_agorot),
+        'total_payments': whole_shekels(total_agorot),
+    }
+
+
+def _aggregate_attendance(by_month, current_month):
+    """Monthly and all-time attendance counts, from the monthly attendance rollup"""
+    monthly_present, monthly_records = by_month.get(current_month, (0, 0))
+    total_present = sum(present for present, _ in by_month.values())
+    total_records = sum(recorded for _, recorded in by_month.values())
+
+    total_absent = total_records - total_present
+
+    if monthly_records:
+        attendance_percentage = int((monthly_present / monthly_records) * 100)
+    else:
+        attendance_percentage = DEFAULT_ATTENDANCE_PERCENTAGE
+
+    if total_records:
+        all_time_attendance = int((total_present / total_records) * 100)
+        attendance_stats = {
+            "present": total_present,
+            "absent": total_absent,
+            "total": total_records,
+            "percentage": all_time_attendance
+        }
+    else:
+        all_time_attendance = DEFAULT_ATTENDANCE_PERCENTAGE
+        attendance_stats = {"present": 0, "absent": 0, "percentage": DEFAULT_ATTENDANCE_PERCENTAGE}
+
+    return {
+        'attendance_percentage': attendance_percentage,
+        'all_time_attendance': all_time_attendance,
+        'attendance_stats': attendance_stats
+    }
 
 def get_total_students():
     try:
-        data_dir = ManageJSON.get_appdata_path() / "data"
-        students_file = data_dir / "students.json"
-        
-        if not students_file.exists():
-            return 0
-            
-        with open(students_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'students' in data:
-                return len(data['students'])
-            return 0
-                    
+        return len(DataStore.instance().student_models())
     except Exception:
         return 0
 
 def get_total_groups():
     try:
-        data_dir = ManageJSON.get_appdata_path() / "data"
-        groups_file = data_dir / "groups.json"
-        
-        if not groups_file.exists():
-            return 0
-            
-        with open(groups_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'groups' in data:
-                return len(data['groups'])
-            return 0
-                
+        return len(DataStore.instance().group_models())
     except Exception:
         return 0
 
 def get_monthly_payments():
     try:
-        total_payments = 0
-        current_month = datetime.now().strftime("%m/%Y")  
-        
-        data_dir = ManageJSON.get_appdata_path() / "data"
-        students_file = data_dir / "students.json"
-        
-        if not students_file.exists():
-            return 0
-            
-        with open(students_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'students' in data:
-                for student in data['students']:
-                    if 'payments' in student:
-                        for payment in student['payments']:
-                            payment_date = payment.get('date', '')
-                            if payment_date.endswith(current_month):
-                                amount = payment.get('amount', 0)
-                                if isinstance(amount, (int, float)):
-                                    total_payments += amount
-                                elif isinstance(amount, str):
-                                    try:
-                                        total_payments += float(amount.replace(',', ''))
-                                    except ValueError:
-                                        continue
-                    
-        return int(total_payments)
+        return _aggregate_revenue(DataStore.instance().rollups().revenue(), _current_month())['monthly_payments']
     except Exception:
         return 0
 
 def get_monthly_attendance_percentage():
     try:
-        total_present = 0
-        total_records = 0
-        current_month = datetime.now().strftime("%m/%Y") 
-        
-        attendances_dir = ManageJSON.get_appdata_path() / "attendances"
-        
-        if not attendances_dir.exists():
-            return 75  
-            
-        for filename in os.listdir(attendances_dir):
-            if filename.endswith('.json'):
-                file_path = attendances_dir / filename
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        attendance_data = json.load(f)
-                        
-                        for date, students_attendance in attendance_data.items():
-                            if date.endswith(current_month):
-                                for student_id, is_present in students_attendance.items():
-                                    total_records += 1
-                                    if is_present:
-                                        total_present += 1
-                                        
-                except (json.JSONDecodeError, KeyError):
-                    continue
-        
-        if total_records == 0:
-            return 75  
-            
-        attendance_percentage = int((total_present / total_records) * 100)
-        return attendance_percentage
-        
+        return _aggregate_attendance(DataStore.instance().rollups().attendance_by_month(), _current_month())['attendance_percentage']
     except Exception:
-        return 75 
+        return DEFAULT_ATTENDANCE_PERCENTAGE
 
 def get_all_time_attendance_percentage():
     """Returns the overall attendance percentage (all time)"""
     try:
-        total_present = 0
-        total_records = 0
-        
-        attendances_dir = ManageJSON.get_appdata_path() / "attendances"
-        
-        if not attendances_dir.exists():
-            return 75  
-            
-        for filename in os.listdir(attendances_dir):
-            if filename.endswith('.json'):
-                file_path = attendances_dir / filename
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        attendance_data = json.load(f)
-                        
-                        for date, students_attendance in attendance_data.items():
-                            for student_id, is_present in students_attendance.items():
-                                total_records += 1
-                                if is_present:
-                                    total_present += 1
-                                        
-                except (json.JSONDecodeError, KeyError):
-                    continue
-        
-        if total_records == 0:
-            return 75  
-            
-        attendance_percentage = int((total_present / total_records) * 100)
-        return attendance_percentage
-        
+        return _aggregate_attendance(DataStore.instance().rollups().attendance_by_month(), _current_month())['all_time_attendance']
     except Exception:
-        return 75  
+        return DEFAULT_ATTENDANCE_PERCENTAGE
 
 
 def get_attendance_statistics():
     """Returns detailed attendance statistics"""
     try:
-        total_present = 0
-        total_absent = 0
-        
-        attendances_dir = ManageJSON.get_appdata_path() / "attendances"
-        
-        if not attendances_dir.exists():
-            return {"present": 0, "absent": 0, "percentage": 75}
-            
-        for filename in os.listdir(attendances_dir):
-            if filename.endswith('.json'):
-                file_path = attendances_dir / filename
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        attendance_data = json.load(f)
-                        
-                        for date, students_attendance in attendance_data.items():
-                            for student_id, is_present in students_attendance.items():
-                                if is_present:
-                                    total_present += 1
-                                else:
-                                    total_absent += 1
-                                        
-                except (json.JSONDecodeError, KeyError):
-                    continue
-        
-        total_records = total_present + total_absent
-        if total_records == 0:
-            return {"present": 0, "absent": 0, "percentage": 75}
-            
-        percentage = int((total_present / total_records) * 100)
-        
-        return {
-            "present": total_present,
-            "absent": total_absent,
-            "total": total_records,
-            "percentage": percentage
-        }
-        
+        return _aggregate_attendance(DataStore.instance().rollups().attendance_by_month(), _current_month())['attendance_stats']
     except Exception:
-        return {"present": 0, "absent": 0, "percentage": 75}
+        return {"present": 0, "absent": 0, "percentage": DEFAULT_ATTENDANCE_PERCENTAGE}
 
 
 def get_total_payments_amount():
     """Returns the amount of all payments received"""
     try:
-        total_payments = 0
-        
-        data_dir = ManageJSON.get_appdata_path() / "data"
-        students_file = data_dir / "students.json"
-        
-        if not students_file.exists():
-            return 0
-            
-        with open(students_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'students' in data:
-                for student in data['students']:
-                    if 'payments' in student:
-                        for payment in student['payments']:
-                            amount = payment.get('amount', 0)
-                            if isinstance(amount, (int, float)):
-                                total_payments += amount
-                            elif isinstance(amount, str):
-                                try:
-                                    total_payments += float(amount.replace(',', ''))
-                                except ValueError:
-                                    continue
-        return int(total_payments)
+        return _aggregate_revenue(DataStore.instance().rollups().revenue(), _current_month())['total_payments']
     except Exception:
         return 0
 
 def get_students_by_payment_status():
     """Returns statistics on the payment status of the students"""
     try:
-        paid_count = 0
-        debt_count = 0
-        
-        data_dir = ManageJSON.get_appdata_path() / "data"
-        students_file = data_dir / "students.json"
-        
-        if not students_file.exists():
-            return {"paid": 0, "debt": 0}
-            
-        with open(students_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'students' in data:
-                for student in data['students']:
-                    payment_status = student.get('payment_status', '')
-                    if payment_status == 'שולם':
-                        paid_count += 1
-                    elif 'חוב' in payment_status:
-                        debt_count += 1
-                    
-        return {"paid": paid_count, "debt": debt_count}
+        return _aggregate_students(DataStore.instance().student_models())['payment_status']
     except Exception:
         return {"paid": 0, "debt": 0}
 
 def get_groups_info():
     """Returns information about the groups"""
     try:
-        data_dir = ManageJSON.get_appdata_path() / "data"
-        groups_file = data_dir / "groups.json"
-        
-        if not groups_file.exists():
-            return []
-            
-        with open(groups_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'groups' in data:
-                return data['groups']
-            return []
-                
+        return DataStore.instance().load_groups()
     except Exception:
         return []
 
 def get_students_info():
     """Returns information about the students"""
     try:
-        data_dir = ManageJSON.get_appdata_path() / "data"
-        students_file = data_dir / "students.json"
-        
-        if not students_file.exists():
-            return []
-            
-        with open(students_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'students' in data:
-                return data['students']
-            return []
-                
+        return DataStore.instance().load_students()
     except Exception:
         return []
 
@@ -284,16 +140,39 @@ def format_currency(amount):
     return f"₪ {amount:,}".replace(',', ',')
 
 def get_all_dashboard_data():
-    """Returns all dashboard data in one structure"""
-    attendance_stats = get_attendance_statistics()
-    
-    return {
-        'total_students': get_total_students(),
-        'total_groups': get_total_groups(),
-        'monthly_payments': get_monthly_payments(),
-        'total_payments': get_total_payments_amount(),
-        'attendance_percentage': get_monthly_attendance_percentage(),
-        'all_time_attendance': get_all_time_attendance_percentage(),
-        'payment_status': get_students_by_payment_status(),
-        'attendance_stats': attendance_stats
-    }
\ No newline at end of file
+    """Returns all dashboard data in one structure, from the Student records and the monthly rollups"""
+    store = DataStore.instance()
+    current_month = _current_month()
+
+    dashboard_data = {
+        'total_students': 0,
+        'total_groups': 0,
+        'monthly_payments': 0,
+        'total_payments': 0,
+        'attendance_percentage': DEFAULT_ATTENDANCE_PERCENTAGE,
+        'all_time_attendance': DEFAULT_ATTENDANCE_PERCENTAGE,
+        'payment_status': {"paid": 0, "debt": 0},
+        'attendance_stats': {"present": 0, "absent": 0, "percentage": DEFAULT_ATTENDANCE_PERCENTAGE}
+    }
+
+    try:
+        dashboard_data.update(_aggregate_students(store.student_models()))
+    except Exception as e:
+        print(f"Error aggregating students for dashboard: {e}")
+
+    try:
+        dashboard_data.update(_aggregate_revenue(store.rollups().revenue(), current_month))
+    except Exception as e:
+        print(f"Error aggregating payments for dashboard: {e}")
+
+    try:
+        dashboard_data['total_groups'] = len(store.group_models())
+    except Exception as e:
+        print(f"Error loading groups for dashboard: {e}")
+
+    try:
+        dashboard_data.update(_aggregate_attendance(store.rollups().attendance_by_month(), current_month))
+    except Exception as e:
+        print(f"Error aggregating attendance for dashboard: {e}")
+
+    return dashboard_data
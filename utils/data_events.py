@@ -0,0 +1,116 @@
+import threading
+import weakref
+
+STUDENTS_CHANGED = "students_changed"
+GROUPS_CHANGED = "groups_changed"
+PAYMENTS_CHANGED = "payments_changed"
+PRICING_CHANGED = "pricing_changed"
+JOINING_DATES_CHANGED = "joining_dates_changed"
+ATTENDANCE_CHANGED = "attendance_changed"
+
+ALL_TOPICS = (
+    STUDENTS_CHANGED,
+    GROUPS_CHANGED,
+    PAYMENTS_CHANGED,
+    PRICING_CHANGED,
+    JOINING_DATES_CHANGED,
+    ATTENDANCE_CHANGED,
+)
+
+ADDED = "added"
+UPDATED = "updated"
+REMOVED = "removed"
+SAVED = "saved"
+FLUSHED = "flushed"
+
+
+class DataChange:
+    """One change to the data, as delivered to subscribers.
+
+    ``student_ids`` and ``group_ids`` are the affected records (as strings),
+    or None when any record may have changed, e.g. a whole file was saved;
+    subscribers then reload what they show. ``details`` holds extra fields
+    such as the attendance date. ``source`` is the object that made the
+    change, so a view can skip changes it already displays.
+    """
+
+    __slots__ = ("topic", "action", "student_ids", "group_ids", "source", "details")
+
+    def __init__(self, topic, action=SAVED, student_ids=None, group_ids=None, source=None, **details):
+        self.topic = topic
+        self.action = action
+        self.student_ids = frozenset(str(i) for i in student_ids) if student_ids is not None else None
+        self.group_ids = frozenset(str(i) for i in group_ids) if group_ids is not None else None
+        self.source = source
+        self.details = details
+
+    @property
+    def targeted(self):
+        """True when the change names the records it affects"""
+        return self.student_ids is not None or self.group_ids is not None
+
+    def affects_student(self, student_id):
+        return self.student_ids is None or str(student_id) in self.student_ids
+
+    def affects_group(self, group_id):
+        return self.group_ids is None or str(group_id) in self.group_ids
+
+    def __repr__(self):
+        return (f"DataChange({self.topic}, {self.action}, students={sorted(self.student_ids or [])}, "
+                f"groups={sorted(self.group_ids or [])}, {self.details})")
+
+
+class DataEvents:
+    """Publish/subscribe hub for data changes.
+
+    The data managers, the payment ledger and AttendanceUtils publish a
+    DataChange naming the affected ids; any other write of a data file
+    through the DataStore publishes an untargeted change for that file.
+    Callbacks are called as ``callback(change)`` on the thread that made
+    the change. Bound methods are held weakly, so a view that is no longer
+    shown stops receiving changes once it is garbage collected. Use
+    ``DataStore.events()`` to get the shared instance.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ref(callback):
+        if hasattr(callback, "__self__") and hasattr(callback, "__func__"):
+            return weakref.WeakMethod(callback)
+        return lambda: callback
+
+    def subscribe(self, topics, callback):
+        """Call `callback` whenever one of `topics` (a topic or a list of topics) is published"""
+        if isinstance(topics, str):
+            topics = [topics]
+        with self._lock:
+            for topic in topics:
+                refs = self._subscribers.setdefault(topic, [])
+                if all(ref() != callback for ref in refs):
+                    refs.append(self._ref(callback))
+
+    def unsubscribe(self, callback, topics=None):
+        """Stop calling `callback` for `topics` (all topics when None)"""
+        if isinstance(topics, str):
+            topics = [topics]
+        with self._lock:
+            for topic in (topics if topics is not None else list(self._subscribers)):
+                refs = self._subscribers.get(topic, [])
+                self._subscribers[topic] = [ref for ref in refs if ref() is not None and ref() != callback]
+
+    def publish(self, change: DataChange):
+        with self._lock:
+            refs = self._subscribers.get(change.topic, [])
+            callbacks = [ref() for ref in refs]
+            if None in callbacks:
+                self._subscribers[change.topic] = [ref for ref, callback in zip(refs, callbacks) if callback is not None]
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(change)
+            except Exception as e:
+                print(f"Error handling {change.topic} event: {e}")
@@ -0,0 +1,610 @@
+import copy
+import json
+import os
+import threading
+from utils.manage_json import ManageJSON
+from utils.atomic_io import JOURNAL_NAME, JournaledWrite, atomic_write_json, recover
+from utils.sqlite_store import ATTENDANCE_PREFIX, DB_NAME, SQLiteStore
+from utils.enrollments import dehydrate_student, group_refs, hydrate_student
+from utils.models import AttendanceRecord, Enrollment, Group, Payment, Student
+from utils.money import is_normalized, normalize_payment
+from utils.data_events import (
+    ADDED, ATTENDANCE_CHANGED, GROUPS_CHANGED, JOINING_DATES_CHANGED, PRICING_CHANGED, STUDENTS_CHANGED, UPDATED,
+    DataChange, DataEvents,
+)
+
+
+class StoreTransaction(JournaledWrite):
+    """``DataStore.transaction()``: a JournaledWrite that keeps the store's cache in sync.
+
+    The changes are published once every file is written, after the store
+    lock is released. With the SQLite backend the data held in the database
+    are written in one database transaction, before the journal replaces
+    any other file.
+    """
+
+    def __init__(self, store):
+        super().__init__(store.data_dir / JOURNAL_NAME, on_written=store._cache_written, prepare=store._prepare)
+        self.store = store
+        self._changes = {}
+
+    def write(self, path, data, indent=None, change=None):
+        """Stage the new content of a file; `change` is the DataChange to publish (default: the file's topic)"""
+        super().write(path, data, indent)
+        self._changes[str(path)] = change
+
+    def commit(self):
+        store = self.store
+        changes, self._changes = self._changes, {}
+        with store._lock:
+            staged = [(path, store._dataset(path)) for path in self._files]
+            staged = [(path, dataset, self._files.pop(path)[0]) for path, dataset in staged if dataset is not None]
+            if staged:
+                store.sqlite.write_many([(dataset, data, store._current(path)) for path, dataset, data in staged])
+                for path, _, data in staged:
+                    store._cache_written(path, data)
+            super().commit()
+        for path, change in changes.items():
+            store._publish(path, change)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._changes = {}
+        return super().__exit__(exc_type, exc, tb)
+
+
+class DataStore:
+    """Process-wide in-memory cache of the JSON data files.
+
+    Each file is parsed once and served from memory until its mtime or size
+    changes on disk. Objects returned by the read methods are shared between
+    all callers and must be treated as read-only; pass ``copy=True`` when the
+    result is going to be modified before saving.
+
+    Once the data has been migrated to SQLite (``python -m
+    utils.sqlite_store migrate``), students, groups, join dates and
+    attendance are read from and written to the database instead of their
+    files; see ``SQLiteStore``. The paths stay the names of the data.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, use_sqlite=True):
+        self.base_dir = ManageJSON.get_appdata_path()
+        self.data_dir = self.base_dir / "data"
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.attendances_dir = self.base_dir / "attendances"
+
+        self.students_file = self.data_dir / "students.json"
+        self.groups_file = self.data_dir / "groups.json"
+        self.joining_dates_file = self.data_dir / "joining_dates.json"
+        self.pricing_file = self.data_dir / "pricing.json"
+
+        self._lock = threading.RLock()
+        self._files = {}
+        self._derived = {}
+        self._ledger = None
+        self._status_cache = None
+        self._search_index = None
+        self._payment_totals = None
+        self._rollups = None
+        self._attendance_buffer = None
+        self._hydrated = None
+        self._student_records = {}
+        self._events = None
+        self.sqlite = None
+        self._recover()
+        if use_sqlite:
+            self._open_sqlite()
+
+    @classmethod
+    def instance(cls):
+        """Get the shared store, creating it on first use"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        """Drop the shared store (used when the AppData location changes)"""
+        with cls._instance_lock:
+            cls._instance = None
+
+    def _open_sqlite(self):
+        """Use the SQLite database for the data files once a migration has created it"""
+        try:
+            if SQLiteStore.is_available(self.data_dir / DB_NAME):
+                self.sqlite = SQLiteStore(self.data_dir / DB_NAME)
+                self.sqlite.connect()
+        except Exception as e:
+            print(f"Error opening database, using the JSON files: {e}")
+            self.sqlite = None
+
+    def _dataset(self, path):
+        """The database dataset that holds a data file, or None when the file is used"""
+        if self.sqlite is None:
+            return None
+        key = str(path)
+        datasets = {
+            str(self.students_file): "students",
+            str(self.groups_file): "groups",
+            str(self.joining_dates_file): "joining_dates",
+        }
+        if key in datasets:
+            return datasets[key]
+        name = os.path.basename(key)
+        if os.path.dirname(key) == str(self.attendances_dir) and name.startswith("attendance_") and name.endswith(".json"):
+            return ATTENDANCE_PREFIX + name[len("attendance_"):-len(".json")]
+        return None
+
+    def _signature(self, path):
+        dataset = self._dataset(path)
+        if dataset is not None:
+            return self.sqlite.signature(dataset)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def read(self, path, default=None, copy=False):
+        """Return the parsed JSON of a file, reloading only when it changed on disk"""
+        key = str(path)
+        signature = self._signature(key)
+        if signature is None:
+            return default
+
+        with self._lock:
+            cached = self._files.get(key)
+            if cached is None or cached[0] != signature:
+                dataset = self._dataset(key)
+                try:
+                    if dataset is not None:
+                        data = self.sqlite.load(dataset)
+                    else:
+                        with open(key, "r", encoding="utf-8") as f:
+                            data = json.load(f)
+                except Exception as e:
+                    print(f"Error loading {key}: {e}")
+                    return default
+                self._files[key] = (signature, data)
+                cached = self._files[key]
+
+        return self._copy(cached[1]) if copy else cached[1]
+
+    def _recover(self):
+        """Finish an interrupted multi-file update and remove temp files left by a crash"""
+        try:
+            if recover(self.data_dir / JOURNAL_NAME):
+                print("Recovered an interrupted data update")
+            for directory in (self.data_dir, self.attendances_dir):
+                if directory.exists():
+                    for temp_file in directory.glob("*.tmp"):
+                        temp_file.unlink()
+        except Exception as e:
+            print(f"Error recovering data files: {e}")
+
+    def _cache_written(self, path, data):
+        key = str(path)
+        with self._lock:
+            self._files[key] = (self._signature(key), data)
+            # Indexes are only derived from the data files; writing a cache (payment statuses, rollups) keeps them
+            if self._topic(key) is not None:
+                self._derived.clear()
+
+    def _publish(self, path, change=None):
+        """Publish the change of a written file; never called with the store lock held"""
+        if self._events is None:
+            return
+        if change is None:
+            topic = self._topic(str(path))
+            change = DataChange(topic, path=str(path)) if topic else None
+        if change is not None:
+            self._events.publish(change)
+
+    def _topic(self, path):
+        """Change event published when a file is written (None for caches and other files)"""
+        topics = {
+            str(self.students_file): STUDENTS_CHANGED,
+            str(self.groups_file): GROUPS_CHANGED,
+            str(self.joining_dates_file): JOINING_DATES_CHANGED,
+            str(self.pricing_file): PRICING_CHANGED,
+        }
+        if path in topics:
+            return topics[path]
+        if os.path.dirname(path) == str(self.attendances_dir):
+            return ATTENDANCE_CHANGED
+        return None
+
+    def _prepare(self, path, data):
+        """Convert data to its on-disk form (models become dicts, students keep group ids, not names; amounts are normalised)"""
+        data = self._dehydrate(data)
+        if str(path) == str(self.students_file) and isinstance(data, dict) and isinstance(data.get("students"), list):
+            groups_by_id, groups_by_name = self.groups_by_id(), self.groups_by_name()
+            data = dict(data, students=[
+                self._prepare_student(dehydrate_student(student, groups_by_id, groups_by_name))
+                if isinstance(student, dict) else student
+                for student in data["students"]
+            ])
+        return data
+
+    @staticmethod
+    def _dehydrate(data):
+        """The file format of data given as models (a list of AttendanceRecord, or lists of records in a dict)"""
+        if isinstance(data, list) and data and all(isinstance(record, AttendanceRecord) for record in data):
+            return AttendanceRecord.to_file(data)
+        if not isinstance(data, dict):
+            return data
+        models = (Student, Group, Enrollment, Payment)
+        dehydrated = None
+        for key, value in data.items():
+            if isinstance(value, list) and any(isinstance(item, models) for item in value):
+                if dehydrated is None:
+                    dehydrated = dict(data)
+                dehydrated[key] = [item.to_dict() if isinstance(item, models) else item for item in value]
+        return dehydrated if dehydrated is not None else data
+
+    @staticmethod
+    def _prepare_student(student):
+        payments = student.get("payments")
+        if not isinstance(payments, list) or all(is_normalized(payment) for payment in payments):
+            return student
+        return dict(student, payments=[normalize_payment(payment) for payment in payments])
+
+    def write(self, path, data, indent=None, change=None):
+        """Atomically write data as JSON and keep the cached copy in sync.
+
+        `change` is the DataChange to publish; by default an untargeted
+        change of the file's topic is published.
+        """
+        with self._lock:
+            data = self._prepare(path, data)
+            dataset = self._dataset(path)
+            if dataset is not None:
+                self.sqlite.write(dataset, data, self._current(path))
+            else:
+                atomic_write_json(path, data, indent)
+            self._cache_written(path, data)
+        # Subscribers take their own locks (rollups, views), so they are called after the store lock is released
+        self._publish(path, change)
+
+    def transaction(self):
+        """Write several files all-or-nothing: ``with store.transaction() as tx: tx.write(...)``"""
+        return StoreTransaction(self)
+
+    def _current(self, path):
+        """The cached data of a file if it is still what is stored, else None"""
+        cached = self._files.get(str(path))
+        return cached[1] if cached is not None and cached[0] == self._signature(path) else None
+
+    def invalidate(self, path=None):
+        """Forget cached data for one file, or for every file"""
+        with self._lock:
+            if path is None:
+                self._files.clear()
+            else:
+                self._files.pop(str(path), None)
+            self._derived.clear()
+
+    def _copy(self, data):
+        return copy.deepcopy(data)
+
+    def _derive(self, name, source, build):
+        """Cache a value computed from a loaded snapshot, rebuilding it when the snapshot is replaced"""
+        with self._lock:
+            cached = self._derived.get(name)
+            if cached is not None and cached[0] is source:
+                return cached[1]
+            value = build(source)
+            self._derived[name] = (source, value)
+            return value
+
+    def events(self):
+        """Get the hub that publishes data change events"""
+        with self._lock:
+            if self._events is None:
+                self._events = DataEvents()
+            return self._events
+
+    def payment_ledger(self):
+        """Get the payment ledger that is replayed on top of students.json"""
+        with self._lock:
+            if self._ledger is None:
+                from utils.payment_ledger import PaymentLedger
+                self._ledger = PaymentLedger(self)
+            return self._ledger
+
+    def payment_status_cache(self):
+        """Get the persisted cache of per-student payment summaries"""
+        with self._lock:
+            if self._status_cache is None:
+                from utils.payment_status_cache import PaymentStatusCache
+                self._status_cache = PaymentStatusCache(self)
+            return self._status_cache
+
+    def rollups(self):
+        """Get the monthly revenue and attendance rollups"""
+        with self._lock:
+            if self._rollups is None:
+                from utils.rollups import Rollups
+                self._rollups = Rollups(self)
+            return self._rollups
+
+    def attendance_buffer(self):
+        """Get the write-behind buffer for attendance changes"""
+        with self._lock:
+            if self._attendance_buffer is None:
+                from utils.attendance_write_buffer import AttendanceWriteBuffer
+                self._attendance_buffer = AttendanceWriteBuffer(self)
+            return self._attendance_buffer
+
+    def flush_attendance(self, group_id=None):
+        """Write buffered attendance changes (of one group, or all) to disk"""
+        if self._attendance_buffer is not None:
+            return self._attendance_buffer.flush(group_id)
+        return True
+
+    def student_search_index(self):
+        """Get the student search index, synced with the current students"""
+        with self._lock:
+            if self._search_index is None:
+                from utils.student_search_index import StudentSearchIndex
+                self._search_index = StudentSearchIndex()
+            index = self._search_index
+        index.sync(self.load_students())
+        return index
+
+    def payment_totals(self):
+        """Get the per-student payment totals, synced with the current students"""
+        with self._lock:
+            if self._payment_totals is None:
+                from utils.payment_totals import PaymentTotalsIndex
+                self._payment_totals = PaymentTotalsIndex()
+            index = self._payment_totals
+        index.sync(self.load_students())
+        return index
+
+    def _hydrate_students(self, students):
+        """Fill in group names from group ids, once per students/groups snapshot"""
+        groups = self.load_groups()
+        with self._lock:
+            cached = self._hydrated
+            if cached is not None and cached[0] is students and cached[1] is groups:
+                return cached[2]
+            groups_by_id = self.groups_by_id()
+            hydrated = [hydrate_student(student, groups_by_id) if isinstance(student, dict) else student
+                        for student in students]
+            self._hydrated = (students, groups, hydrated)
+            return hydrated
+
+    def load_students(self, copy=False):
+        """Get the students list, with group names and recorded payment changes applied"""
+        data = self.read(self.students_file, {})
+        students = data.get("students", []) if isinstance(data, dict) else []
+        students = self.payment_ledger().apply(self._hydrate_students(students))
+        return self._copy(students) if copy else students
+
+    def student_group_refs(self, student):
+        """(group name, group id) pairs of a loaded student (dict or Student), without name lookups for stored ids"""
+        return group_refs(student, self.groups_by_id(), self.groups_by_name())
+
+    def migrate_enrollments(self):
+        """Rewrite students.json with group ids if any student still references groups by name only"""
+        data = self.read(self.students_file, None)
+        if not isinstance(data, dict) or not isinstance(data.get("students"), list):
+            return False
+        if all(not isinstance(s, dict) or "group_ids" in s or not isinstance(s.get("groups"), list)
+               for s in data["students"]):
+            return False
+        self.write(self.students_file, data)
+        return True
+
+    def migrate_payment_amounts(self):
+        """Rewrite students.json with amounts in agorot if any stored payment is not normalised yet"""
+        data = self.read(self.students_file, None)
+        if not isinstance(data, dict) or not isinstance(data.get("students"), list):
+            return False
+        if all(not isinstance(s, dict) or not isinstance(s.get("payments"), list)
+               or all(is_normalized(payment) for payment in s["payments"])
+               for s in data["students"]):
+            return False
+        self.write(self.students_file, data)
+        return True
+
+    def load_groups(self, copy=False):
+        """Get the groups list"""
+        data = self.read(self.groups_file, {})
+        groups = data.get("groups", []) if isinstance(data, dict) else []
+        return self._copy(groups) if copy else groups
+
+    def load_joining_dates(self, copy=False):
+        """Get the joining dates mapping (group id -> list of join records)"""
+        data = self.read(self.joining_dates_file, {})
+        if not isinstance(data, dict):
+            data = {}
+        return self._copy(data) if copy else data
+
+    def set_join_date(self, group_id, student_id, student_name, join_date, tx=None):
+        """Add or update a student's join record in a group (staged in the transaction `tx` when given)"""
+        group_id = str(group_id)
+        data = self.load_joining_dates(copy=True)
+        position = self._join_date_positions().get((group_id, str(student_id)))
+        records = data.setdefault(group_id, [])
+        if position is not None:
+            records[position]["student_name"] = student_name
+            records[position]["join_date"] = join_date
+        else:
+            records.append({"student_id": student_id, "student_name": student_name, "join_date": join_date})
+        (tx or self).write(self.joining_dates_file, data, indent=2, change=DataChange(
+            JOINING_DATES_CHANGED, UPDATED if position is not None else ADDED,
+            student_ids=[student_id], group_ids=[group_id],
+        ))
+
+    def load_pricing(self):
+        """Get the pricing configuration"""
+        data = self.read(self.pricing_file, {})
+        return data if isinstance(data, dict) else {}
+
+    def attendance_file(self, group_id):
+        return self.attendances_dir / f"attendance_{group_id}.json"
+
+    def load_attendance(self, group_id, copy=False):
+        """Get the raw attendance mapping of a group (date -> student id -> bool)"""
+        self.flush_attendance(group_id)
+        data = self.read(self.attendance_file(group_id), {}, copy=copy)
+        return data if isinstance(data, dict) else {}
+
+    def _attendance_matrix(self, path):
+        from utils.attendance_matrix import AttendanceMatrix
+        data = self.read(path, {})
+        if not isinstance(data, dict):
+            data = {}
+        return self._derive(f"attendance_matrix:{path}", data, AttendanceMatrix.from_dict)
+
+    def _attendance_records(self, group_id, path):
+        data = self.read(path, {})
+        if not isinstance(data, dict):
+            data = {}
+        return self._derive(f"attendance_records:{path}", data,
+                            lambda attendance: AttendanceRecord.from_file(group_id, attendance))
+
+    def attendance_records(self, group_id):
+        """The attendance marks of a group as typed AttendanceRecord records, in file order"""
+        self.flush_attendance(group_id)
+        return self._attendance_records(group_id, self.attendance_file(group_id))
+
+    def attendance_matrix(self, group_id):
+        """Get the attendance of a group as an AttendanceMatrix"""
+        self.flush_attendance(group_id)
+        return self._attendance_matrix(self.attendance_file(group_id))
+
+    def attendance_group_ids(self):
+        """Ids of the groups that have an attendance file"""
+        if self.sqlite is not None:
+            return self.sqlite.attendance_group_ids()
+        if not self.attendances_dir.exists():
+            return []
+        return [
+            filename[len("attendance_"):-len(".json")]
+            for filename in sorted(os.listdir(self.attendances_dir))
+            if filename.startswith("attendance_") and filename.endswith(".json")
+        ]
+
+    def attendance_matrices(self):
+        """Get an AttendanceMatrix for every attendance file"""
+        self.flush_attendance()
+        return [self._attendance_matrix(self.attendance_file(group_id)) for group_id in self.attendance_group_ids()]
+
+    def students_by_id(self):
+        """Index of students by id (first record wins, like a linear scan)"""
+        def build(students):
+            index = {}
+            for student in students:
+                index.setdefault(student.get("id"), student)
+            return index
+        return self._derive("students_by_id", self.load_students(), build)
+
+    def students_stats(self):
+        """Totals shown above the students table (paid = stored status starting with "שולם")"""
+        def build(students):
+            paid = len([s for s in students if isinstance(s.get("payment_status"), str) and s.get("payment_status").startswith("שולם")])
+            return {"total": len(students), "paid": paid, "unpaid": len(students) - paid}
+        return self._derive("students_stats", self.load_students(), build)
+
+    def groups_by_id(self):
+        """Index of groups by id"""
+        def build(groups):
+            index = {}
+            for group in groups:
+                index.setdefault(group.get("id"), group)
+            return index
+        return self._derive("groups_by_id", self.load_groups(), build)
+
+    def groups_by_name(self):
+        """Index of groups by name"""
+        def build(groups):
+            index = {}
+            for group in groups:
+                index.setdefault(group.get("name"), group)
+            return index
+        return self._derive("groups_by_name", self.load_groups(), build)
+
+    def _join_date_positions(self):
+        """(group id, student id) -> position of the student's record in the group list"""
+        def build(joining_dates):
+            index = {}
+            for group_id, records in joining_dates.items():
+                if not isinstance(records, list):
+                    continue
+                for position, record in enumerate(records):
+                    if isinstance(record, dict):
+                        index.setdefault((str(group_id), str(record.get("student_id"))), position)
+            return index
+        return self._derive("join_date_positions", self.load_joining_dates(), build)
+
+    def join_dates_index(self):
+        """Index of join dates by (group id, student id), both as strings; first record wins"""
+        def build(joining_dates):
+            index = {}
+            for group_id, records in joining_dates.items():
+                if not isinstance(records, list):
+                    continue
+                for record in records:
+                    if isinstance(record, dict):
+                        index.setdefault((str(group_id), str(record.get("student_id"))), record.get("join_date"))
+            return index
+        return self._derive("join_dates_index", self.load_joining_dates(), build)
+
+    def student_join_dates(self, student_id):
+        """(group id, join date) pairs of a student across all groups, in file order"""
+        def build(index):
+            by_student = {}
+            for (group_id, sid), join_date in index.items():
+                by_student.setdefault(sid, []).append((group_id, join_date))
+            return by_student
+        return self._derive("join_dates_by_student", self.join_dates_index(), build).get(str(student_id), [])
+
+    def student_models(self):
+        """The loaded students as typed Student records; a student whose dict is unchanged keeps its record"""
+        def build(students):
+            previous = self._student_records
+            records = {}
+            models = []
+            for student in students:
+                if not isinstance(student, dict):
+                    continue
+                entry = previous.get(id(student))
+                if entry is None or entry[0] is not student:
+                    entry = (student, Student.from_dict(student))
+                records[id(student)] = entry
+                models.append(entry[1])
+            self._student_records = records
+            return models
+        return self._derive("student_models", self.load_students(), build)
+
+    def student_models_by_id(self):
+        """Index of Student records by id (first record wins, like students_by_id)"""
+        def build(students):
+            index = {}
+            for student in students:
+                index.setdefault(student.id, student)
+            return index
+        return self._derive("student_models_by_id", self.student_models(), build)
+
+    def group_models(self):
+        """The groups as typed Group records"""
+        return self._derive("group_models", self.load_groups(),
+                            lambda groups: [Group.from_dict(g) for g in groups if isinstance(g, dict)])
+
+    def enrollments(self):
+        """The join records as typed Enrollment records, in file order"""
+        def build(joining_dates):
+            return [
+                Enrollment.from_dict(group_id, record)
+                for group_id, records in joining_dates.items() if isinstance(records, list)
+                for record in records if isinstance(record, dict)
+            ]
+        return self._derive("enrollments", self.load_joining_dates(), build)
@@ -0,0 +1,202 @@
+import csv
+from datetime import datetime, timedelta
+from utils.data_store import DataStore
+from utils.models import parse_date, parse_datetime
+from utils.money import format_amount, payment_agorot, to_agorot
+
+AGING_BUCKETS = (
+    ("0-30", 30),
+    ("31-60", 60),
+    ("61-90", 90),
+    ("90+", None),
+)
+NO_TEACHER = "לא צוין"
+
+
+def aging_bucket(days) -> str:
+    """Label of the bucket for a charge owed `days` days"""
+    for label, limit in AGING_BUCKETS:
+        if limit is None or days <= limit:
+            return label
+    return AGING_BUCKETS[-1][0]
+
+
+def _empty_buckets():
+    return {label: 0 for label, _ in AGING_BUCKETS}
+
+
+def _add_buckets(target, buckets):
+    for label, agorot in buckets.items():
+        target[label] += agorot
+
+
+def _split(agorot, keys):
+    """`agorot` divided evenly between `keys` (the remainder goes to the first)"""
+    part, rest = divmod(agorot, len(keys))
+    return [(key, part + (rest if index == 0 else 0)) for index, key in enumerate(keys)]
+
+
+class DebtAgingReport:
+    """Outstanding balances bucketed by how long they have been owed.
+
+    The charges of a student are the periods of
+    ``calculate_student_payment_until_now_with_correct_discounts`` (up to
+    the end of the current month) laid out by month: a period charges its
+    first month payment on its start date and its monthly price on the
+    first of each remaining month. Payments dated up to the report date
+    (and undated ones) pay off the oldest charges first; whatever is left
+    of a charge is owed since its date. A charge of several groups is
+    divided evenly between them for the group and teacher subtotals.
+
+    Every student is visited once, in one pass over the loaded snapshots,
+    and the subtotals are added up as the rows are produced.
+    """
+
+    def __init__(self, calculator=None, today=None):
+        from utils.payment_utils import PaymentCalculator
+
+        self.store = DataStore.instance()
+        self.calculator = calculator or PaymentCalculator()
+        self.today = today or datetime.now()
+
+    def _charges(self, student_id):
+        """(date, agorot, group ids) of every monthly charge up to the end of the current month, oldest first"""
+        end_of_current_month = self.calculator.get_end_of_month(self.today)
+        periods = self.calculator.create_discount_periods_for_student(student_id, end_of_current_month)
+        charges = []
+        for period in periods:
+            result = self.calculator.calculate_period_payment_with_discount_rules(student_id, period)
+            if not result.get("success"):
+                continue
+            group_ids = [str(g["group_id"]) for g in period["active_groups"]]
+            start = parse_datetime(period["start_date"])
+            first_payment = to_agorot(result["first_month_payment"]) or 0
+            if first_payment:
+                charges.append((start.date(), first_payment, group_ids))
+            price = to_agorot(result["monthly_price"]) or 0
+            month = start.replace(day=1)
+            for _ in range(result["remaining_months"]):
+                month = self.calculator.get_end_of_month(month) + timedelta(days=1)
+                charges.append((month.date(), price, group_ids))
+        charges.sort(key=lambda charge: charge[0])
+        return charges
+
+    def _paid(self, student):
+        """Agorot paid up to the report date"""
+        today = self.today.date()
+        paid = 0
+        for payment in student.get("payments", []):
+            agorot = payment_agorot(payment)
+            if agorot is None:
+                continue
+            payment_date = parse_date(payment.get("date"))
+            if payment_date is None or payment_date <= today:
+                paid += agorot
+        return paid
+
+    def student_row(self, student):
+        """Aging of one student: buckets in agorot, by bucket and by group; None when nothing is owed"""
+        student_id = student.get("id")
+        charges = self._charges(student_id)
+        credit = self._paid(student)
+        today = self.today.date()
+
+        buckets = _empty_buckets()
+        by_group = {}
+        for charge_date, agorot, group_ids in charges:
+            covered = min(credit, agorot)
+            credit -= covered
+            owed = agorot - covered
+            if not owed:
+                continue
+            label = aging_bucket(max(0, (today - charge_date).days))
+            buckets[label] += owed
+            for group_id, part in _split(owed, group_ids):
+                by_group.setdefault(group_id, _empty_buckets())[label] += part
+
+        total = sum(buckets.values())
+        if not total:
+            return None
+        return {
+            "student_id": student_id,
+            "student_name": student.get("name", ""),
+            "groups": student.get("groups", []),
+            "buckets": buckets,
+            "total": total,
+            "by_group": by_group,
+        }
+
+    def build(self, students=None):
+        """Rows of the students who owe money, with subtotals per group, per teacher and for the school"""
+        if students is None:
+            students = self.store.load_students()
+        self.calculator.load_pricing_config()
+        groups_by_id = {str(group_id): group for group_id, group in self.store.groups_by_id().items()}
+
+        rows = []
+        by_group = {}
+        by_teacher = {}
+        school = _empty_buckets()
+        seen = set()
+        for student in students:
+            student_id = student.get("id")
+            if student_id is None or student_id in seen:
+                continue
+            seen.add(student_id)
+            try:
+                row = self.student_row(student)
+            except Exception as e:
+                print(f"Error computing debt aging for student {student_id}: {e}")
+                continue
+            if row is None:
+                continue
+            rows.append(row)
+            _add_buckets(school, row["buckets"])
+            for group_id, buckets in row["by_group"].items():
+                group = groups_by_id.get(group_id, {})
+                _add_buckets(by_group.setdefault(group_id, _empty_buckets()), buckets)
+                teacher = (group.get("teacher") or "").strip() or NO_TEACHER
+                _add_buckets(by_teacher.setdefault(teacher, _empty_buckets()), buckets)
+
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return {
+            "date": self.today.strftime("%d/%m/%Y"),
+            "rows": rows,
+            "by_group": {
+                group_id: {"name": groups_by_id.get(group_id, {}).get("name", group_id), "buckets": buckets}
+                for group_id, buckets in by_group.items()
+            },
+            "by_teacher": by_teacher,
+            "total": school,
+        }
+
+    def export_csv(self, path, report=None):
+        """Write the report as a CSV file (UTF-8 with BOM so Excel shows the Hebrew)"""
+        report = report or self.build()
+        labels = [label for label, _ in AGING_BUCKETS]
+
+        def amounts(buckets):
+            return [format_amount(buckets[label]) for label in labels] + [format_amount(sum(buckets.values()))]
+
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow([f"דוח גיל חובות נכון ל-{report['date']}"])
+            writer.writerow(["תלמידה", "מזהה", "קבוצות"] + labels + ["סה\"כ"])
+            for row in report["rows"]:
+                writer.writerow([row["student_name"], row["student_id"], ", ".join(row["groups"])] + amounts(row["buckets"]))
+            writer.writerow([])
+            writer.writerow(["קבוצה", "", ""] + labels + ["סה\"כ"])
+            for group in sorted(report["by_group"].values(), key=lambda group: str(group["name"])):
+                writer.writerow([group["name"], "", ""] + amounts(group["buckets"]))
+            writer.writerow([])
+            writer.writerow(["מורה", "", ""] + labels + ["סה\"כ"])
+            for teacher in sorted(report["by_teacher"]):
+                writer.writerow([teacher, "", ""] + amounts(report["by_teacher"][teacher]))
+            writer.writerow([])
+            writer.writerow(["סה\"כ", "", ""] + amounts(report["total"]))
+        return report
+
+
+def export_debt_aging_csv(path):
+    """Build the debt aging report and write it to `path`; returns the report"""
+    return DebtAgingReport().export_csv(path)
@@ -0,0 +1,80 @@
+"""Group enrollments of students, stored by group id.
+
+students.json keeps a student's groups as ``group_ids``; the ``groups`` list
+of names that the rest of the app works with is filled in from groups.json
+when students are loaded, so renaming a group only rewrites groups.json.
+Names that do not match any group are kept as-is in ``groups`` on disk.
+Students saved before ids were introduced (``groups`` names only) are read
+unchanged and converted the next time they are written.
+"""
+
+
+def _names(group_ids, groups_by_id):
+    return [groups_by_id[group_id].get("name") for group_id in group_ids if group_id in groups_by_id]
+
+
+def hydrate_student(student, groups_by_id):
+    """The student as the app sees it: ``groups`` holds names (resolved ids first, then unresolved names)"""
+    group_ids = student.get("group_ids")
+    if not isinstance(group_ids, list):
+        return student
+    unresolved = student.get("groups")
+    names = _names(group_ids, groups_by_id)
+    if isinstance(unresolved, list):
+        names.extend(unresolved)
+    return dict(student, groups=names)
+
+
+def dehydrate_student(student, groups_by_id, groups_by_name):
+    """The student as stored: ``group_ids`` plus the names that match no group"""
+    names = student.get("groups")
+    if not isinstance(names, list):
+        return student
+
+    # Keep the stored ids while they still spell the same names, so a student
+    # in one of two groups sharing a name stays in the right one
+    group_ids = []
+    stored_ids = student.get("group_ids")
+    if isinstance(stored_ids, list):
+        stored_ids = [group_id for group_id in stored_ids if group_id in groups_by_id]
+        if names[:len(stored_ids)] == _names(stored_ids, groups_by_id):
+            group_ids = list(stored_ids)
+            names = names[len(stored_ids):]
+
+    unresolved = []
+    for name in names:
+        group = groups_by_name.get(name)
+        if group is not None and group.get("id") not in group_ids:
+            group_ids.append(group.get("id"))
+        elif group is None:
+            unresolved.append(name)
+
+    stored = {key: value for key, value in student.items() if key != "groups"}
+    stored["group_ids"] = group_ids
+    if unresolved:
+        stored["groups"] = unresolved
+    return stored
+
+
+def group_refs(student, groups_by_id, groups_by_name):
+    """(group name, group id) pairs of a student's groups (dict or Student); id is None for unknown names"""
+    if isinstance(student, dict):
+        group_ids = student.get("group_ids")
+        names = student.get("groups", [])
+    else:
+        group_ids, names = list(student.group_ids), list(student.groups)
+    if not isinstance(names, list):
+        names = []
+
+    refs = []
+    if isinstance(group_ids, list):
+        for group_id in group_ids:
+            group = groups_by_id.get(group_id)
+            if group is not None:
+                refs.append((group.get("name"), group_id))
+        names = names[len(refs):]
+
+    for name in names:
+        group = groups_by_name.get(name)
+        refs.append((name, group.get("id") if group is not None else None))
+    return refs
@@ -0,0 +1,129 @@
+from datetime import datetime
+from itertools import accumulate
+from utils.data_store import DataStore
+from utils.money import to_agorot
+from utils.models import parse_datetime
+
+HISTORY_MONTHS = 24
+
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+
+def _month_label(index):
+    year, month = divmod(index, 12)
+    return f"{month + 1:02d}/{year}"
+
+
+def revenue_history(months=HISTORY_MONTHS, today=None):
+    """(month, shekels) for each of the last `months` months up to the current one, from the revenue rollup"""
+    today = today or datetime.now()
+    revenue = DataStore.instance().rollups().revenue()
+    last = _month_index(today.year, today.month)
+    history = []
+    for index in range(last - months + 1, last + 1):
+        month = _month_label(index)
+        history.append((month, revenue.get(month, {}).get("total", 0) / 100))
+    return history
+
+
+class ReceivablesForecast:
+    """Expected charges per month, from next month to the last group end date.
+
+    Every student with a join record is priced with ``PaymentCalculator``'s
+    period logic, once per student up to the latest end date of their
+    groups: a period charges its first month payment in its first month and
+    its monthly price in each remaining month. Rather than pricing every
+    student for every month, each period adds a few entries to one
+    difference array over the months (the first payment in and out again a
+    month later, the price in from the second month and out after the last
+    one), and a single running sum turns it into the monthly totals. The
+    cost grows with the number of periods, not students x months.
+    """
+
+    def __init__(self, calculator=None):
+        from utils.payment_utils import PaymentCalculator
+
+        self.store = DataStore.instance()
+        self.calculator = calculator or PaymentCalculator()
+
+    def _student_end_dates(self):
+        """Latest group end date of every student with a join record (groups without an end date are skipped)"""
+        groups_by_id = {str(group.id): group for group in self.store.group_models()}
+        end_dates = {}
+        for enrollment in self.store.enrollments():
+            group = groups_by_id.get(enrollment.group_id)
+            if group is None or group.end_date is None:
+                continue
+            student_id = str(enrollment.student_id)
+            current = end_dates.get(student_id)
+            if current is None or group.end_date > current:
+                end_dates[student_id] = group.end_date
+        return end_dates
+
+    def project(self, today=None):
+        """Expected charges of the whole school: {"months": [...], "amounts": [shekels, ...], "students": n}"""
+        today = today or datetime.now()
+        first = _month_index(today.year, today.month) + 1
+        self.calculator.load_pricing_config()
+
+        end_dates = self._student_end_dates()
+        last_end = max(end_dates.values(), default=None)
+        horizon = _month_index(last_end.year, last_end.month) + 1 - first if last_end else 0
+        if horizon <= 0:
+            return {"months": [], "amounts": [], "students": 0}
+
+        # Join records hold ids as text; legacy students.json records may hold them as ints
+        students_by_id = {}
+        for student_id, student in self.store.students_by_id().items():
+            students_by_id.setdefault(str(student_id), student)
+        # One extra column catches the -price of periods running to the last month
+        diff = [0] * (horizon + 1)
+        priced = 0
+        for student_id, end_date in end_dates.items():
+            student = students_by_id.get(student_id)
+            if student is None:
+                continue
+            end = datetime(end_date.year, end_date.month, end_date.day)
+            periods = self.calculator.create_discount_periods_for_student(student.get("id"), end)
+            if not periods:
+                continue
+            priced += 1
+            for period in periods:
+                result = self.calculator.calculate_period_payment_with_discount_rules(student.get("id"), period)
+                if not result.get("success"):
+                    continue
+                start = parse_datetime(period["start_date"])
+                offset = _month_index(start.year, start.month) - first
+                price = to_agorot(result["monthly_price"]) or 0
+                if offset >= 0:
+                    first_payment = to_agorot(result["first_month_payment"]) or 0
+                    diff[min(offset, horizon)] += first_payment
+                    diff[min(offset + 1, horizon)] -= first_payment
+                # Months before the first projected one fold into column 0
+                diff[max(0, min(offset + 1, horizon))] += price
+                diff[max(0, min(offset + 1 + result["remaining_months"], horizon))] -= price
+
+        amounts = list(accumulate(diff[:horizon]))
+        return {
+            "months": [_month_label(first + column) for column in range(horizon)],
+            "amounts": [amount / 100 for amount in amounts],
+            "students": priced,
+        }
+
+
+def get_forecast_data(today=None):
+    """Revenue history and projected receivables for the dashboard panel"""
+    try:
+        history = revenue_history(today=today)
+    except Exception as e:
+        print(f"Error loading revenue history: {e}")
+        history = []
+    try:
+        forecast = ReceivablesForecast().project(today)
+    except Exception as e:
+        print(f"Error projecting receivables: {e}")
+        forecast = {"months": [], "amounts": [], "students": 0}
+    return {"history": history, "forecast": list(zip(forecast["months"], forecast["amounts"])),
+            "forecast_students": forecast["students"]}
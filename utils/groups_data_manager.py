@@ -1,5 +1,6 @@
-import json
 from utils.manage_json import ManageJSON  
+from utils.data_store import DataStore
+from utils.data_events import ADDED, GROUPS_CHANGED, DataChange
 
 class GroupsDataManager:
     """Manager for groups data operations"""
@@ -8,12 +9,16 @@ class GroupsDataManager:
         data_dir = ManageJSON.get_appdata_path() / "data"
         data_dir.mkdir(parents=True, exist_ok=True)
         self.groups_file = data_dir / "groups.json"
+        self.store = DataStore.instance()
     
     def load_groups(self):
         """Load groups from JSON file"""
         try:
-            with open(self.groups_file, encoding="utf-8") as f:
-                return json.load(f)
+            data = self.store.read(self.groups_file, copy=True)
+            if not isinstance(data, dict):
+                return {"groups": []}
+            data.setdefault("groups", [])
+            return data
         except Exception:
             return {"groups": []}
 
@@ -51,8 +56,8 @@ class GroupsDataManager:
             data["groups"].append(new_group)
             
             # Save to file
-            with open(self.groups_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.store.write(self.groups_file, data, indent=2,
+                             change=DataChange(GROUPS_CHANGED, ADDED, group_ids=[new_id]))
             
             return True, "הקבוצה נוספה בהצלחה!"
             
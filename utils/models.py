@@ -0,0 +1,258 @@
+"""Typed, slotted records of the school data.
+
+The JSON files hold dicts whose fields are parsed again by every consumer:
+dates are "%d/%m/%Y" strings, amounts are strings such as "1,200" or
+numbers, and older students keep a single ``group`` instead of ``groups``.
+The classes here parse those fields once, when a snapshot is loaded:
+dates become ``date`` objects and amounts become integer agorot. Use the
+``DataStore`` accessors (``student_models``, ``student_models_by_id``,
+``group_models``, ``enrollments``, ``attendance_records``) to get them;
+they are built once per loaded snapshot. ``DataStore.write`` turns them
+back into the file format with ``to_dict``, so the dict form is only
+needed where data is written.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from utils.money import AGOROT_FIELD, format_amount, payment_agorot, to_agorot
+
+DATE_FORMAT = "%d/%m/%Y"
+
+
+@lru_cache(maxsize=8192)
+def parse_datetime(text) -> datetime:
+    """strptime with the app's date format, cached (the same dates are parsed over and over)"""
+    return datetime.strptime(text, DATE_FORMAT)
+
+
+def parse_date(text) -> Optional[date]:
+    """The date of a "%d/%m/%Y" string, or None when it is missing or malformed"""
+    if isinstance(text, date):
+        return text if not isinstance(text, datetime) else text.date()
+    if not isinstance(text, str) or not text:
+        return None
+    try:
+        return parse_datetime(text).date()
+    except ValueError:
+        return None
+
+
+def format_date(value) -> str:
+    return value.strftime(DATE_FORMAT) if value else ""
+
+
+def _extra(data, known):
+    extra = {key: value for key, value in data.items() if key not in known}
+    return extra or None
+
+
+@dataclass(slots=True)
+class Payment:
+    amount: Optional[int]
+    date: Optional[date]
+    method: str = ""
+    note: str = ""
+    check_number: str = ""
+    extra: Optional[Dict[str, Any]] = None
+
+    KNOWN_FIELDS = frozenset({"amount", AGOROT_FIELD, "date", "payment_method", "note", "check_number"})
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Payment":
+        """Parse a stored payment; an amount or date that does not parse is kept as-is in ``extra``"""
+        amount = payment_agorot(data)
+        day = parse_date(data.get("date"))
+        known = cls.KNOWN_FIELDS
+        if amount is None:
+            known = known - {"amount"}
+        if day is None:
+            known = known - {"date"}
+        return cls(
+            amount=amount,
+            date=day,
+            method=data.get("payment_method", "") or "",
+            note=data.get("note", "") or "",
+            check_number=data.get("check_number", "") or "",
+            extra=_extra(data, known),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        if self.amount is not None:
+            data["amount"] = format_amount(self.amount)
+            data[AGOROT_FIELD] = self.amount
+        if self.date is not None:
+            data["date"] = format_date(self.date)
+        data["payment_method"] = self.method
+        if self.note:
+            data["note"] = self.note
+        if self.check_number:
+            data["check_number"] = self.check_number
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Student:
+    id: Any
+    name: str
+    phone: str = ""
+    groups: Tuple[str, ...] = ()
+    group_ids: Tuple[Any, ...] = ()
+    join_date: Optional[date] = None
+    has_sister: bool = False
+    payment_status: str = ""
+    payments: Tuple[Payment, ...] = ()
+    extra: Optional[Dict[str, Any]] = None
+
+    KNOWN_FIELDS = frozenset({"id", "name", "phone", "groups", "group", "group_ids", "join_date",
+                              "has_sister", "payment_status", "payments"})
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Student":
+        """Parse a loaded student; a legacy single ``group`` becomes ``groups``, a join date that does not parse stays in ``extra``"""
+        groups = data.get("groups")
+        if not isinstance(groups, list):
+            groups = [data["group"]] if data.get("group") else []
+        group_ids = data.get("group_ids")
+        payments = data.get("payments")
+        join_date = parse_date(data.get("join_date"))
+        known = cls.KNOWN_FIELDS if join_date is not None or not data.get("join_date") else cls.KNOWN_FIELDS - {"join_date"}
+        return cls(
+            id=data.get("id"),
+            name=data.get("name", "") or "",
+            phone=data.get("phone", "") or "",
+            groups=tuple(groups),
+            group_ids=tuple(group_ids) if isinstance(group_ids, list) else (),
+            join_date=join_date,
+            has_sister=bool(data.get("has_sister", False)),
+            payment_status=data.get("payment_status", "") or "",
+            payments=tuple(Payment.from_dict(p) for p in payments if isinstance(p, dict)) if isinstance(payments, list) else (),
+            extra=_extra(data, known),
+        )
+
+    @property
+    def paid_agorot(self) -> int:
+        """Sum of the payments that are numbers"""
+        return sum(p.amount for p in self.payments if p.amount is not None)
+
+    @property
+    def positive_agorot(self) -> int:
+        """Sum of the payments above zero (refunds and corrections left out)"""
+        return sum(p.amount for p in self.payments if p.amount is not None and p.amount > 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "phone": self.phone,
+            "groups": list(self.groups),
+            "payment_status": self.payment_status,
+            "join_date": format_date(self.join_date),
+            "has_sister": self.has_sister,
+            "payments": [p.to_dict() for p in self.payments],
+        }
+        if self.group_ids:
+            data["group_ids"] = list(self.group_ids)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Group:
+    id: Any
+    name: str
+    day_of_week: str = ""
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    price: Optional[int] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    KNOWN_FIELDS = frozenset({"id", "name", "day_of_week", "group_start_date", "group_end_date", "price"})
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Group":
+        return cls(
+            id=data.get("id"),
+            name=data.get("name", "") or "",
+            day_of_week=data.get("day_of_week", "") or "",
+            start_date=parse_date(data.get("group_start_date")),
+            end_date=parse_date(data.get("group_end_date")),
+            price=to_agorot(data.get("price")),
+            extra=_extra(data, cls.KNOWN_FIELDS),
+        )
+
+    @property
+    def weekday(self) -> Optional[int]:
+        """Meeting day as date.weekday() (Monday=0), None when unknown"""
+        from utils.payment_utils import HEBREW_WEEKDAYS
+        return HEBREW_WEEKDAYS.get(self.day_of_week)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "day_of_week": self.day_of_week,
+            "group_start_date": format_date(self.start_date),
+            "group_end_date": format_date(self.end_date),
+        }
+        if self.price is not None:
+            data["price"] = self.price // 100 if self.price % 100 == 0 else self.price / 100
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Enrollment:
+    """A join record of joining_dates.json"""
+    group_id: str
+    student_id: str
+    join_date: Optional[date]
+    student_name: str = ""
+
+    @classmethod
+    def from_dict(cls, group_id, data: Dict[str, Any]) -> "Enrollment":
+        return cls(
+            group_id=str(group_id),
+            student_id=str(data.get("student_id")),
+            join_date=parse_date(data.get("join_date")),
+            student_name=data.get("student_name", "") or "",
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"student_id": self.student_id, "student_name": self.student_name,
+                "join_date": format_date(self.join_date)}
+
+
+
+@dataclass(slots=True)
+class AttendanceRecord:
+    """One mark of an attendance file"""
+    group_id: str
+    student_id: str
+    date: Optional[date]
+    present: bool
+    date_text: str = ""
+
+    @classmethod
+    def from_file(cls, group_id, attendance_data: Dict[str, Any]):
+        """Records of an attendance file (date -> student id -> bool), in file order"""
+        records = []
+        for date_text, marks in (attendance_data or {}).items():
+            if not isinstance(marks, dict):
+                continue
+            day = parse_date(date_text)
+            for student_id, is_present in marks.items():
+                records.append(cls(str(group_id), str(student_id), day, bool(is_present), date_text))
+        return records
+
+    @staticmethod
+    def to_file(records) -> Dict[str, Dict[str, bool]]:
+        data = {}
+        for record in records:
+            data.setdefault(record.date_text or format_date(record.date), {})[record.student_id] = record.present
+        return data
@@ -0,0 +1,102 @@
+"""Payment amounts as integer agorot.
+
+Amounts are typed in as text ("180", "1,200", "99.90") and were parsed
+again, slightly differently, by every screen that summed them. A payment
+is now normalised when it is recorded (``PaymentLedger.add``/``edit``) or
+when students.json is written: ``amount`` becomes the canonical text and
+``amount_agorot`` holds the same amount as an int, so totals are sums of
+plain ints. Payments with an amount that is not a number are kept as-is
+and count as 0. Totals are shown in whole shekels with ``whole_shekels``
+/ ``format_shekels`` so every screen rounds the same way.
+"""
+import math
+from typing import Optional
+
+AGOROT_FIELD = "amount_agorot"
+
+
+def to_agorot(amount) -> Optional[int]:
+    """An amount in shekels (number, or text like "1,200.50" / "180 ₪") as agorot; None if it is not a number.
+
+    Commas are thousands separators.
+    """
+    if isinstance(amount, bool):
+        return None
+    if isinstance(amount, int):
+        return amount * 100
+    if isinstance(amount, str):
+        text = amount.replace(',', '').replace('₪', '').strip()
+        if not text:
+            return None
+        try:
+            amount = float(text)
+        except ValueError:
+            return None
+    if isinstance(amount, float):
+        # "inf", "nan" and amounts too large for agorot ("1e400", 1e308) are not numbers either
+        if not math.isfinite(amount):
+            return None
+        try:
+            return round(amount * 100)
+        except OverflowError:
+            return None
+    return None
+
+
+def format_amount(agorot) -> str:
+    """Agorot as the amount text stored in a payment ("180", "180.50")"""
+    if agorot is None:
+        return ""
+    if agorot % 100 == 0:
+        return str(agorot // 100)
+    return f"{agorot / 100:.2f}"
+
+
+def whole_shekels(agorot) -> int:
+    """A total in whole shekels, rounded half up (99.50 -> 100) like the amounts shown with ``:,.0f``"""
+    if agorot < 0:
+        return -((-agorot + 50) // 100)
+    return (agorot + 50) // 100
+
+
+def format_shekels(agorot) -> str:
+    return f"{whole_shekels(agorot):,}₪"
+
+
+def payment_agorot(payment) -> Optional[int]:
+    """Amount of a payment dict in agorot, using the stored ``amount_agorot`` when present"""
+    if not isinstance(payment, dict):
+        return None
+    agorot = payment.get(AGOROT_FIELD)
+    if isinstance(agorot, int) and not isinstance(agorot, bool):
+        return agorot
+    return to_agorot(payment.get("amount", 0))
+
+
+def total_agorot(payments) -> int:
+    """Sum of the payments' amounts in agorot, ignoring amounts that are not numbers"""
+    total = 0
+    for payment in payments or []:
+        agorot = payment_agorot(payment)
+        if agorot is not None:
+            total += agorot
+    return total
+
+
+def normalize_payment(payment):
+    """The payment with canonical ``amount`` text and ``amount_agorot``; unchanged when already normal"""
+    if not isinstance(payment, dict):
+        return payment
+    agorot = to_agorot(payment.get("amount"))
+    if agorot is None:
+        if AGOROT_FIELD in payment:
+            return {key: value for key, value in payment.items() if key != AGOROT_FIELD}
+        return payment
+    amount = format_amount(agorot)
+    if payment.get(AGOROT_FIELD) == agorot and payment.get("amount") == amount:
+        return payment
+    return dict(payment, amount=amount, amount_agorot=agorot)
+
+
+def is_normalized(payment) -> bool:
+    return normalize_payment(payment) is payment
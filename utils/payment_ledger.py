@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from utils.data_events import ADDED, PAYMENTS_CHANGED, REMOVED, UPDATED, DataChange
+from utils.money import normalize_payment
+
+
+class PaymentLedger:
+    """Append-only JSON-lines journal of payment changes.
+
+    Each line is an ``add``, ``edit`` or ``delete`` record keyed by student id
+    and payment id. students.json holds the payments as of the last
+    compaction; the ledger is replayed on top of it when students are loaded.
+    Only students found in students.json are replayed, and a ``purge``
+    record written when a student is removed drops the student's earlier
+    records, so they never reach a student later added with the same id.
+    Replaying is idempotent, so a crash between rewriting students.json and
+    truncating the ledger loses nothing. With the SQLite backend each record
+    is stored as a single payment row change instead, and the records of the
+    session are only kept in memory to be replayed on the loaded students.
+    Use ``DataStore.payment_ledger()`` to get the shared instance.
+    """
+
+    COMPACT_THRESHOLD = 500
+
+    def __init__(self, store):
+        self.store = store
+        self.ledger_file = self.store.data_dir / "payments_ledger.jsonl"
+        self._lock = threading.RLock()
+        self._records = []
+        self._offset = 0
+        self._signature = None
+        self._version = 0
+        self._applied = None
+        self._load()
+
+    @staticmethod
+    def payment_id(student_id, payment, index):
+        """Id of a payment; payments saved before the ledger existed are identified by position"""
+        return payment.get("id") or f"{student_id}-{index}"
+
+    def _load(self):
+        """(Re)read the ledger from disk, reading only appended lines when possible"""
+        if self.store.sqlite is not None:
+            return
+        with self._lock:
+            signature = self.store._signature(self.ledger_file)
+            if signature == self._signature:
+                return
+
+            if signature is None:
+                if self._records:
+                    self._records = []
+                    self._version += 1
+                self._offset = 0
+                self._signature = None
+                return
+
+            if signature[1] < self._offset:
+                self._records = []
+                self._offset = 0
+
+            try:
+                with open(self.ledger_file, "rb") as f:
+                    f.seek(self._offset)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        self._offset += len(line)
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            self._records.append(json.loads(line.decode("utf-8")))
+                        except ValueError:
+                            print(f"Skipping corrupt ledger line at offset {self._offset}")
+            except Exception as e:
+                print(f"Error loading payment ledger: {e}")
+
+            self._signature = signature
+            self._version += 1
+
+    def _append(self, record):
+        record["ts"] = datetime.now().isoformat(timespec="seconds")
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self.store.sqlite is not None:
+                self.store.sqlite.apply_payment_record(record)
+            else:
+                self._load()
+                with open(self.ledger_file, "ab") as f:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._offset += len(line)
+                self._signature = self.store._signature(self.ledger_file)
+            self._records.append(record)
+            self._version += 1
+        action = {"add": ADDED, "edit": UPDATED, "delete": REMOVED}[record["op"]]
+        self.store.events().publish(DataChange(
+            PAYMENTS_CHANGED, action, student_ids=[record["student_id"]], payment_id=record["payment_id"],
+        ))
+        return record
+
+    def add(self, student_id, payment_data, payment_status=None):
+        """Record a new payment and return its id"""
+        payment = dict(normalize_payment(payment_data))
+        payment.setdefault("id", uuid.uuid4().hex)
+        record = {"op": "add", "student_id": student_id, "payment_id": payment["id"], "payment": payment}
+        if payment_status is not None:
+            record["payment_status"] = payment_status
+        self._append(record)
+        return payment["id"]
+
+    def edit(self, student_id, payment_id, payment_data):
+        """Replace the contents of an existing payment"""
+        payment = dict(normalize_payment(payment_data))
+        payment["id"] = payment_id
+        self._append({"op": "edit", "student_id": student_id, "payment_id": payment_id, "payment": payment})
+        return True
+
+    def delete(self, student_id, payment_id):
+        """Remove a payment"""
+        self._append({"op": "delete", "student_id": student_id, "payment_id": payment_id})
+        return True
+
+    def purge(self, student_ids):
+        """Drop the recorded payment changes of students that were removed"""
+        student_ids = {student_id for student_id in student_ids if student_id is not None}
+        if not student_ids:
+            return True
+        with self._lock:
+            if self.store.sqlite is not None:
+                # Their payment rows went with the student rows; only the session's records are left
+                self._records = [r for r in self._records if r.get("student_id") not in student_ids]
+                self._version += 1
+            else:
+                self._load()
+                if not any(r.get("student_id") in student_ids for r in self._records):
+                    return True
+                ts = datetime.now().isoformat(timespec="seconds")
+                records = [{"op": "purge", "student_id": student_id, "ts": ts} for student_id in sorted(student_ids, key=str)]
+                payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+                with open(self.ledger_file, "ab") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._offset += len(payload)
+                self._signature = self.store._signature(self.ledger_file)
+                self._records.extend(records)
+                self._version += 1
+        self.store.events().publish(DataChange(PAYMENTS_CHANGED, REMOVED, student_ids=student_ids))
+        return True
+
+    def signature(self):
+        """Changes whenever a payment is recorded (stands in for the ledger file's signature)"""
+        if self.store.sqlite is not None:
+            return self.store.sqlite.signature("payments")
+        return self.store._signature(self.ledger_file)
+
+    def records(self):
+        """All ledger records since the last compaction (audit trail)"""
+        self._load()
+        return list(self._records)
+
+    def apply(self, students):
+        """Return the students list with ledger changes replayed on top of it"""
+        with self._lock:
+            self._load()
+            if not self._records:
+                return students
+            if self._applied is not None and self._applied[0] is students and self._applied[1] == self._version:
+                return self._applied[2]
+
+            changes = {}
+            for record in self._records:
+                if record.get("op") == "purge":
+                    changes.pop(record.get("student_id"), None)
+                    continue
+                changes.setdefault(record.get("student_id"), []).append(record)
+
+            result = []
+            for student in students:
+                records = changes.get(student.get("id"))
+                if not records:
+                    result.append(student)
+                    continue
+
+                student_id = student.get("id")
+                payments = {}
+                for index, payment in enumerate(student.get("payments", [])):
+                    payment_id = self.payment_id(student_id, payment, index)
+                    payments[payment_id] = dict(payment, id=payment_id)
+
+                student = dict(student)
+                for record in records:
+                    op = record.get("op")
+                    payment_id = record.get("payment_id")
+                    if op in ("add", "edit"):
+                        if op == "edit" and payment_id not in payments:
+                            continue
+                        payments[payment_id] = dict(record.get("payment", {}), id=payment_id)
+                    elif op == "delete":
+                        payments.pop(payment_id, None)
+                    if record.get("payment_status") is not None:
+                        student["payment_status"] = record["payment_status"]
+
+                student["payments"] = list(payments.values())
+                result.append(student)
+
+            self._applied = (students, self._version, result)
+            return result
+
+    def compact(self):
+        """Fold the ledger into students.json and start a new, empty ledger"""
+        with self._lock:
+            self._load()
+            if not self._records:
+                return True
+            if self.store.sqlite is not None:
+                # The records are already in the database; reload the students from it
+                self.store.invalidate(self.store.students_file)
+                self._records = []
+                self._version += 1
+                self._applied = None
+                return True
+            try:
+                students = self.store.load_students()
+                self.store.write(self.store.students_file, {"students": students})
+                with open(self.ledger_file, "wb") as f:
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._records = []
+                self._offset = 0
+                self._signature = self.store._signature(self.ledger_file)
+                self._version += 1
+                self._applied = None
+                return True
+            except Exception as e:
+                print(f"Error compacting payment ledger: {e}")
+                return False
+
+    def compact_if_needed(self):
+        """Compact once the ledger has grown past COMPACT_THRESHOLD records"""
+        self._load()
+        if len(self._records) >= self.COMPACT_THRESHOLD:
+            return self.compact()
+        return True
@@ -0,0 +1,191 @@
+import atexit
+import hashlib
+import json
+import threading
+from datetime import datetime
+from utils.payment_status_engine import PaymentStatusEngine
+
+
+class PaymentStatusCache:
+    """Payment summaries per student, persisted next to the data files.
+
+    Every entry is stored with a fingerprint of what it was computed from:
+    the student record (payments, groups, sister flag), the student's join
+    dates and the records of the groups they belong to. An entry is reused
+    while its fingerprint still matches, so a new payment only recomputes
+    that student. A change to pricing.json, or a new month, drops every
+    entry. The file is saved ``SAVE_DELAY_SECONDS`` after the last change
+    (and on exit), so filling the cache chunk by chunk writes it once. Use
+    ``DataStore.payment_status_cache()`` to get the shared instance.
+    """
+
+    VERSION = 1
+    SAVE_DELAY_SECONDS = 2.0
+
+    def __init__(self, store):
+        self.store = store
+        self.cache_file = self.store.data_dir / "payment_status_cache.json"
+        self._lock = threading.RLock()
+        self._global_key = None
+        self._entries = None
+        self._snapshot = None
+        self._summaries = {}
+        self._dirty = False
+        self._timer = None
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _hash(payload):
+        text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _parse_date(value):
+        try:
+            return datetime.strptime(value, "%d/%m/%Y")
+        except (TypeError, ValueError):
+            return None
+
+    def _current_global_key(self, now):
+        """Inputs shared by every student: pricing and the month owed amounts run to"""
+        return {
+            "version": self.VERSION,
+            "pricing": self._hash(self.store.load_pricing()),
+            "month": now.strftime("%m/%Y"),
+        }
+
+    def _fingerprint(self, student, join_dates, groups_by_id, groups_by_name, now):
+        """Hash of everything a student's payment summary is computed from"""
+        student_id = student.get("id")
+        record = {k: v for k, v in student.items() if k != "payment_status"}
+
+        groups = []
+        for group_name in student.get("groups", []):
+            group_id = (groups_by_name.get(group_name) or {}).get("id")
+            group = groups_by_id.get(group_id)
+            join_date = join_dates.get((str(group_id), str(student_id)))
+
+            # Periods skip groups the student has not started yet, so the
+            # summary also depends on whether that day has come
+            started = None
+            join_dt = self._parse_date(join_date)
+            if join_dt and group:
+                group_start = self._parse_date(group.get("group_start_date"))
+                if group_start and group_start > join_dt:
+                    join_dt = group_start
+                started = join_dt <= now
+            groups.append([group_name, group, join_date, started])
+
+        return self._hash({"student": record, "groups": groups})
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        data = self.store.read(self.cache_file, {})
+        if not isinstance(data, dict):
+            data = {}
+        self._global_key = data.get("key")
+        entries = data.get("entries")
+        self._entries = entries if isinstance(entries, dict) else {}
+
+    def _save(self):
+        """Schedule a save of the cache file; changes within SAVE_DELAY_SECONDS share one write"""
+        with self._lock:
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.SAVE_DELAY_SECONDS, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write the cache file now if it has unsaved changes"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            try:
+                self.store.write(self.cache_file, {"key": self._global_key, "entries": self._entries})
+                self._dirty = False
+            except Exception as e:
+                print(f"Error saving payment status cache: {e}")
+
+    def summaries(self, students=None):
+        """Payment summaries keyed by student id, computing only stale entries"""
+        all_students = students is None
+        if all_students:
+            students = self.store.load_students()
+
+        now = datetime.now()
+        with self._lock:
+            snapshot = (
+                students,
+                self.store.load_groups(),
+                self.store.load_joining_dates(),
+                self.store.load_pricing(),
+                now.date(),
+            )
+            if self._snapshot is not None and all(a is b for a, b in zip(self._snapshot[:4], snapshot[:4])) \
+                    and self._snapshot[4] == snapshot[4]:
+                return self._summaries
+
+            self._load()
+            global_key = self._current_global_key(now)
+            changed = False
+            if global_key != self._global_key:
+                self._global_key = global_key
+                self._entries = {}
+                changed = True
+
+            join_dates = self.store.join_dates_index()
+            groups_by_id = self.store.groups_by_id()
+            groups_by_name = self.store.groups_by_name()
+            engine = None
+
+            summaries = {}
+            for student in students:
+                student_id = student.get("id")
+                if student_id is None or student_id in summaries:
+                    continue
+
+                fingerprint = self._fingerprint(student, join_dates, groups_by_id, groups_by_name, now)
+                entry = self._entries.get(str(student_id))
+                if entry is None or entry.get("fingerprint") != fingerprint:
+                    if engine is None:
+                        engine = PaymentStatusEngine()
+                        engine.calculator.load_pricing_config()
+                    entry = {"fingerprint": fingerprint, "summary": engine.compute(student)}
+                    self._entries[str(student_id)] = entry
+                    changed = True
+                summaries[student_id] = entry["summary"]
+
+            if all_students:
+                live_ids = {str(student_id) for student_id in summaries}
+                for student_id in list(self._entries):
+                    if student_id not in live_ids:
+                        del self._entries[student_id]
+                        changed = True
+
+            if changed:
+                self._save()
+
+            self._snapshot = snapshot
+            self._summaries = summaries
+            return summaries
+
+    def get(self, student):
+        """Payment summary of one student"""
+        return self.summaries([student]).get(student.get("id")) or PaymentStatusEngine().compute(student)
+
+    def invalidate(self, student_id=None):
+        """Drop the cached entry of one student, or every entry"""
+        with self._lock:
+            self._load()
+            if student_id is None:
+                self._entries = {}
+            else:
+                self._entries.pop(str(student_id), None)
+            self._snapshot = None
+            self._save()
@@ -0,0 +1,116 @@
+from datetime import datetime
+from typing import Dict, List, Any
+from utils.data_store import DataStore
+from utils.models import parse_datetime
+from utils.money import total_agorot
+from utils.payment_utils import PaymentCalculator
+
+STATUS_PAID = "שולם במלואו"
+STATUS_OVERPAID = "שילם יותר (זיכוי)"
+STATUS_PARTIAL = "שולם חלקית"
+STATUS_DEBT = "חוב"
+STATUS_NO_PRICE = "לא נמצא מחיר קבוצות"
+STATUS_NOT_STARTED = "החוג לא התחיל"
+
+
+class PaymentStatusEngine:
+    """Computes owed, paid and payment status for many students from one data snapshot"""
+
+    def __init__(self, calculator=None):
+        self.store = DataStore.instance()
+        self.calculator = calculator or PaymentCalculator()
+
+    @staticmethod
+    def total_paid(payments) -> float:
+        """Sum of payment amounts, ignoring entries that are not numbers (summed in agorot)"""
+        return total_agorot(payments) / 100
+
+    @staticmethod
+    def resolve_status(total_owed, total_course_payment, total_paid, course_started=True) -> str:
+        if total_owed > 0:
+            if total_course_payment > 0 and total_paid >= total_course_payment:
+                if total_paid == total_course_payment:
+                    return STATUS_PAID
+                return STATUS_OVERPAID
+            if total_paid >= total_owed:
+                return STATUS_PARTIAL
+            return STATUS_DEBT
+        if not course_started:
+            return STATUS_NOT_STARTED
+        return STATUS_NO_PRICE
+
+    def _latest_end_date(self, groups_with_dates):
+        latest_end_date = None
+        for g in groups_with_dates:
+            end = g.get("end_date")
+            if end:
+                try:
+                    dt = parse_datetime(end)
+                except Exception:
+                    continue
+                if latest_end_date is None or dt > latest_end_date:
+                    latest_end_date = dt
+        return latest_end_date
+
+    def _period_total(self, student_id, period, cache):
+        key = (period["start_date"], period["end_date"], tuple(g["group_id"] for g in period["active_groups"]))
+        if key not in cache:
+            result = self.calculator.calculate_period_payment_with_discount_rules(student_id, period)
+            cache[key] = result.get("total_payment", 0) if result.get("success") else 0
+        return cache[key]
+
+    def compute(self, student: Dict[str, Any]) -> Dict[str, Any]:
+        """Payment summary of one student, from one set of periods per horizon"""
+        student_id = student.get("id")
+        total_paid = self.store.payment_totals().of(student).paid
+        end_of_current_month = self.calculator.get_end_of_month(datetime.now())
+
+        total_owed = 0
+        total_course_payment = 0
+        course_started = False
+        try:
+            groups_with_dates = self.calculator.get_student_groups_with_join_dates(student_id)
+            latest_end_date = self._latest_end_date(groups_with_dates)
+
+            owed_periods = self.calculator.create_discount_periods_for_student(student_id, end_of_current_month)
+            if not latest_end_date:
+                course_periods = []
+            elif latest_end_date == end_of_current_month:
+                course_periods = owed_periods
+            else:
+                course_periods = self.calculator.create_discount_periods_for_student(student_id, latest_end_date)
+
+            # Periods shared by both horizons are priced once
+            period_totals = {}
+            for period in course_periods:
+                total_course_payment += self._period_total(student_id, period, period_totals)
+            for period in owed_periods:
+                total_owed += self._period_total(student_id, period, period_totals)
+
+            total_owed = round(total_owed, 2)
+            course_started = bool(owed_periods)
+        except Exception as e:
+            print(f"Error computing payment summary for student {student_id}: {e}")
+
+        return {
+            "student_id": student_id,
+            "owed_until_now": total_owed,
+            "course_total": total_course_payment,
+            "paid_total": total_paid,
+            "course_started": course_started,
+            "status": self.resolve_status(total_owed, total_course_payment, total_paid, course_started),
+        }
+
+    def compute_all(self, students: List[Dict[str, Any]] = None) -> Dict[Any, Dict[str, Any]]:
+        """Payment summaries keyed by student id (defaults to every student)"""
+        if students is None:
+            students = self.store.load_students()
+        self.calculator.load_pricing_config()
+
+        summaries = {}
+        for student in students:
+            student_id = student.get("id")
+            if student_id is None or student_id in summaries:
+                continue
+            summaries[student_id] = self.compute(student)
+        return summaries
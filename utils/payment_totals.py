@@ -0,0 +1,172 @@
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional
+from utils.models import parse_date
+from utils.money import payment_agorot
+
+
+@dataclass(slots=True)
+class PaymentTotals:
+    """What a student (or the whole school) has paid, without the payment history"""
+    paid_agorot: int = 0
+    positive_agorot: int = 0
+    count: int = 0
+    last_date: Optional[date] = None
+    by_method: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def of_payments(cls, payments) -> "PaymentTotals":
+        totals = cls()
+        for payment in payments or []:
+            totals.add(payment)
+        return totals
+
+    @property
+    def paid(self) -> float:
+        """Total paid in shekels"""
+        return self.paid_agorot / 100
+
+    def add(self, payment, sign=1):
+        """Count a payment in (sign=1) or out (sign=-1)"""
+        if not isinstance(payment, dict):
+            return
+        amount = payment_agorot(payment) or 0
+        agorot = amount * sign
+        self.paid_agorot += agorot
+        if amount > 0:
+            self.positive_agorot += agorot
+        self.count += sign
+
+        method = payment.get("payment_method", "") or ""
+        bucket = self.by_method.setdefault(method, [0, 0])
+        bucket[0] += sign
+        bucket[1] += agorot
+        if bucket[0] <= 0:
+            del self.by_method[method]
+
+        if sign > 0:
+            payment_date = parse_date(payment.get("date"))
+            if payment_date is not None and (self.last_date is None or payment_date > self.last_date):
+                self.last_date = payment_date
+
+    def merge(self, other: "PaymentTotals"):
+        self.paid_agorot += other.paid_agorot
+        self.positive_agorot += other.positive_agorot
+        self.count += other.count
+        if other.last_date is not None and (self.last_date is None or other.last_date > self.last_date):
+            self.last_date = other.last_date
+        for method, (count, agorot) in other.by_method.items():
+            bucket = self.by_method.setdefault(method, [0, 0])
+            bucket[0] += count
+            bucket[1] += agorot
+
+    def method_count(self, method) -> int:
+        return self.by_method.get(method, [0, 0])[0]
+
+
+class PaymentTotalsIndex:
+    """Per-student payment totals: amount paid, number of payments, last payment date, per-method breakdown.
+
+    ``sync`` reuses the totals of every student whose record is the same
+    object as last time, so after a payment change only the changed
+    students are summed again. The payment write paths
+    (``StudentsDataManager.add_payment`` and ``PaymentPage``'s edit and
+    delete) apply the change to the totals directly with ``record_add``,
+    ``record_edit`` and ``record_delete``, and the next ``sync`` adopts the
+    new record without re-summing it. Use ``DataStore.payment_totals()`` to
+    get the shared instance.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._source = None
+        self._entries = {}
+        self._patched = {}
+        self._school = None
+
+    def sync(self, students: List[Dict[str, Any]]):
+        """Bring the totals in line with a students list"""
+        with self._lock:
+            if students is self._source:
+                return
+            entries = {}
+            for student in students:
+                student_id = student.get("id")
+                if student_id is None or student_id in entries:
+                    continue
+                payments = student.get("payments", [])
+                cached = self._entries.get(student_id)
+                if cached is not None and cached[0] is not student:
+                    expected = self._patched.get(student_id)
+                    if expected is not None and isinstance(payments, list) and expected == len(payments):
+                        cached = (student, cached[1])
+                    else:
+                        cached = None
+                if cached is None:
+                    cached = (student, PaymentTotals.of_payments(payments))
+                entries[student_id] = cached
+            self._entries = entries
+            self._patched = {}
+            self._source = students
+            self._school = None
+
+    def of(self, student) -> PaymentTotals:
+        """Totals of a student record; records that are not the loaded ones are summed on the spot"""
+        with self._lock:
+            cached = self._entries.get(student.get("id"))
+            if cached is not None and cached[0] is student:
+                return cached[1]
+        return PaymentTotals.of_payments(student.get("payments", []))
+
+    def get(self, student_id) -> PaymentTotals:
+        with self._lock:
+            cached = self._entries.get(student_id)
+            return cached[1] if cached is not None else PaymentTotals()
+
+    def school_totals(self) -> PaymentTotals:
+        """Totals over every student"""
+        with self._lock:
+            if self._school is None:
+                school = PaymentTotals()
+                for _, totals in self._entries.values():
+                    school.merge(totals)
+                self._school = school
+            return self._school
+
+    def _patch(self, student, apply):
+        with self._lock:
+            student_id = student.get("id")
+            cached = self._entries.get(student_id)
+            if cached is None or cached[0] is not student:
+                # Already synced with the changed record (or never indexed)
+                return
+            totals = cached[1]
+            if apply(totals) is False:
+                # The last payment date can't be undone; sum the student again on the next sync
+                self._patched.pop(student_id, None)
+                self._entries[student_id] = (None, totals)
+                return
+            self._patched[student_id] = totals.count
+            self._school = None
+
+    def record_add(self, student, payment):
+        """A payment was added to `student` (the record as loaded before the change)"""
+        self._patch(student, lambda totals: totals.add(payment))
+
+    def record_edit(self, student, old_payment, new_payment):
+        """A payment of `student` was replaced"""
+        def apply(totals):
+            if old_payment.get("date") != new_payment.get("date"):
+                return False
+            totals.add(old_payment, -1)
+            totals.add(new_payment)
+        self._patch(student, apply)
+
+    def record_delete(self, student, payment):
+        """A payment was removed from `student`"""
+        def apply(totals):
+            if parse_date(payment.get("date")) == totals.last_date:
+                return False
+            totals.add(payment, -1)
+        self._patch(student, apply)
@@ -1,6 +1,35 @@
-import json
+from dataclasses import replace
 from datetime import datetime, timedelta
+from functools import lru_cache
 from utils.manage_json import ManageJSON  
+from utils.data_store import DataStore
+from utils.models import Student, format_date, parse_datetime
+
+HEBREW_WEEKDAYS = {
+    "ראשון": 6,    # Sunday
+    "שני": 0,      # Monday  
+    "שלישי": 1,    # Tuesday
+    "רביעי": 2,    # Wednesday
+    "חמישי": 3,    # Thursday
+    "שישי": 4,     # Friday
+    "שבת": 5       # Saturday
+}
+
+
+def count_weekday_occurrences(weekday, start_date, end_date):
+    """Count the days falling on weekday (Monday=0) from start_date to end_date, without iterating"""
+    if end_date < start_date:
+        return 0
+    total_days = (end_date - start_date).days + 1
+    full_weeks, remaining_days = divmod(total_days, 7)
+    first_offset = (weekday - start_date.weekday()) % 7
+    return full_weeks + (1 if first_offset < remaining_days else 0)
+
+
+@lru_cache(maxsize=4096)
+def _cached_meetings_count(group_id, course_weekday, start_date, end_date):
+    # The weekday is part of the key so changing a group's day never returns a stale count
+    return count_weekday_occurrences(course_weekday, start_date, end_date)
 
 class PaymentCalculator:
     def __init__(self):
@@ -11,74 +40,50 @@ class PaymentCalculator:
         self.students_file_path = data_dir / "students.json"
         self.joining_dates_file_path = data_dir / "joining_dates.json"
         self.pricing_config_file = data_dir / "pricing.json"
+        self.store = DataStore.instance()
         self.load_pricing_config()
 
     def load_groups(self):
         try:
-            if self.groups_file_path.exists():
-                with open(self.groups_file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    return data.get("groups", [])
-            return []
+            return self.store.load_groups()
         except Exception as e:
             print(f"Error loading groups: {e}")
             return []
     
     def load_students(self):
         try:
-            if self.students_file_path.exists():
-                with open(self.students_file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    return data.get("students", {})
-            return []
+            return self.store.load_students()
         except Exception as e:
             print(f"Error loading students: {e}")
             return []
 
     def load_dates(self):
         try:
-            if self.joining_dates_file_path.exists():
-                with open(self.joining_dates_file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    return data
-            return []
+            return self.store.load_joining_dates()
         except Exception as e:
             print(f"Error loading dates: {e}")
-            return []
+            return {}
         
     def load_pricing_config(self):
         try:
-            if self.pricing_config_file.exists():
-                with open(self.pricing_config_file, "r", encoding="utf-8") as f:
-                    config = json.load(f)
-                    self.base_price = config.get("single", 180)
-                    self.price_two_groups = config.get("two", 280)
-                    self.price_three_plus = config.get("three", 360)
-                    self.sister_discount_amount = config.get("sister", 20)
-            else:
-                self.base_price = self.base_price
-                self.price_two_groups = 280
-                self.price_three_plus = 360
-                self.sister_discount_amount = 20
+            config = self.store.load_pricing()
+            self.base_price = config.get("single", 180)
+            self.price_two_groups = config.get("two", 280)
+            self.price_three_plus = config.get("three", 360)
+            self.sister_discount_amount = config.get("sister", 20)
         except Exception as e:
             print(f"Error loading pricing config, using defaults: {e}")
-            self.base_price = self.base_price
+            self.base_price = 180
             self.price_two_groups = 280
             self.price_three_plus = 360
             self.sister_discount_amount = 20
     
     def get_student_join_date_for_group(self, student_id, group_id):
         try:
-            joining_dates = self.load_dates()
-            
-            group_id_str = str(group_id)  
-            
-            group_data = joining_dates.get(group_id_str, [])
-            
-            for student_entry in group_data:
-                if str(student_entry.get("student_id")) == str(student_id):
-                    join_date = student_entry.get("join_date")
-                    return join_date
+            key = (str(group_id), str(student_id))
+            join_dates = self.store.join_dates_index()
+            if key in join_dates:
+                return join_dates[key]
             
             print(f"DEBUG: No join date found for student {student_id} in group {group_id}")
             return None
@@ -95,8 +100,7 @@ class PaymentCalculator:
                 return []
             
             groups_with_dates = []
-            for group_name in student.get("groups", []):
-                group_id = self.get_group_id_by_name(group_name)
+            for group_name, group_id in self.store.student_group_refs(student):
                 if group_id:
                     join_date = self.get_student_join_date_for_group(student_id, group_id)
                     group = self.get_group_by_id(group_id)
@@ -111,7 +115,7 @@ class PaymentCalculator:
                             "start_date": group_start_date, 
                         })
             
-            groups_with_dates.sort(key=lambda x: datetime.strptime(x["join_date"], "%d/%m/%Y"))
+            groups_with_dates.sort(key=lambda x: parse_datetime(x["join_date"]))
             return groups_with_dates
             
         except Exception as e:
@@ -146,7 +150,7 @@ class PaymentCalculator:
                 return []
             
             all_end_dates = [
-                datetime.strptime(g["end_date"], "%d/%m/%Y")
+                parse_datetime(g["end_date"])
                 for g in groups_with_dates if g.get("end_date")
             ]
 
@@ -159,15 +163,15 @@ class PaymentCalculator:
                 end_date = max_end_date
 
 
-            groups_with_dates.sort(key=lambda x: datetime.strptime(x["join_date"], "%d/%m/%Y"))
+            groups_with_dates.sort(key=lambda x: parse_datetime(x["join_date"]))
             periods = []
 
             for i, group in enumerate(groups_with_dates):
-                join_date = datetime.strptime(group["join_date"], "%d/%m/%Y")
+                join_date = parse_datetime(group["join_date"])
 
                 group_start_str = group.get("start_date")
                 if group_start_str:
-                    group_start = datetime.strptime(group_start_str, "%d/%m/%Y")
+                    group_start = parse_datetime(group_start_str)
                     if group_start > join_date:
                         join_date = group_start
 
@@ -228,15 +232,15 @@ class PaymentCalculator:
 
             final_periods = []
             for period in periods:
-                period_start = datetime.strptime(period["start_date"], "%d/%m/%Y")
-                period_end = datetime.strptime(period["end_date"], "%d/%m/%Y")
+                period_start = parse_datetime(period["start_date"])
+                period_end = parse_datetime(period["end_date"])
                 active_groups = period["active_groups"]
 
                 cut_dates = []
                 for g in active_groups:
                     group_end_date_str = g.get("end_date")
                     if group_end_date_str:
-                        group_end_date = datetime.strptime(group_end_date_str, "%d/%m/%Y")
+                        group_end_date = parse_datetime(group_end_date_str)
                         if period_start <= group_end_date < period_end:
                             cut_dates.append((group_end_date, g["group_id"]))
 
@@ -272,8 +276,8 @@ class PaymentCalculator:
             for period in final_periods:
                 valid_groups = []
                 for g in period["active_groups"]:
-                    g_end = datetime.strptime(g["end_date"], "%d/%m/%Y") if g.get("end_date") else max_end_date
-                    if g_end >= datetime.strptime(period["end_date"], "%d/%m/%Y"):
+                    g_end = parse_datetime(g["end_date"]) if g.get("end_date") else max_end_date
+                    if g_end >= parse_datetime(period["end_date"]):
                         valid_groups.append(g)
 
                 if valid_groups:
@@ -283,15 +287,15 @@ class PaymentCalculator:
                         "discount_applies": len(valid_groups) > 1
                     })
 
-            cleaned_periods.sort(key=lambda x: datetime.strptime(x["start_date"], "%d/%m/%Y"))
+            cleaned_periods.sort(key=lambda x: parse_datetime(x["start_date"]))
 
             unique_periods = []
             for period in cleaned_periods:
                 existing = next((p for p in unique_periods if p["start_date"] == period["start_date"]), None)
 
                 if existing:
-                    existing_end = datetime.strptime(existing["end_date"], "%d/%m/%Y")
-                    current_end = datetime.strptime(period["end_date"], "%d/%m/%Y")
+                    existing_end = parse_datetime(existing["end_date"])
+                    current_end = parse_datetime(period["end_date"])
 
                     if (current_end > existing_end or
                         (current_end == existing_end and len(period["active_groups"]) > len(existing["active_groups"]))):
@@ -313,12 +317,12 @@ class PaymentCalculator:
             if not student:
                 return {"success": False, "error": "Student not found"}
             
-            start_date = datetime.strptime(period["start_date"], "%d/%m/%Y")
-            end_date = datetime.strptime(period["end_date"], "%d/%m/%Y")
+            start_date = parse_datetime(period["start_date"])
+            end_date = parse_datetime(period["end_date"])
             active_groups = period["active_groups"]
             num_groups = len(active_groups)
             discount_applies = period["discount_applies"]
-            has_sister = student.get("has_sister", False)
+            has_sister = student.has_sister
             
             base_price = self.base_price
             if discount_applies and num_groups > 1:
@@ -442,7 +446,7 @@ class PaymentCalculator:
             
             return {
                 "success": True,
-                "student_name": student.get("name", ""),
+                "student_name": student.name,
                 "student_id": student_id,
                 "calculation_period": f"עד סוף החודש הנוכחי ({end_of_current_month.strftime('%d/%m/%Y')})",
                 "periods": period_payments,
@@ -466,7 +470,7 @@ class PaymentCalculator:
         try:
             if isinstance(group_id, str) and '/' in group_id:
                 try:
-                    datetime.strptime(group_id, "%d/%m/%Y")
+                    parse_datetime(group_id)
                     print(f"WARNING: Group ID {group_id} appears to be a date, not a group ID")
                     return False
                 except ValueError:
@@ -477,11 +481,11 @@ class PaymentCalculator:
             return False
 
     def get_student_by_id(self, student_id):
-        students = self.load_students()
-        for student in students:
-            if student.get("id") == student_id:
-                return student
-        return None
+        """The Student record with this id, or None"""
+        try:
+            return self.store.student_models_by_id().get(student_id)
+        except TypeError:
+            return None
     
     def calculate_multiple_groups_discount(self, base_price, num_groups):
         if num_groups == 1:
@@ -510,7 +514,7 @@ class PaymentCalculator:
                     "error": f"Student with ID {student_id} not found"
                 }
             
-            groups = student.get("groups", [])
+            groups = list(student.groups)
             num_groups = len(groups)
             
             if num_groups == 0:
@@ -521,12 +525,12 @@ class PaymentCalculator:
             
             price_after_groups_discount = self.calculate_multiple_groups_discount(base_price, num_groups)
             
-            has_sister = student.get("has_sister", False)
+            has_sister = student.has_sister
             final_price = self.calculate_sister_discount(price_after_groups_discount, has_sister)
             
             return {
                 "success": True,
-                "student_name": student.get("name", ""),
+                "student_name": student.name,
                 "student_id": student_id,
                 "num_groups": num_groups,
                 "groups": groups,
@@ -546,24 +550,24 @@ class PaymentCalculator:
             }
     
     def get_group_by_id(self, group_id):
-        groups = self.load_groups()
-        for group in groups:
-            if group.get("id") == group_id:
-                return group
-        return None
+        try:
+            return self.store.groups_by_id().get(group_id)
+        except TypeError:
+            return None
     
     def get_group_id_by_name(self, group_name):
-        groups = self.load_groups()
-        for group in groups:
-            if group.get("name") == group_name:
-                group_id = group.get("id")
-                return group_id
+        try:
+            group = self.store.groups_by_name().get(group_name)
+        except TypeError:
+            group = None
+        if group is not None:
+            return group.get("id")
         print(f"DEBUG: Group '{group_name}' not found")
         return None
 
     def get_end_of_month(self, date):
         if isinstance(date, str):
-            date = datetime.strptime(date, "%d/%m/%Y")
+            date = parse_datetime(date)
         
         if date.month == 12:
             next_month = date.replace(year=date.year + 1, month=1, day=1)
@@ -580,40 +584,31 @@ class PaymentCalculator:
                 print(f"Group with ID {group_id} not found")
                 return 0
             
+            return self.count_group_meetings(group, start_date, end_date)
+            
+        except Exception as e:
+            print(f"Error counting meetings in date range: {e}")
+            return 0
+
+    def count_group_meetings(self, group, start_date, end_date):
+        """Count meetings of an already-resolved group between two dates (inclusive)"""
+        try:
             course_day = group.get("day_of_week")
             if not course_day:
-                print(f"Course day not found for group {group_id}")
+                print(f"Course day not found for group {group.get('id')}")
                 return 0
             
-            hebrew_days = {
-                "ראשון": 6,    # Sunday
-                "שני": 0,      # Monday  
-                "שלישי": 1,    # Tuesday
-                "רביעי": 2,    # Wednesday
-                "חמישי": 3,    # Thursday
-                "שישי": 4,     # Friday
-                "שבת": 5       # Saturday
-            }
-            
-            course_weekday = hebrew_days.get(course_day)
+            course_weekday = HEBREW_WEEKDAYS.get(course_day)
             if course_weekday is None:
                 print(f"Invalid course day: {course_day}")
                 return 0
             
             if isinstance(start_date, str):
-                start_date = datetime.strptime(start_date, "%d/%m/%Y")
+                start_date = parse_datetime(start_date)
             if isinstance(end_date, str):
-                end_date = datetime.strptime(end_date, "%d/%m/%Y")
-            
-            meetings_count = 0
-            current_date = start_date
-            
-            while current_date <= end_date:
-                if current_date.weekday() == course_weekday:
-                    meetings_count += 1
-                current_date += timedelta(days=1)
+                end_date = parse_datetime(end_date)
             
-            return meetings_count
+            return _cached_meetings_count(group.get("id"), course_weekday, start_date, end_date)
             
         except Exception as e:
             print(f"Error counting meetings in date range: {e}")
@@ -622,9 +617,9 @@ class PaymentCalculator:
     def calculate_months_between_dates(self, start_date, end_date):
         try:
             if isinstance(start_date, str):
-                start_date = datetime.strptime(start_date, "%d/%m/%Y")
+                start_date = parse_datetime(start_date)
             if isinstance(end_date, str):
-                end_date = datetime.strptime(end_date, "%d/%m/%Y")
+                end_date = parse_datetime(end_date)
             
             if end_date.day == 1:
                 if end_date.month == 1:
@@ -697,8 +692,8 @@ class PaymentCalculator:
                              start_date, end_date, payment_type, current_date=None, price_details=None):
         total_payment = first_month_payment + remaining_months_payment
         
-        if isinstance(student_or_group, dict) and "name" in student_or_group:
-            entity_name = student_or_group.get("name", "")
+        if isinstance(student_or_group, Student):
+            entity_name = student_or_group.name
             entity_type = "student"
         else:
             entity_name = student_or_group.get("name", "") if student_or_group else ""
@@ -740,7 +735,7 @@ class PaymentCalculator:
             price_details = validation_result["price_details"]
             
             if isinstance(start_date, str):
-                start_date_dt = datetime.strptime(start_date, "%d/%m/%Y")
+                start_date_dt = parse_datetime(start_date)
             else:
                 start_date_dt = start_date
             
@@ -751,7 +746,7 @@ class PaymentCalculator:
             end_of_first_month = self.get_end_of_month(start_date_dt)
             
             if total_months == 0:
-                end_date_dt = datetime.strptime(end_date, "%d/%m/%Y")
+                end_date_dt = parse_datetime(end_date)
                 period_meetings = self.count_meetings_in_date_range(
                     group_id, start_date_dt, end_date_dt
                 )
@@ -795,7 +790,7 @@ class PaymentCalculator:
             monthly_price = validation_result["monthly_price"]
             
             if isinstance(start_date, str):
-                start_date_dt = datetime.strptime(start_date, "%d/%m/%Y")
+                start_date_dt = parse_datetime(start_date)
             else:
                 start_date_dt = start_date
             
@@ -829,8 +824,8 @@ class PaymentCalculator:
             end_of_first_month = self.get_end_of_month(start_date_dt)
             
             if total_months == 0:
-                current_month_meetings = self.count_meetings_in_date_range(
-                    group_id, start_date_dt, end_of_current_month
+                current_month_meetings = self.count_group_meetings(
+                    group, start_date_dt, end_of_current_month
                 )
                 first_month_payment = self.calculate_first_month_payment(monthly_price, current_month_meetings)
                 
@@ -840,8 +835,8 @@ class PaymentCalculator:
                     payment_type, current_date_str
                 )
             
-            first_month_meetings = self.count_meetings_in_date_range(
-                group_id, start_date_dt, end_of_first_month
+            first_month_meetings = self.count_group_meetings(
+                group, start_date_dt, end_of_first_month
             )
             
             first_month_payment = self.calculate_first_month_payment(monthly_price, first_month_meetings)
@@ -871,7 +866,7 @@ class PaymentCalculator:
             monthly_price = validation_result["monthly_price"]
             
             if isinstance(start_date, str):
-                start_date_dt = datetime.strptime(start_date, "%d/%m/%Y")
+                start_date_dt = parse_datetime(start_date)
             else:
                 start_date_dt = start_date
             
@@ -882,9 +877,9 @@ class PaymentCalculator:
             end_of_first_month = self.get_end_of_month(start_date_dt)
             
             if total_months == 0:
-                end_date_dt = datetime.strptime(end_date, "%d/%m/%Y")
-                period_meetings = self.count_meetings_in_date_range(
-                    group_id, start_date_dt, end_date_dt
+                end_date_dt = parse_datetime(end_date)
+                period_meetings = self.count_group_meetings(
+                    group, start_date_dt, end_date_dt
                 )
                 first_month_payment = self.calculate_first_month_payment(monthly_price, period_meetings)
                 
@@ -894,8 +889,8 @@ class PaymentCalculator:
                     payment_type
                 )
             
-            first_month_meetings = self.count_meetings_in_date_range(
-                group_id, start_date_dt, end_of_first_month
+            first_month_meetings = self.count_group_meetings(
+                group, start_date_dt, end_of_first_month
             )
             
             first_month_payment = self.calculate_first_month_payment(monthly_price, first_month_meetings)
@@ -964,7 +959,7 @@ class PaymentCalculator:
                     "error": f"Student with ID {student_id} not found"
                 }
             
-            student_groups = student.get("groups", [])
+            student_groups = student.groups
             if not student_groups:
                 return {
                     "success": False,
@@ -989,11 +984,10 @@ class PaymentCalculator:
 
     def get_all_students_payment_summary(self):
         try:
-            students = self.load_students()
             summary = []
             
-            for student in students:
-                student_id = student.get("id")
+            for student in self.store.student_models():
+                student_id = student.id
                 if not student_id:
                     continue
                 
@@ -1001,11 +995,11 @@ class PaymentCalculator:
                 if price_calc.get("success"):
                     summary.append({
                         "student_id": student_id,
-                        "student_name": student.get("name", ""),
-                        "groups": student.get("groups", []),
-                        "has_sister": student.get("has_sister", False),
-                        "join_date": student.get("join_date", ""),
-                        "payment_status": student.get("payment_status", ""),
+                        "student_name": student.name,
+                        "groups": list(student.groups),
+                        "has_sister": student.has_sister,
+                        "join_date": format_date(student.join_date) or (student.extra or {}).get("join_date", ""),
+                        "payment_status": student.payment_status,
                         "monthly_price": price_calc["final_monthly_price"],
                         "num_groups": price_calc["num_groups"],
                         "total_discount": price_calc["total_discount"],
@@ -1026,12 +1020,12 @@ class PaymentCalculator:
     
     def update_student_groups(self, student_id, new_groups):
         try:
-            students = self.load_students()
+            students = list(self.store.student_models())
             student_found = False
             
-            for student in students:
-                if student.get("id") == student_id:
-                    student["groups"] = new_groups
+            for index, student in enumerate(students):
+                if student.id == student_id:
+                    students[index] = replace(student, groups=tuple(new_groups))
                     student_found = True
                     break
             
@@ -1041,8 +1035,7 @@ class PaymentCalculator:
                     "error": f"Student with ID {student_id} not found"
                 }
             
-            with open(self.students_file_path, "w", encoding="utf-8") as f:
-                json.dump({"students": students}, f, ensure_ascii=False, indent=2)
+            self.store.write(self.students_file_path, {"students": students})
             
             return self.calculate_monthly_price_with_discounts(student_id)
             
@@ -1054,12 +1047,12 @@ class PaymentCalculator:
     
     def update_student_sister_status(self, student_id, has_sister):
         try:
-            students = self.load_students()
+            students = list(self.store.student_models())
             student_found = False
             
-            for student in students:
-                if student.get("id") == student_id:
-                    student["has_sister"] = has_sister
+            for index, student in enumerate(students):
+                if student.id == student_id:
+                    students[index] = replace(student, has_sister=has_sister)
                     student_found = True
                     break
             
@@ -1069,8 +1062,7 @@ class PaymentCalculator:
                     "error": f"Student with ID {student_id} not found"
                 }
             
-            with open(self.students_file_path, "w", encoding="utf-8") as f:
-                json.dump({"students": students}, f, ensure_ascii=False, indent=2)
+            self.store.write(self.students_file_path, {"students": students})
             
             return self.calculate_monthly_price_with_discounts(student_id)
             
@@ -1096,29 +1088,17 @@ class PaymentCalculator:
                 print(f"DEBUG: payment_result failed: {payment_result}")
                 return payment_result
             
-            payments = student.get('payments', [])
-            total_paid = 0
+            paid_agorot = student.positive_agorot
             payment_details = []
             
-            for payment in payments:
-                try:
-                    amount = payment.get('amount', 0)
-                    if isinstance(amount, str):
-                        amount = float(amount) if amount.strip() else 0
-                    elif isinstance(amount, (int, float)):
-                        amount = float(amount)
-                    else:
-                        amount = 0
-                    
-                    if amount > 0:
-                        total_paid += amount
-                        payment_details.append({
-                            "amount": amount,
-                            "date": payment.get('date', ''),
-                            "method": payment.get('payment_method', '')
-                        })
-                except (ValueError, AttributeError):
-                    continue
+            for payment in student.payments:
+                if payment.amount is not None and payment.amount > 0:
+                    payment_details.append({
+                        "amount": payment.amount / 100,
+                        "date": format_date(payment.date) or (payment.extra or {}).get('date', ''),
+                        "method": payment.method
+                    })
+            total_paid = paid_agorot / 100 if paid_agorot else 0
             
             total_required = payment_result.get("total_payment", 0)
             total_course_payment = 0
@@ -1151,12 +1131,12 @@ class PaymentCalculator:
             
             explanation = {
                 "success": True,
-                "student_name": student.get("name", ""),
+                "student_name": student.name,
                 "student_id": student_id,
                 "calculation_period": payment_result.get("calculation_period", ""),
-                "groups": student.get("groups", []),
-                "num_groups": len(student.get("groups", [])),
-                "has_sister": student.get("has_sister", False),
+                "groups": list(student.groups),
+                "num_groups": len(student.groups),
+                "has_sister": student.has_sister,
                 "periods": payment_result.get("periods", []),
                 "total_required": total_required,
                 "total_course_payment": total_course_payment,
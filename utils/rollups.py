@@ -0,0 +1,279 @@
+import hashlib
+import threading
+from utils.data_events import (
+    ATTENDANCE_CHANGED, FLUSHED, PAYMENTS_CHANGED, SAVED, STUDENTS_CHANGED,
+)
+from utils.models import parse_date
+
+UNDATED = ""
+NO_GROUP = ""
+
+
+def month_of(date_text) -> str:
+    """The "MM/YYYY" month of a date (or "%d/%m/%Y" text), or UNDATED"""
+    parsed = parse_date(date_text)
+    return parsed.strftime("%m/%Y") if parsed else UNDATED
+
+
+def month_sort_key(month):
+    if not month:
+        return (0, 0)
+    return (int(month[3:]), int(month[:2]))
+
+
+def _empty_bucket():
+    return {"total": 0, "count": 0, "by_method": {}, "by_group": {}}
+
+
+def _add_to(counts, key, value):
+    value = counts.get(key, 0) + value
+    if value:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+
+class Rollups:
+    """Month-bucketed revenue and attendance totals, persisted in rollups.json.
+
+    Revenue is kept per "MM/YYYY" month of the payment date (undated
+    payments under ""), with the total and number of payments, a split by
+    payment method and a split by group; a payment of a student in several
+    groups is divided evenly between them. Attendance is kept per group and
+    month as [present, recorded] marks.
+
+    Each table is stored with the signatures of the files it was computed
+    from and a digest of their contents. On startup a table is used as-is
+    only while both still match, so a rewrite that keeps a file's mtime and
+    size is not mistaken for the data the table was built from.
+    Within a session every student's share of the revenue is remembered,
+    and on a payment or student change only the changed students are taken
+    out and added back; attendance is recomputed for the group whose file
+    was written. Both happen as soon as the change is published, and the
+    tables are saved right away. Use ``DataStore.rollups()`` to get the
+    shared instance.
+    """
+
+    VERSION = 2
+
+    def __init__(self, store):
+        self.store = store
+        self.rollups_file = self.store.data_dir / "rollups.json"
+        self._lock = threading.RLock()
+        self._data = None
+        self._students = None
+        self._shares = None
+        self._verified = set()
+        events = self.store.events()
+        events.subscribe([PAYMENTS_CHANGED, STUDENTS_CHANGED], self.on_payments_changed)
+        events.subscribe(ATTENDANCE_CHANGED, self.on_attendance_changed)
+
+    def _load(self):
+        if self._data is not None:
+            return
+        data = self.store.read(self.rollups_file, {})
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            data = {}
+        self._data = {
+            "version": self.VERSION,
+            "revenue_sources": data.get("revenue_sources"),
+            "revenue_check": data.get("revenue_check"),
+            "revenue": data.get("revenue") if isinstance(data.get("revenue"), dict) else {},
+            "attendance": data.get("attendance") if isinstance(data.get("attendance"), dict) else {},
+        }
+
+    def _save(self):
+        try:
+            self.store.write(self.rollups_file, self._data)
+        except Exception as e:
+            print(f"Error saving rollups: {e}")
+
+    # Revenue
+
+    def _revenue_sources(self):
+        signatures = [
+            self.store._signature(self.store.students_file),
+            self.store.payment_ledger().signature(),
+        ]
+        return [list(signature) if signature else None for signature in signatures]
+
+    def _digest(self, path):
+        """Digest of a data file's contents; None for data kept in the database, whose version changes on every write"""
+        if self.store._dataset(path) is not None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        except OSError:
+            return None
+
+    def _revenue_check(self):
+        return [self._digest(self.store.students_file), self._digest(self.store.payment_ledger().ledger_file)]
+
+    def _share(self, student):
+        """The revenue of one Student by month (a bucket per month)"""
+        group_ids = [str(group_id) for _, group_id in self.store.student_group_refs(student) if group_id is not None]
+        if not group_ids:
+            group_ids = [NO_GROUP]
+
+        months = {}
+        for payment in student.payments:
+            agorot = payment.amount
+            if agorot is None:
+                continue
+            bucket = months.setdefault(month_of(payment.date), _empty_bucket())
+            bucket["total"] += agorot
+            bucket["count"] += 1
+            _add_to(bucket["by_method"], payment.method, agorot)
+            part, rest = divmod(agorot, len(group_ids))
+            for index, group_id in enumerate(group_ids):
+                _add_to(bucket["by_group"], group_id, part + (rest if index == 0 else 0))
+        return months
+
+    @staticmethod
+    def _merge(revenue, share, sign):
+        for month, bucket in share.items():
+            target = revenue.setdefault(month, _empty_bucket())
+            target["total"] += sign * bucket["total"]
+            target["count"] += sign * bucket["count"]
+            for key in ("by_method", "by_group"):
+                for name, agorot in bucket[key].items():
+                    _add_to(target[key], name, sign * agorot)
+            if not target["count"]:
+                del revenue[month]
+
+    def _sync_revenue(self):
+        # Read before taking our lock. Locks are always taken rollups, then store (DataStore
+        # publishes changes after releasing its lock). Signatures are taken first so that a
+        # write in between makes them stale rather than the table.
+        sources = self._revenue_sources()
+        check = self._revenue_check()
+        students = self.store.load_students()
+        with self._lock:
+            if students is self._students:
+                return
+            self._load()
+            if (self._shares is None and self._data["revenue_sources"] == sources
+                    and self._data["revenue_check"] == check):
+                # Tables saved by an earlier run and still current
+                self._students = students
+                return
+
+            revenue = self._data["revenue"] if self._shares is not None else {}
+            shares = {}
+            for student in self.store.student_models():
+                student_id = student.id
+                if student_id is None or student_id in shares:
+                    continue
+                previous = self._shares.pop(student_id, None) if self._shares is not None else None
+                if previous is not None and previous[0] is student:
+                    shares[student_id] = previous
+                    continue
+                if previous is not None:
+                    self._merge(revenue, previous[1], -1)
+                share = self._share(student)
+                self._merge(revenue, share, 1)
+                shares[student_id] = (student, share)
+
+            for _, share in (self._shares or {}).values():
+                self._merge(revenue, share, -1)
+
+            self._shares = shares
+            self._students = students
+            self._data["revenue"] = revenue
+            self._data["revenue_sources"] = sources
+            self._data["revenue_check"] = check
+            self._save()
+
+    def on_payments_changed(self, change):
+        self._sync_revenue()
+
+    def revenue(self):
+        """Revenue per "MM/YYYY" month: total and count of payments, by_method and by_group (agorot)"""
+        self._sync_revenue()
+        with self._lock:
+            return self._data["revenue"]
+
+    def revenue_months(self, months=None):
+        """(month, total agorot) of dated months, oldest first; the last `months` when given"""
+        revenue = self.revenue()
+        dated = sorted((month for month in revenue if month), key=month_sort_key)
+        if months is not None:
+            dated = dated[-months:]
+        return [(month, revenue[month]["total"]) for month in dated]
+
+    def total_revenue(self) -> int:
+        return sum(bucket["total"] for bucket in self.revenue().values())
+
+    # Attendance
+
+    @staticmethod
+    def _group_months(records):
+        months = {}
+        for record in records:
+            counts = months.setdefault(month_of(record.date), [0, 0])
+            counts[0] += record.present
+            counts[1] += 1
+        return months
+
+    def _refresh_group(self, group_id, path):
+        """Recompute one group's months if its file changed; True when the table changed"""
+        signature = self.store._signature(path)
+        entry = self._data["attendance"].get(group_id)
+        if entry is not None and entry.get("signature") == list(signature or []):
+            # Months saved by an earlier run are checked against the file once per session
+            if group_id in self._verified or entry.get("check") == self._digest(path):
+                self._verified.add(group_id)
+                return False
+        if signature is None:
+            return self._data["attendance"].pop(group_id, None) is not None
+        self._data["attendance"][group_id] = {
+            "signature": list(signature),
+            "check": self._digest(path),
+            "months": self._group_months(self.store._attendance_records(group_id, path)),
+        }
+        self._verified.add(group_id)
+        return True
+
+    def _sync_attendance(self):
+        self.store.flush_attendance()
+        with self._lock:
+            self._load()
+            group_ids = set(self.store.attendance_group_ids())
+            changed = False
+            for group_id in sorted(group_ids):
+                changed |= self._refresh_group(group_id, self.store.attendance_file(group_id))
+            for group_id in list(self._data["attendance"]):
+                if group_id not in group_ids:
+                    del self._data["attendance"][group_id]
+                    changed = True
+            if changed:
+                self._save()
+
+    def on_attendance_changed(self, change):
+        # Buffered toggles are counted once they are written
+        if change.action not in (FLUSHED, SAVED) or change.group_ids is None:
+            return
+        with self._lock:
+            self._load()
+            changed = False
+            for group_id in change.group_ids:
+                changed |= self._refresh_group(group_id, self.store.attendance_file(group_id))
+            if changed:
+                self._save()
+
+    def attendance(self):
+        """Attendance per group id and "MM/YYYY" month as [present, recorded]"""
+        self._sync_attendance()
+        with self._lock:
+            return {group_id: entry["months"] for group_id, entry in self._data["attendance"].items()}
+
+    def attendance_by_month(self):
+        """Attendance of the whole school per "MM/YYYY" month as [present, recorded]"""
+        months = {}
+        for group_months in self.attendance().values():
+            for month, (present, recorded) in group_months.items():
+                totals = months.setdefault(month, [0, 0])
+                totals[0] += present
+                totals[1] += recorded
+        return months
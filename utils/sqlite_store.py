@@ -0,0 +1,571 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from utils.manage_json import ManageJSON
+from utils.money import payment_agorot
+
+DB_NAME = "dance_school.db"
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    dataset TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS groups (
+    row INTEGER PRIMARY KEY,
+    id TEXT,
+    name TEXT,
+    teacher TEXT,
+    group_start_date TEXT,
+    group_end_date TEXT,
+    record TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS students (
+    row INTEGER PRIMARY KEY,
+    id TEXT,
+    name TEXT,
+    phone TEXT,
+    has_sister INTEGER,
+    payment_status TEXT,
+    has_payments INTEGER NOT NULL DEFAULT 1,
+    record TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS enrollments (
+    student_row INTEGER NOT NULL REFERENCES students(row) ON DELETE CASCADE,
+    group_id TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS join_dates (
+    row INTEGER PRIMARY KEY,
+    group_id TEXT NOT NULL,
+    student_id TEXT,
+    join_date TEXT,
+    record TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS payments (
+    row INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_row INTEGER NOT NULL REFERENCES students(row) ON DELETE CASCADE,
+    student_id TEXT,
+    uid TEXT NOT NULL,
+    amount_agorot INTEGER,
+    date_iso TEXT,
+    payment_method TEXT,
+    record TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    group_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    date_iso TEXT,
+    student_id TEXT NOT NULL,
+    present INTEGER NOT NULL,
+    PRIMARY KEY (group_id, date, student_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_students_id ON students(id);
+CREATE INDEX IF NOT EXISTS idx_groups_id ON groups(id);
+CREATE INDEX IF NOT EXISTS idx_enrollments_student ON enrollments(student_row);
+CREATE INDEX IF NOT EXISTS idx_enrollments_group ON enrollments(group_id);
+CREATE INDEX IF NOT EXISTS idx_join_dates_group ON join_dates(group_id);
+CREATE INDEX IF NOT EXISTS idx_join_dates_student ON join_dates(student_id);
+CREATE INDEX IF NOT EXISTS idx_payments_student_row ON payments(student_row);
+CREATE INDEX IF NOT EXISTS idx_payments_student ON payments(student_id, uid);
+CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(date_iso);
+CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance(student_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_group_date ON attendance(group_id, date_iso);
+"""
+
+ATTENDANCE_PREFIX = "attendance:"
+
+
+def _iso_date(date_str):
+    """Convert a dd/mm/YYYY date to YYYY-MM-DD so it sorts and indexes correctly"""
+    try:
+        return datetime.strptime(str(date_str).strip(), "%d/%m/%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+class SQLiteStore:
+    """SQLite backend holding the same data as the JSON files.
+
+    ``python -m utils.sqlite_store migrate`` imports the JSON tree into
+    data/dance_school.db; from then on ``DataStore`` reads students,
+    groups, join dates and attendance from the database and sends their
+    writes here instead of rewriting the files (pricing and the caches stay
+    JSON). Every record is kept exactly as it appears in its file, next to
+    indexed columns (student id, group id, payment date) for queries.
+
+    Writes are row-level: a students save only rewrites the students that
+    differ from the loaded snapshot, a recorded payment is one row insert,
+    update or delete, and an attendance save upserts the marks that changed.
+    Each dataset has a version that is bumped on every write; it stands in
+    for the file signature, so the DataStore caches work as with files.
+    ``python -m utils.sqlite_store export`` writes the JSON tree back and
+    sets the database aside, switching the app back to the files.
+    """
+
+    def __init__(self, db_path=None):
+        data_dir = ManageJSON.get_appdata_path() / "data"
+        data_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) if db_path else data_dir / DB_NAME
+        self._lock = threading.RLock()
+        self._conn = None
+        self._versions = None
+        self._students = None
+
+    @classmethod
+    def is_available(cls, db_path=None):
+        """Check whether a migration has created the database (with the current schema)"""
+        path = cls(db_path).db_path
+        if not path.exists():
+            return False
+        try:
+            conn = sqlite3.connect(str(path))
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error opening database {path}: {e}")
+            return False
+        if version != SCHEMA_VERSION:
+            print(f"Database {path} was created by an older version; run the migration again to use it")
+            return False
+        return True
+
+    def connect(self):
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                self._conn.row_factory = sqlite3.Row
+                self._conn.execute("PRAGMA foreign_keys = ON")
+                self._conn.execute("PRAGMA journal_mode = WAL")
+                self._conn.executescript(SCHEMA)
+                self._versions = {row["dataset"]: row["version"]
+                                  for row in self._conn.execute("SELECT dataset, version FROM versions")}
+            return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._versions = None
+                self._students = None
+
+    # Versions
+
+    def signature(self, dataset):
+        """Stand-in for a file signature: None while the dataset was never written"""
+        with self._lock:
+            self.connect()
+            version = self._versions.get(dataset)
+        return None if version is None else ("db", version)
+
+    def _bump(self, conn, *datasets):
+        # Clock-based so a re-created database never repeats a version saved by an earlier one
+        for dataset in datasets:
+            version = max(self._versions.get(dataset, 0) + 1, time.time_ns())
+            conn.execute("INSERT OR REPLACE INTO versions (dataset, version) VALUES (?, ?)", (dataset, version))
+            self._versions[dataset] = version
+
+    def attendance_group_ids(self):
+        """Group ids that have attendance stored, in the order of the attendance file names"""
+        with self._lock:
+            self.connect()
+            group_ids = [d[len(ATTENDANCE_PREFIX):] for d in self._versions if d.startswith(ATTENDANCE_PREFIX)]
+        return sorted(group_ids, key=lambda group_id: f"attendance_{group_id}.json")
+
+    # Reading
+
+    def load(self, dataset):
+        """The dataset in the shape of its JSON file"""
+        with self._lock:
+            conn = self.connect()
+            if dataset == "students":
+                return {"students": self._load_students(conn)}
+            if dataset == "groups":
+                return {"groups": [json.loads(row["record"])
+                                   for row in conn.execute("SELECT record FROM groups ORDER BY row")]}
+            if dataset == "joining_dates":
+                return self._load_joining_dates(conn)
+            if dataset.startswith(ATTENDANCE_PREFIX):
+                return self._load_attendance(conn, dataset[len(ATTENDANCE_PREFIX):])
+        raise ValueError(f"Unknown dataset: {dataset}")
+
+    def _load_students(self, conn):
+        payments_by_row = {}
+        for row in conn.execute("SELECT student_row, record FROM payments ORDER BY row"):
+            payments_by_row.setdefault(row["student_row"], []).append(json.loads(row["record"]))
+
+        students = []
+        rows = []
+        for row in conn.execute("SELECT row, has_payments, record FROM students ORDER BY row"):
+            student = json.loads(row["record"])
+            if row["has_payments"]:
+                student["payments"] = payments_by_row.get(row["row"], [])
+            students.append(student)
+            rows.append(row["row"])
+        self._students = (students, rows)
+        return students
+
+    @staticmethod
+    def _load_joining_dates(conn):
+        joining_dates = {}
+        for row in conn.execute("SELECT group_id, record FROM join_dates ORDER BY row"):
+            joining_dates.setdefault(row["group_id"], []).append(json.loads(row["record"]))
+        return joining_dates
+
+    @staticmethod
+    def _load_attendance(conn, group_id):
+        attendance = {}
+        for row in conn.execute(
+            "SELECT date, student_id, present FROM attendance WHERE group_id = ? ORDER BY rowid", (str(group_id),)
+        ):
+            attendance.setdefault(row["date"], {})[row["student_id"]] = bool(row["present"])
+        return attendance
+
+    def get_payments_between(self, start_date, end_date):
+        """Payments whose date falls in [start_date, end_date] (dd/mm/YYYY), using the date index"""
+        with self._lock:
+            rows = self.connect().execute(
+                "SELECT student_id, record FROM payments WHERE date_iso BETWEEN ? AND ? ORDER BY date_iso",
+                (_iso_date(start_date), _iso_date(end_date))
+            ).fetchall()
+        return [dict(json.loads(row["record"]), student_id=row["student_id"]) for row in rows]
+
+    # Writing
+
+    def write(self, dataset, data, previous=None):
+        """Store a dataset given in its JSON file shape; `previous` is the snapshot it replaces, if known"""
+        self.write_many([(dataset, data, previous)])
+
+    def write_many(self, entries):
+        """Store several (dataset, data, previous) entries in one transaction: all of them or none"""
+        with self._lock:
+            conn = self.connect()
+            try:
+                with conn:
+                    for dataset, data, previous in entries:
+                        self._write(conn, dataset, data, previous)
+            except Exception:
+                self._rolled_back()
+                raise
+
+    def _rolled_back(self):
+        """Forget in-memory state that described the rolled back transaction"""
+        self._versions = {row["dataset"]: row["version"]
+                          for row in self._conn.execute("SELECT dataset, version FROM versions")}
+        self._students = None
+
+    def _write(self, conn, dataset, data, previous=None):
+        if dataset == "students":
+            students = data.get("students", []) if isinstance(data, dict) else []
+            self._write_students(conn, previous.get("students") if isinstance(previous, dict) else None,
+                                 students)
+            self._bump(conn, "students", "payments")
+        elif dataset == "groups":
+            groups = data.get("groups", []) if isinstance(data, dict) else []
+            conn.execute("DELETE FROM groups")
+            for group in groups:
+                self._insert_group(conn, group)
+            self._bump(conn, "groups")
+        elif dataset == "joining_dates":
+            conn.execute("DELETE FROM join_dates")
+            for group_id, records in (data if isinstance(data, dict) else {}).items():
+                for record in records if isinstance(records, list) else []:
+                    self._insert_join_date(conn, group_id, record)
+            self._bump(conn, "joining_dates")
+        elif dataset.startswith(ATTENDANCE_PREFIX):
+            group_id = dataset[len(ATTENDANCE_PREFIX):]
+            if not isinstance(previous, dict):
+                previous = self._load_attendance(conn, group_id)
+            self._write_attendance(conn, group_id, previous, data if isinstance(data, dict) else {})
+            self._bump(conn, dataset)
+        else:
+            raise ValueError(f"Unknown dataset: {dataset}")
+
+    @staticmethod
+    def _insert_group(conn, group):
+        group = group if isinstance(group, dict) else {}
+        conn.execute(
+            "INSERT INTO groups (id, name, teacher, group_start_date, group_end_date, record) VALUES (?, ?, ?, ?, ?, ?)",
+            (_text(group.get("id")), group.get("name"), group.get("teacher"),
+             group.get("group_start_date"), group.get("group_end_date"), _dumps(group))
+        )
+
+    @staticmethod
+    def _insert_join_date(conn, group_id, record):
+        conn.execute(
+            "INSERT INTO join_dates (group_id, student_id, join_date, record) VALUES (?, ?, ?, ?)",
+            (str(group_id), _text(record.get("student_id")) if isinstance(record, dict) else None,
+             record.get("join_date") if isinstance(record, dict) else None, _dumps(record))
+        )
+
+    @staticmethod
+    def _student_columns(student):
+        """(id, name, phone, has_sister, payment_status, has_payments, record) of a stored student"""
+        if not isinstance(student, dict):
+            return (None, None, None, None, None, 0, _dumps(student))
+        has_payments = isinstance(student.get("payments"), list)
+        record = {k: v for k, v in student.items() if k != "payments"} if has_payments else student
+        return (_text(student.get("id")), student.get("name"), student.get("phone"),
+                1 if student.get("has_sister") else 0, student.get("payment_status"),
+                1 if has_payments else 0, _dumps(record))
+
+    def _insert_payment(self, conn, student_row, student_id, payment, index):
+        # Payments stored without an id get the positional id the ledger already uses for them
+        uid = payment.get("id") or f"{student_id}-{index}"
+        record = payment if payment.get("id") else dict(payment, id=uid)
+        conn.execute(
+            "INSERT INTO payments (student_row, student_id, uid, amount_agorot, date_iso, payment_method, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (student_row, student_id, uid, payment_agorot(payment), _iso_date(payment.get("date")),
+             payment.get("payment_method"), _dumps(record))
+        )
+
+    def _insert_student_children(self, conn, student_row, student):
+        if not isinstance(student, dict):
+            return
+        student_id = _text(student.get("id"))
+        for position, group_id in enumerate(student.get("group_ids") or []):
+            conn.execute("INSERT INTO enrollments (student_row, group_id, position) VALUES (?, ?, ?)",
+                         (student_row, str(group_id), position))
+        payments = student.get("payments")
+        for index, payment in enumerate(payments if isinstance(payments, list) else []):
+            if isinstance(payment, dict):
+                self._insert_payment(conn, student_row, student_id, payment, index)
+
+    def _insert_student(self, conn, student):
+        cursor = conn.execute(
+            "INSERT INTO students (id, name, phone, has_sister, payment_status, has_payments, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", self._student_columns(student)
+        )
+        self._insert_student_children(conn, cursor.lastrowid, student)
+        return cursor.lastrowid
+
+    def _update_student(self, conn, student_row, student):
+        conn.execute(
+            "UPDATE students SET id = ?, name = ?, phone = ?, has_sister = ?, payment_status = ?, "
+            "has_payments = ?, record = ? WHERE row = ?", self._student_columns(student) + (student_row,)
+        )
+        conn.execute("DELETE FROM enrollments WHERE student_row = ?", (student_row,))
+        conn.execute("DELETE FROM payments WHERE student_row = ?", (student_row,))
+        self._insert_student_children(conn, student_row, student)
+
+    def _write_students(self, conn, previous, students):
+        """Rewrite only the students that differ from `previous` (the snapshot last loaded or written)"""
+        if previous is None or self._students is None or previous is not self._students[0]:
+            self._replace_students(conn, students)
+            return
+
+        old_rows = self._students[1]
+        positions = {}
+        for position, student in enumerate(previous):
+            key = student.get("id") if isinstance(student, dict) else None
+            positions.setdefault(_text(key), deque()).append(position)
+
+        rows = []
+        next_old = 0
+        for student in students:
+            key = _text(student.get("id")) if isinstance(student, dict) else None
+            candidates = positions.get(key)
+            while candidates and candidates[0] < next_old:
+                candidates.popleft()
+            if not candidates:
+                if next_old < len(previous):
+                    # Inserted before existing students; rows are read back in insertion order
+                    self._replace_students(conn, students)
+                    return
+                rows.append(self._insert_student(conn, student))
+                continue
+            position = candidates.popleft()
+            for removed in old_rows[next_old:position]:
+                conn.execute("DELETE FROM students WHERE row = ?", (removed,))
+            if student != previous[position]:
+                self._update_student(conn, old_rows[position], student)
+            rows.append(old_rows[position])
+            next_old = position + 1
+        for removed in old_rows[next_old:]:
+            conn.execute("DELETE FROM students WHERE row = ?", (removed,))
+        self._students = (students, rows)
+
+    def _replace_students(self, conn, students):
+        conn.execute("DELETE FROM students")
+        self._students = (students, [self._insert_student(conn, student) for student in students])
+
+    @staticmethod
+    def _write_attendance(conn, group_id, previous, data):
+        """Upsert the marks that changed and delete the ones that were removed"""
+        group_id = str(group_id)
+        for date, marks in data.items():
+            old_marks = previous.get(date) or {}
+            for student_id, present in (marks or {}).items():
+                student_id = str(student_id)
+                if student_id in old_marks and bool(old_marks[student_id]) == bool(present):
+                    continue
+                conn.execute(
+                    "INSERT INTO attendance (group_id, date, date_iso, student_id, present) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (group_id, date, student_id) DO UPDATE SET present = excluded.present",
+                    (group_id, date, _iso_date(date), student_id, 1 if present else 0)
+                )
+        for date, marks in previous.items():
+            new_marks = data.get(date) or {}
+            for student_id in marks or {}:
+                if str(student_id) not in new_marks:
+                    conn.execute("DELETE FROM attendance WHERE group_id = ? AND date = ? AND student_id = ?",
+                                 (group_id, date, str(student_id)))
+
+    def apply_payment_record(self, record):
+        """Store one payment ledger record (add/edit/delete) as a single payment row change"""
+        with self._lock:
+            conn = self.connect()
+            try:
+                with conn:
+                    return self._apply_payment_record(conn, record)
+            except Exception:
+                self._rolled_back()
+                raise
+
+    def _apply_payment_record(self, conn, record):
+        student_id = _text(record.get("student_id"))
+        found = conn.execute("SELECT row, record FROM students WHERE id = ? ORDER BY row LIMIT 1",
+                             (student_id,)).fetchone()
+        if found is None:
+            return False
+        student_row = found["row"]
+        payment_id = record.get("payment_id")
+        existing = conn.execute("SELECT row FROM payments WHERE student_row = ? AND uid = ?",
+                                (student_row, payment_id)).fetchone()
+
+        op = record.get("op")
+        if op in ("add", "edit"):
+            payment = dict(record.get("payment", {}), id=payment_id)
+            if existing is not None:
+                conn.execute(
+                    "UPDATE payments SET amount_agorot = ?, date_iso = ?, payment_method = ?, record = ? "
+                    "WHERE row = ?",
+                    (payment_agorot(payment), _iso_date(payment.get("date")),
+                     payment.get("payment_method"), _dumps(payment), existing["row"])
+                )
+            elif op == "add":
+                self._insert_payment(conn, student_row, student_id, payment, 0)
+        elif op == "delete" and existing is not None:
+            conn.execute("DELETE FROM payments WHERE row = ?", (existing["row"],))
+
+        if record.get("payment_status") is not None:
+            stored = json.loads(found["record"])
+            stored["payment_status"] = record["payment_status"]
+            conn.execute("UPDATE students SET payment_status = ?, record = ? WHERE row = ?",
+                         (record["payment_status"], _dumps(stored), student_row))
+        self._bump(conn, "payments")
+        return True
+
+    # Migration
+
+    def migrate_from_json(self):
+        """Import the JSON data tree into the database, replacing its contents"""
+        from utils.data_store import DataStore
+
+        # A store of its own that reads the files (and the payment ledger), even if a database exists
+        store = DataStore(use_sqlite=False)
+        students = store.read(store.students_file, {})
+        students = students.get("students", []) if isinstance(students, dict) else []
+        # In the form the store writes: group ids instead of names, normalised amounts
+        students = store._prepare(store.students_file,
+                                  {"students": store.payment_ledger().apply(students)})["students"]
+        groups = store.load_groups()
+        joining_dates = store.load_joining_dates()
+        group_ids = store.attendance_group_ids()
+
+        counts = {"groups": 0, "students": 0, "join_dates": 0, "payments": 0, "attendance": 0}
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("PRAGMA user_version = 0")
+                for table in ("attendance", "payments", "join_dates", "enrollments", "students", "groups", "versions"):
+                    conn.execute(f"DELETE FROM {table}")
+                self._versions = {}
+
+                self._write(conn, "groups", {"groups": groups})
+                counts["groups"] = len(groups)
+                self._write(conn, "students", {"students": students})
+                counts["students"] = len(students)
+                counts["payments"] = sum(len(s.get("payments") or []) for s in students if isinstance(s, dict))
+                self._write(conn, "joining_dates", joining_dates)
+                counts["join_dates"] = sum(len(r) for r in joining_dates.values() if isinstance(r, list))
+                for group_id in group_ids:
+                    attendance = store.load_attendance(group_id)
+                    self._write(conn, f"{ATTENDANCE_PREFIX}{group_id}", attendance, previous={})
+                    counts["attendance"] += sum(len(marks or {}) for marks in attendance.values())
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return counts
+
+    def export_to_json(self):
+        """Write the database back to the JSON files and set it aside, so the app uses the files again"""
+        from utils.atomic_io import atomic_write_json
+        from utils.data_store import DataStore
+
+        store = DataStore(use_sqlite=False)
+        with self._lock:
+            atomic_write_json(store.students_file, self.load("students"))
+            atomic_write_json(store.groups_file, self.load("groups"), indent=2)
+            atomic_write_json(store.joining_dates_file, self.load("joining_dates"), indent=2)
+            for group_id in self.attendance_group_ids():
+                atomic_write_json(store.attendance_file(group_id), self.load(f"{ATTENDANCE_PREFIX}{group_id}"))
+            # Every ledger record is already in the database, and so in the exported students.json
+            ledger_file = store.data_dir / "payments_ledger.jsonl"
+            if ledger_file.exists():
+                with open(ledger_file, "wb"):
+                    pass
+            self.close()
+            os.replace(self.db_path, self.db_path.with_name(self.db_path.name + ".bak"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DanceSchool SQLite storage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Import the JSON data files into SQLite and use it")
+    migrate_parser.add_argument("--db", help="Database path (defaults to the AppData data folder)")
+    export_parser = subparsers.add_parser("export", help="Write the database back to the JSON files and stop using it")
+    export_parser.add_argument("--db", help="Database path (defaults to the AppData data folder)")
+    args = parser.parse_args(argv)
+
+    store = SQLiteStore(args.db)
+    if args.command == "migrate":
+        counts = store.migrate_from_json()
+        store.close()
+        print(f"Migrated into {store.db_path}:")
+        for table, count in counts.items():
+            print(f"  {table}: {count}")
+    elif args.command == "export":
+        if not store.db_path.exists():
+            print(f"No database at {store.db_path}")
+            return
+        store.export_to_json()
+        print(f"Exported {store.db_path} to the JSON files; the database was renamed to {store.db_path.name}.bak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import json
+import os
+import time
+from datetime import datetime
+
+
+class StartupTimer:
+    """Startup milestones, in milliseconds since main.py started importing.
+
+    ``main.py`` marks when its imports are done, when the first frame (the
+    sidebar and the home page skeleton) was sent, and when the dashboard
+    numbers were filled in. ``report`` prints the milestones and appends
+    them as one JSON line to ``startup_timings.jsonl`` in the data folder,
+    so runs can be compared over time.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks = []
+        self.reported = False
+
+    def mark(self, name):
+        """Record that a milestone was reached now"""
+        self.marks.append((name, round((time.perf_counter() - self.start) * 1000, 1)))
+
+    def report(self, log_file=None):
+        """Print the milestones (once) and append them to `log_file`"""
+        if self.reported:
+            return
+        self.reported = True
+
+        print("Startup timing:")
+        for name, elapsed_ms in self.marks:
+            print(f"  {name:<20} {elapsed_ms:>8.1f} ms")
+
+        if not log_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(str(log_file)), exist_ok=True)
+            with open(log_file, "a", encoding="utf-8") as f:
+                entry = {"timestamp": datetime.now().isoformat(timespec="seconds"), "marks": dict(self.marks)}
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Error saving startup timing: {e}")
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,181 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_right
+from typing import List, Dict, Any
+
+SEARCH_FIELDS = ("name", "id", "phone", "parent_name")
+
+_FINAL_LETTERS = str.maketrans({"ך": "כ", "ם": "מ", "ן": "נ", "ף": "פ", "ץ": "צ"})
+_NIQQUD = re.compile(r"[֑-ׇ]")
+_IGNORED = re.compile(r"[\"'`׳״\-_.,/()]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text) -> str:
+    """Normalize text for searching: no niqqud or final letters, no punctuation, lower case"""
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFC", str(text))
+    text = _NIQQUD.sub("", text)
+    text = _IGNORED.sub("", text)
+    text = text.translate(_FINAL_LETTERS).lower()
+    return _SPACES.sub(" ", text).strip()
+
+
+class StudentSearchIndex:
+    """Substring search over the searchable fields of every student.
+
+    The normalized fields of all students are kept in one string, so a query
+    is a handful of ``str.find`` calls instead of serialising every student.
+    ``sync`` re-normalizes only students whose searchable fields changed.
+    Use ``DataStore.student_search_index()`` to get the shared instance.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._source = None
+        self._entries = {}
+        self._order = []
+        self._positions = []
+        self._blob = None
+        self._starts = []
+        self._documents = []
+
+    @staticmethod
+    def _fields(student):
+        values = [student.get(field, "") for field in SEARCH_FIELDS]
+        groups = student.get("groups")
+        if groups is None and student.get("group"):
+            groups = [student["group"]]
+        values.extend(groups or [])
+        return tuple(str(v) for v in values if v not in (None, ""))
+
+    @staticmethod
+    def _document(fields) -> str:
+        # Fields are separated by a character that normalize() keeps and a query can't contain
+        return normalize("\0".join(fields))
+
+    @staticmethod
+    def document(student) -> str:
+        """The normalized searchable text of one student"""
+        return StudentSearchIndex._document(StudentSearchIndex._fields(student))
+
+    def sync(self, students: List[Dict[str, Any]]):
+        """Bring the index in line with a students list"""
+        with self._lock:
+            if students is self._source:
+                return
+            entries = {}
+            order = []
+            positions = []
+            for position, student in enumerate(students):
+                student_id = student.get("id")
+                if student_id is None or student_id in entries:
+                    continue
+                fields = self._fields(student)
+                cached = self._entries.get(student_id)
+                if cached is None or cached[0] != fields:
+                    cached = (fields, self._document(fields))
+                entries[student_id] = cached
+                order.append(student_id)
+                positions.append(position)
+            self._entries = entries
+            self._order = order
+            self._positions = positions
+            self._source = students
+            self._blob = None
+
+    def update(self, student):
+        """Add or refresh a single student"""
+        with self._lock:
+            student_id = student.get("id")
+            if student_id not in self._entries:
+                self._order.append(student_id)
+            fields = self._fields(student)
+            self._entries[student_id] = (fields, self._document(fields))
+            self._source = None
+            self._blob = None
+
+    def remove(self, student_id):
+        """Drop a student from the index"""
+        with self._lock:
+            if self._entries.pop(student_id, None) is not None:
+                self._order.remove(student_id)
+                self._source = None
+                self._blob = None
+
+    def __contains__(self, student_id):
+        return student_id in self._entries
+
+    def _build_blob(self):
+        starts = []
+        position = 0
+        documents = []
+        for student_id in self._order:
+            document = self._entries[student_id][1]
+            starts.append(position)
+            documents.append(document)
+            position += len(document) + 1
+        self._blob = "\n".join(documents)
+        self._starts = starts
+        self._documents = documents
+
+    def _search_indexes(self, terms):
+        """Positions in the index order of the documents containing every term"""
+        if self._blob is None:
+            self._build_blob()
+        blob, starts, documents = self._blob, self._starts, self._documents
+        find = blob.find
+
+        # Scan the whole index for the longest term, then check the rest per candidate
+        terms = sorted(terms, key=len, reverse=True)
+        first, rest = terms[0], terms[1:]
+        found = []
+        position = find(first)
+        while position != -1:
+            index = bisect_right(starts, position) - 1
+            if not rest or all(term in documents[index] for term in rest):
+                found.append(index)
+            position = find(first, starts[index] + len(documents[index]) + 1)
+        return found
+
+    @staticmethod
+    def _terms(query):
+        return [t for t in normalize(query).split(" ") if t]
+
+    def search(self, query: str) -> set:
+        """Ids of the students matching every word of the query (prefix or substring)"""
+        terms = self._terms(query)
+        with self._lock:
+            if not terms:
+                return set(self._entries)
+            order = self._order
+            return {order[index] for index in self._search_indexes(terms)}
+
+    def filter(self, students: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+        """The students of a list that match the query, in list order"""
+        terms = self._terms(query)
+        if not terms:
+            return list(students)
+
+        with self._lock:
+            if students is self._source:
+                positions = self._positions
+                return [students[positions[index]] for index in self._search_indexes(terms)]
+            matching_ids = {self._order[index] for index in self._search_indexes(terms)}
+            entries = self._entries
+
+        result = []
+        for student in students:
+            student_id = student.get("id")
+            if student_id in matching_ids:
+                result.append(student)
+            elif student_id not in entries and self.matches(student, query):
+                result.append(student)
+        return result
+
+    def matches(self, student, query: str) -> bool:
+        """Check one student against a query without using the index"""
+        document = self.document(student)
+        return all(term in document for term in self._terms(query))
@@ -1,7 +1,8 @@
-import json
 from typing import List, Dict, Any
-from datetime import datetime
 from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
+from utils.data_events import ADDED, ATTENDANCE_CHANGED, REMOVED, STUDENTS_CHANGED, UPDATED, DataChange
+from utils.money import normalize_payment
 
 class StudentsDataManager:
     """Manager for students data operations"""
@@ -12,22 +13,22 @@ class StudentsDataManager:
         
         self.students_file = data_dir / "students.json"
         self.groups_file = data_dir / "groups.json"
+        self.store = DataStore.instance()
 
 
-    def load_students(self):
-        """Load students from JSON file"""
+    def load_students(self, copy=False):
+        """Load students from the shared data store"""
         try:
-            with open(self.students_file, encoding="utf-8") as f:
-                data = json.load(f)
-                return data.get("students", [])
-        except FileNotFoundError:
-            return []
+            return self.store.load_students(copy=copy)
         except Exception as e:
             print(f"Error loading students: {e}")
             return []
         
     def get_students_stats(self, students: List[Dict[str, Any]]) -> Dict[str, int]:
         """Calculate students statistics"""
+        if students is self.store.load_students():
+            return dict(self.store.students_stats())
+
         total_students = len(students)
         paid_students = len([s for s in students if isinstance(s.get("payment_status"), str) and s.get("payment_status").startswith("שולם")])
         unpaid_students = total_students - paid_students
@@ -39,50 +40,50 @@ class StudentsDataManager:
         }
     
     def filter_students(self, students: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
-        """Filter students based on search query"""
+        """Filter students by name, id, phone, parent name or group"""
         if not query:
             return students.copy()
         
-        query_lower = query.lower()
-        return [
-            student for student in students
-            if query_lower in json.dumps(student, ensure_ascii=False).lower()
-        ]
+        return self.store.student_search_index().filter(students, query)
 
-    def get_all_students(self):
+    def get_all_students(self, copy=False):
         """Get all students"""
         try:
-            with open(self.students_file, encoding="utf-8") as f:
-                return json.load(f).get("students", [])
+            return self.store.load_students(copy=copy)
         except Exception as e:
             print(f"Error loading students: {e}")
             return []
 
-    def get_students_by_group(self, group_name):
-        students = self.get_all_students()
-        result = []
+    def get_students_by_group(self, group_name, with_status=True):
+        """Students of a group; with_status=False skips the payment statuses (see payment_statuses)"""
+        students = [dict(s) for s in self.get_all_students() if group_name in s.get("groups", [])]
+        if not with_status:
+            return students
+        summaries = self.store.payment_status_cache().summaries()
         for s in students:
-            if group_name in s.get("groups", []):
-                self.recalc_payment_status(s)
-                result.append(s)
-        return result
+            summary = summaries.get(s.get("id"))
+            if summary:
+                s['payment_status'] = summary["status"]
+        return students
+
+    def payment_statuses(self, students):
+        """Payment status of each given student, keyed by id"""
+        summaries = self.store.payment_status_cache().summaries(students)
+        return {student_id: summary["status"] for student_id, summary in summaries.items()}
 
-    def save_students(self, students):
-        """Save students to file"""
+    def save_students(self, students, change=None):
+        """Save students to file; `change` describes what changed (default: any student)"""
         try:
-            with open(self.students_file, 'w', encoding="utf-8") as f:
-                json.dump({"students": students}, f, ensure_ascii=False, indent=4)
+            self.store.write(self.students_file, {"students": students}, change=change)
             return True
         except Exception as e:
             print(f"Error saving students: {e}")
             return False
 
     def load_groups(self):
-        """Load groups from JSON file"""
+        """Load groups from the shared data store"""
         try:
-            with open(self.groups_file, encoding="utf-8") as f:
-                data = json.load(f)
-                return data.get("groups", [])
+            return self.store.load_groups()
         except Exception as e:
             print(f"Error loading groups: {e}")
             return []
@@ -90,7 +91,7 @@ class StudentsDataManager:
     def update_student(self, student_id, new_data):
         """Update a specific student by ID"""
         try:
-            students = self.get_all_students()
+            students = self.get_all_students(copy=True)
             
             updated = False
             for i, student in enumerate(students):
@@ -100,7 +101,7 @@ class StudentsDataManager:
                     break
             
             if updated:
-                success = self.save_students(students)
+                success = self.save_students(students, DataChange(STUDENTS_CHANGED, UPDATED, student_ids=[student_id]))
                 return success
             else:
                 return False
@@ -110,9 +111,13 @@ class StudentsDataManager:
             return False
 
 
-    def add_student(self, student_data):
-        """Add new student or add group to existing student"""
-        students = self.load_students()
+    def add_student(self, student_data, group_id=None):
+        """Add new student or add group to existing student.
+
+        With `group_id`, the student's join date in that group is saved in
+        the same transaction as the student.
+        """
+        students = self.load_students(copy=True)
         student_id = student_data.get("id")
         new_group = student_data.get("group")
         
@@ -140,7 +145,21 @@ class StudentsDataManager:
             
             students.append(student_data)
         
-        return self.save_students(students)
+        if group_id is None:
+            group = self.store.groups_by_name().get(new_group)
+            group_id = group.get("id") if group else None
+        change = DataChange(STUDENTS_CHANGED, ADDED, student_ids=[student_id],
+                            group_ids=[group_id] if group_id else None)
+        join_date = student_data.get("join_date")
+        try:
+            with self.store.transaction() as tx:
+                tx.write(self.students_file, {"students": students}, change=change)
+                if group_id and join_date:
+                    self.store.set_join_date(group_id, student_id, student_data.get("name"), join_date, tx=tx)
+            return True
+        except Exception as e:
+            print(f"Error saving students: {e}")
+            return False
     
     def student_exists(self, student_id):
         """Check if student with given ID exists"""
@@ -156,8 +175,8 @@ class StudentsDataManager:
             for student in students
         )
     
-    def delete_student_attendance(self, student_id, group_name):
-        """Delete student attendance from group attendance file"""
+    def delete_student_attendance(self, student_id, group_name, tx=None):
+        """Delete student attendance from group attendance file (staged in the transaction `tx` when given)"""
         try:
             groups = self.load_groups()
             group_id = None
@@ -171,16 +190,12 @@ class StudentsDataManager:
                 print(f"Group '{group_name}' not found")
                 return False
             
-            attendances_dir = ManageJSON.get_appdata_path() / "attendances"
-            attendance_file = attendances_dir / f"attendance_{group_id}.json"
-            
-            if not attendance_file.exists():
-                print(f"Attendance file {attendance_file} not found")
+            attendance_file = self.store.attendance_file(group_id)
+            attendance_data = self.store.load_attendance(group_id, copy=True)
+            if not attendance_data:
+                print(f"No attendance recorded for group {group_name}")
                 return True  
             
-            with open(attendance_file, 'r', encoding="utf-8") as f:
-                attendance_data = json.load(f)
-            
             updated = False
             for date in attendance_data:
                 if student_id in attendance_data[date]:
@@ -188,8 +203,9 @@ class StudentsDataManager:
                     updated = True
             
             if updated:
-                with open(attendance_file, 'w', encoding="utf-8") as f:
-                    json.dump(attendance_data, f, ensure_ascii=False, indent=2)
+                (tx or self.store).write(attendance_file, attendance_data, change=DataChange(
+                    ATTENDANCE_CHANGED, REMOVED, student_ids=[student_id], group_ids=[group_id]
+                ))
                 print(f"Deleted attendance for student {student_id} from group {group_name}")
             
             return True
@@ -201,7 +217,7 @@ class StudentsDataManager:
     def delete_student_from_group(self, student_id, group_name):
         """Delete a student from specific group or completely if it's the last group"""
         try:
-            students = self.get_all_students()
+            students = self.get_all_students(copy=True)
             updated = False
             
             for i, student in enumerate(students):
@@ -215,8 +231,6 @@ class StudentsDataManager:
                     if group_name in groups:
                         groups.remove(group_name)
                         
-                        self.delete_student_attendance(student_id, group_name)
-                        
                         if len(groups) == 0:
                             students.pop(i)
                         else:
@@ -226,8 +240,15 @@ class StudentsDataManager:
                         break
             
             if updated:
-                success = self.save_students(students)
-                return success
+                group = self.store.groups_by_name().get(group_name)
+                change = DataChange(STUDENTS_CHANGED, REMOVED, student_ids=[student_id],
+                                    group_ids=[group.get("id")] if group else None)
+                # The student and their attendance in the group are removed together, or not at all
+                with self.store.transaction() as tx:
+                    self.delete_student_attendance(student_id, group_name, tx=tx)
+                    tx.write(self.students_file, {"students": students}, change=change)
+                self._purge_payments([student_id], students)
+                return True
             else:
                 print("Student not found in specified group")
                 return False
@@ -243,81 +264,46 @@ class StudentsDataManager:
             student_exists = any(s['name'] == student_name for s in students)
             print(f"Student exists: {student_exists}")
             updated_students = [s for s in students if s['name'] != student_name]
-            success = self.save_students(updated_students)
+            removed_ids = [s['id'] for s in students if s['name'] == student_name]
+            success = self.save_students(updated_students, DataChange(STUDENTS_CHANGED, REMOVED, student_ids=removed_ids))
+            if success:
+                self._purge_payments(removed_ids, updated_students)
             return success
             
         except Exception as e:
             print(f"Error in delete_student: {e}")
             return False
 
+    def _purge_payments(self, student_ids, students):
+        """Drop the payment ledger records of the given students that are no longer in `students`"""
+        remaining = {student.get("id") for student in students}
+        self.store.payment_ledger().purge([sid for sid in student_ids if sid not in remaining])
+
     def add_payment(self, student_id, payment_data):
         """Add payment to student and update payment status"""
-        from .payment_utils import PaymentCalculator 
-        
-        students = self.get_all_students()
-        payment_calculator = PaymentCalculator() 
+        from .payment_status_engine import PaymentStatusEngine
         
-        for student in students:
-            if student['id'] == student_id:
-                student.setdefault("payments", []).append(payment_data)
-                
-                total_paid = sum(
-                    float(p['amount']) for p in student['payments']
-                    if isinstance(p.get('amount'), (int, float)) or 
-                    (isinstance(p.get('amount'), str) and p['amount'].replace('.', '', 1).isdigit())
-                )
-
-                calc_result = payment_calculator.calculate_student_payment_until_now(student_id)
-                if calc_result.get("success"):
-                    total_owed = calc_result["total_payment"]
-                else:
-                    total_owed = 0
-
-                total_course_payment = 0
-                try:
-                    groups_with_dates = payment_calculator.get_student_groups_with_join_dates(student_id)
-                    latest_end_date = None
-                    for g in groups_with_dates:
-                        end = g.get("end_date")
-                        if end:
-                            try:
-                                dt = datetime.strptime(end, "%d/%m/%Y")
-                                if latest_end_date is None or dt > latest_end_date:
-                                    latest_end_date = dt
-                            except Exception:
-                                continue
+        student = self.store.students_by_id().get(student_id)
+        if student is None:
+            print(f"Student {student_id} not found")
+            return False
 
-                    if latest_end_date:
-                        periods = payment_calculator.create_discount_periods_for_student(student_id, latest_end_date)
-                        for period in periods:
-                            pr = payment_calculator.calculate_period_payment_with_discount_rules(student_id, period)
-                            if pr.get("success"):
-                                total_course_payment += pr.get("total_payment", 0)
-                except Exception:
-                    total_course_payment = 0
+        updated_student = dict(student, payments=student.get("payments", []) + [payment_data])
+        payment_status = PaymentStatusEngine().compute(updated_student)["status"]
 
-                if total_owed > 0:
-                    if total_course_payment > 0 and total_paid >= total_course_payment:
-                        if total_paid == total_course_payment:
-                            student['payment_status'] = "שולם במלואו"
-                        else:
-                            student['payment_status'] = "שילם יותר (זיכוי)"
-                    else:
-                        if total_paid >= total_owed:
-                            student['payment_status'] = "שולם חלקית"
-                        else:
-                            student['payment_status'] = "חוב"
-                else:
-                    student['payment_status'] = "לא נמצא מחיר קבוצות"
-                break
-        
-        return self.save_students(students)
+        try:
+            totals = self.store.payment_totals()
+            payment_id = self.store.payment_ledger().add(student_id, payment_data, payment_status=payment_status)
+            totals.record_add(student, dict(normalize_payment(payment_data), id=payment_id))
+            return True
+        except Exception as e:
+            print(f"Error adding payment: {e}")
+            return False
 
     def _get_groups(self):
         """Get groups data for pricing"""
         try:
-            with open(self.groups_file, encoding="utf-8") as f:
-                return json.load(f).get("groups", [])
+            return self.store.load_groups()
         except Exception as e:
             print(f"Error loading groups: {e}")
             return []
@@ -325,7 +311,7 @@ class StudentsDataManager:
     def migrate_old_format(self):
         """Migrate old format (single group) to new format (groups array)"""
         try:
-            students = self.get_all_students()
+            students = self.get_all_students(copy=True)
             updated = False
             
             for student in students:
@@ -345,61 +331,7 @@ class StudentsDataManager:
         
     def recalc_payment_status(self, student):
         """Recalculate and update payment status for a student"""
-        from .payment_utils import PaymentCalculator
+        from .payment_status_engine import PaymentStatusEngine
         
-        payment_calculator = PaymentCalculator()
-
-        total_paid = sum(
-            float(p['amount']) for p in student.get('payments', [])
-            if isinstance(p.get('amount'), (int, float)) or
-            (isinstance(p.get('amount'), str) and p['amount'].replace('.', '', 1).isdigit())
-        )
-
-        calc_result = payment_calculator.calculate_student_payment_until_now(student.get('id'))
-        if calc_result.get("success"):
-            total_owed = calc_result["total_payment"]
-            course_started = calc_result.get("course_started", True) 
-        else:
-            total_owed = 0
-            course_started = False
-        total_course_payment = 0
-        try:
-            groups_with_dates = payment_calculator.get_student_groups_with_join_dates(student.get('id'))
-            latest_end_date = None
-            for g in groups_with_dates:
-                end = g.get("end_date")
-                if end:
-                    try:
-                        dt = datetime.strptime(end, "%d/%m/%Y")
-                        if latest_end_date is None or dt > latest_end_date:
-                            latest_end_date = dt
-                    except Exception:
-                        continue
-
-            if latest_end_date:
-                periods = payment_calculator.create_discount_periods_for_student(student.get('id'), latest_end_date)
-                for period in periods:
-                    pr = payment_calculator.calculate_period_payment_with_discount_rules(student.get('id'), period)
-                    if pr.get("success"):
-                        total_course_payment += pr.get("total_payment", 0)
-        except Exception:
-            total_course_payment = 0
-
-        if total_owed > 0:
-            if total_course_payment > 0 and total_paid >= total_course_payment:
-                if total_paid == total_course_payment:
-                    student['payment_status'] = "שולם במלואו"
-                else:
-                    student['payment_status'] = "שילם יותר (זיכוי)"
-            else:
-                if total_paid >= total_owed:
-                    student['payment_status'] = "שולם חלקית"
-                else:
-                    student['payment_status'] = "חוב"
-        else:
-            if not course_started:
-                student['payment_status'] = "החוג לא התחיל"
-            else:
-                student['payment_status'] = "לא נמצא מחיר קבוצות"
-
+        student['payment_status'] = PaymentStatusEngine().compute(student)["status"]
         return student
@@ -1,6 +1,7 @@
 import flet as ft
 from components.modern_dialog import ModernDialog
 from datetime import datetime
+from utils.money import to_agorot
 
 
 class AddPaymentView:
@@ -327,12 +328,11 @@ class AddPaymentView:
         if not self.form_state['amount'].strip():
             errors.append("יש להזין סכום")
         else:
-            try:
-                amount = float(self.form_state['amount'])
-                if amount <= 0:
-                    errors.append("הסכום חייב להיות חיובי")
-            except ValueError:
+            amount = to_agorot(self.form_state['amount'])
+            if amount is None:
                 errors.append("יש להזין סכום תקין (מספר בלבד)")
+            elif amount <= 0:
+                errors.append("הסכום חייב להיות חיובי")
         
         if not self.form_state['date'].strip():
             errors.append("יש להזין תאריך")
@@ -422,7 +422,7 @@ class AddPaymentView:
             return ft.Container()
         
         try:
-            amount = float(self.form_state['amount'])
+            amount = to_agorot(self.form_state['amount']) / 100
             summary_items = [
                 ft.Row([
                     ft.Text("סכום:", size=14, color="#64748b", weight=ft.FontWeight.W_500),
@@ -1,8 +1,8 @@
-import json
 import flet as ft
 from typing import Dict, Any
 from utils.attendance_utils import AttendanceUtils
-from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
+from utils.data_events import ATTENDANCE_CHANGED, FLUSHED, GROUPS_CHANGED, STUDENTS_CHANGED
 
 class AttendanceTableView:
     def __init__(self, page: ft.Page, navigation_handler=None, group: Dict[str, Any] = None, parent_page=None):
@@ -13,32 +13,68 @@ class AttendanceTableView:
         self.attendance_data = {}
         self.students = []
         self.table_container = None 
+        self.status_toggles = {}
         
         self.load_data()
+        DataStore.instance().events().subscribe(
+            [ATTENDANCE_CHANGED, STUDENTS_CHANGED, GROUPS_CHANGED], self.on_data_changed
+        )
 
     def load_data(self):
         """Load attendance and student data"""
         self.attendance_data = AttendanceUtils.load_attendance_file(self.group.get('id', ''))
-        
+        self.students = self.load_group_students()
+
+    def load_group_students(self):
+        """Students of this group, as {"id", "name"} dicts"""
+        students = []
         try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            students_file = data_dir / "students.json"
-            
-            if students_file.exists():
-                with open(students_file, "r", encoding="utf-8") as f:
-                    students_data = json.load(f)
-                    self.students = []
-                    for s in students_data.get("students", []):
-                        student_groups = s.get("groups", [])
-                        if self.group.get("name", "").strip() in student_groups:
-                            self.students.append({"id": s["id"], "name": s["name"]})
+            for s in DataStore.instance().load_students():
+                student_groups = s.get("groups", [])
+                if self.group.get("name", "").strip() in student_groups:
+                    students.append({"id": s["id"], "name": s["name"]})
         except Exception as e:
             print(f"Error loading students: {e}")
+        return students
+
+    def on_data_changed(self, change):
+        """Patch the table for changes made elsewhere in the app"""
+        if change.source is not None and change.source in (self, self.parent_page):
+            return
+        group_id = self.group.get('id', '')
+        try:
+            if change.topic == ATTENDANCE_CHANGED:
+                if change.action == FLUSHED or not change.affects_group(group_id):
+                    return
+                date = change.details.get("date")
+                if date in self.attendance_data and change.student_ids is not None and "is_present" in change.details:
+                    self.patch_attendance(date, change.student_ids, change.details["is_present"])
+                else:
+                    self.force_refresh_from_external()
+            elif change.topic == GROUPS_CHANGED:
+                group = DataStore.instance().groups_by_id().get(group_id)
+                if change.affects_group(group_id) and group:
+                    self.group = group
+                    self.force_refresh_from_external()
+            elif change.topic == STUDENTS_CHANGED:
+                if self.load_group_students() != self.students:
+                    self.force_refresh_from_external()
+        except Exception as e:
+            print(f"Error applying data change to attendance table: {e}")
+
+    def patch_attendance(self, date, student_ids, is_present):
+        """Update the toggles of some students on one date"""
+        for student_id in student_ids:
+            self.attendance_data.setdefault(date, {})[student_id] = is_present
+            toggle = self.status_toggles.get((date, student_id))
+            if toggle is not None:
+                toggle.content, toggle.tooltip = self.get_status_icon(is_present)
+        self.page.update()
 
     def save_attendance(self):
         """Save attendance data"""
         try:
-            AttendanceUtils.save_attendance_file(self.group.get('id', ''), self.attendance_data)
+            AttendanceUtils.save_attendance_file(self.group.get('id', ''), self.attendance_data, source=self)
         except Exception as e:
             print(f"Error saving attendance: {e}")
 
@@ -60,6 +96,7 @@ class AttendanceTableView:
     def create_modern_data_table(self):
         """Create modern React-style table with clean design and horizontal scroll"""
         dates = list(self.attendance_data.keys())
+        self.status_toggles = {}
         
         if not dates or not self.students:
             return self.create_empty_table_state()
@@ -195,31 +232,18 @@ class AttendanceTableView:
             if date not in self.attendance_data:
                 self.attendance_data[date] = {}
             self.attendance_data[date][str(student_id)] = new_status
-            self.save_attendance()
+            AttendanceUtils.set_attendance(self.group.get('id', ''), date, student_id, new_status, source=self)
             
-            if new_status:
-                new_icon = ft.Icon(ft.Icons.CHECK_CIRCLE, size=22, color=ft.Colors.GREEN_600)
-                e.control.tooltip = "נוכח - לחץ לשינוי"
-            else:
-                new_icon = ft.Icon(ft.Icons.CLOSE, size=22, color=ft.Colors.RED_500)
-                e.control.tooltip = "נעדר - לחץ לשינוי"
-            
-            e.control.content = new_icon
+            # Only this cell changed; the rest of the table stays as it is
+            e.control.content, e.control.tooltip = self.get_status_icon(new_status)
             e.control.update()
             
-            self.update_table_instantly()
             self.show_success_snackbar(f"נוכחות עודכנה ל{'נוכח' if new_status else 'נעדר'}")
         
         current_status = self.attendance_data.get(date, {}).get(str(student_id), False)
+        icon, tooltip_text = self.get_status_icon(current_status)
         
-        if current_status:
-            icon = ft.Icon(ft.Icons.CHECK_CIRCLE, size=22, color=ft.Colors.GREEN_600)
-            tooltip_text = "נוכח - לחץ לשינוי"
-        else:
-            icon = ft.Icon(ft.Icons.CLOSE, size=22, color=ft.Colors.RED_500)
-            tooltip_text = "נעדר - לחץ לשינוי"
-        
-        return ft.Container(
+        toggle = ft.Container(
             content=icon,
             padding=ft.padding.all(8),
             border_radius=8,
@@ -231,6 +255,14 @@ class AttendanceTableView:
             height=40,
             alignment=ft.alignment.center,
         )
+        self.status_toggles[(date, str(student_id))] = toggle
+        return toggle
+
+    def get_status_icon(self, is_present: bool):
+        """Icon and tooltip of a status toggle"""
+        if is_present:
+            return ft.Icon(ft.Icons.CHECK_CIRCLE, size=22, color=ft.Colors.GREEN_600), "נוכח - לחץ לשינוי"
+        return ft.Icon(ft.Icons.CLOSE, size=22, color=ft.Colors.RED_500), "נעדר - לחץ לשינוי"
 
     def create_empty_table_state(self):
         """Create empty state for table"""
@@ -5,7 +5,9 @@ from components.modern_card import ModernCard
 from components.clean_button import CleanButton
 from components.modern_dialog import ModernDialog
 from utils.payment_utils import PaymentCalculator
-from utils.manage_json import ManageJSON  
+from utils.data_store import DataStore
+from utils.background_tasks import BackgroundTasks
+from utils.money import format_shekels
 
 class PaymentsView:
     """View for managing student payments"""
@@ -45,24 +47,12 @@ class PaymentsView:
             self.sister_discount_amount = 20
 
     def load_student_data(self):
-        """Load fresh student data from file"""
+        """Load fresh student data (including recorded payment changes)"""
         try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            students_file = data_dir / "students.json"
+            self.student = DataStore.instance().students_by_id().get(self.student_id)
             
-            if students_file.exists():
-                with open(students_file, "r", encoding="utf-8") as f:
-                    students_data = json.load(f)
-                    
-                for student in students_data.get("students", []):
-                    if student.get("id") == self.student_id:
-                        self.student = student
-                        break
-                
-                if not self.student:
-                    self.student = {"id": self.student_id, "name": "התלמידה לא נמצאה", "payments": []}
-            else:
-                self.student = {"id": self.student_id, "name": "קובץ לא נמצא", "payments": []}
+            if not self.student:
+                self.student = {"id": self.student_id, "name": "התלמידה לא נמצאה", "payments": []}
                 
         except Exception as e:
             self.student = {"id": self.student_id, "name": "שגיאה בטעינה", "payments": []}
@@ -117,12 +107,38 @@ class PaymentsView:
         )
 
     def _create_payment_explanation(self):
+        """Create a placeholder that is replaced by the explanation card once it is calculated"""
+        placeholder = ft.Container(
+            content=ft.Row([
+                ft.ProgressRing(width=18, height=18, stroke_width=2, color=ft.Colors.BLUE_600),
+                ft.Text("מחשב את פירוט התשלום...", size=14, color=ft.Colors.GREY_600)
+            ], spacing=12),
+            padding=ft.padding.all(20)
+        )
+        
+        def show_explanation(explanation):
+            card = self._build_payment_explanation_card(explanation)
+            placeholder.content = card
+            placeholder.padding = None
+            placeholder.visible = card is not None
+            self.page.update()
+        
+        def show_error(error):
+            print(f"DEBUG: Error calculating payment explanation: {error}")
+            placeholder.visible = False
+            self.page.update()
+        
+        BackgroundTasks.instance().run(
+            "payment_explanation",
+            lambda: self.payment_calculator.get_student_payment_explanation(self.student_id),
+            on_result=show_explanation,
+            on_error=show_error
+        )
+        return placeholder
+
+    def _build_payment_explanation_card(self, explanation):
         """Create payment calculation explanation card"""
         try:
-            explanation = self.payment_calculator.get_student_payment_explanation(
-                self.student_id
-            )
-            
             if not explanation.get("success"):
                 print(f"DEBUG: explanation failed: {explanation}")
                 return None
@@ -377,16 +393,13 @@ class PaymentsView:
     def _render_payments_list(self):
         """Render payments list"""
         payments = self.student.get('payments', [])
-        total_paid = sum(
-            float(p['amount']) for p in payments
-            if p['amount'].replace('.', '', 1).isdigit()
-        )
+        totals = DataStore.instance().payment_totals().of(self.student)
         
         summary = ModernCard(
             content=ft.Container(
                 content=ft.Row([
-                    ft.Text(f"{len(payments)} תשלומים", size=14, color=ft.Colors.GREY_600),
-                    ft.Text(f"{total_paid:,.0f}₪", size=18, weight=ft.FontWeight.W_600, color=ft.Colors.GREEN_600)
+                    ft.Text(f"{totals.count} תשלומים", size=14, color=ft.Colors.GREY_600),
+                    ft.Text(format_shekels(totals.paid_agorot), size=18, weight=ft.FontWeight.W_600, color=ft.Colors.GREEN_600)
                 ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                 padding=ft.padding.all(16)
             )
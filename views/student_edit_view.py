@@ -1,9 +1,9 @@
-import json
 import flet as ft
 from components.modern_dialog import ModernDialog
-from utils.manage_json import ManageJSON
+from utils.data_store import DataStore
+from utils.data_events import STUDENTS_CHANGED, UPDATED, DataChange
 from utils.validation import ValidationUtils
-from utils.payment_utils import PaymentCalculator
+from utils.payment_status_engine import PaymentStatusEngine
 
 class StudentEditView:
     """View for editing student information with modern React-like styling"""
@@ -24,77 +24,43 @@ class StudentEditView:
     def _get_join_date_from_joining_dates(self):
         """Get join date from joining_dates.json file for the specific group"""
         try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            joining_dates_file = data_dir / "joining_dates.json"
+            join_dates = DataStore.instance().join_dates_index()
+            key = (str(self.group_id), str(self.student.get("id")))
+            if self.group_id and key in join_dates:
+                return join_dates[key]
             
-            if not joining_dates_file.exists():
+            if not self.student.get('groups', []):
                 return None
-                
-            with open(joining_dates_file, "r", encoding="utf-8") as f:
-                joining_dates = json.load(f)
-            
-            if self.group_id and self.group_id in joining_dates:
-                for student_entry in joining_dates[self.group_id]:
-                    if student_entry.get("student_id") == self.student.get("id"):
-                        return student_entry.get("join_date")
-            
-            student_groups = self.student.get('groups', [])
-            earliest_date = None
-            
-            for group_name in student_groups:
-                for gid, students_list in joining_dates.items():
-                    for student_entry in students_list:
-                        if student_entry.get("student_id") == self.student.get("id"):
-                            join_date = student_entry.get("join_date")
-                            if join_date:
-                                if not earliest_date:
-                                    earliest_date = join_date
-                                else:
-                                    from datetime import datetime
-                                    try:
-                                        current_date = datetime.strptime(join_date, "%d/%m/%Y")
-                                        earliest_date_obj = datetime.strptime(earliest_date, "%d/%m/%Y")
-                                        if current_date < earliest_date_obj:
-                                            earliest_date = join_date
-                                    except:
-                                        pass
-            
-            return earliest_date
+            return self._get_earliest_join_date_from_joining_dates(self.student.get("id"))
             
         except Exception as e:
             print(f"Error reading join date from joining_dates.json: {e}")
             return None
 
-    def _get_earliest_join_date_from_joining_dates(self, student_id):
-        """Get the earliest join date for a student from all groups in joining_dates.json"""
+    def _get_earliest_join_date_from_joining_dates(self, student_id, pending=None):
+        """Get the earliest join date for a student from all groups in joining_dates.json.
+
+        `pending` is a (group_id, join_date) not saved yet, used in place of the stored date of that group.
+        """
         try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            joining_dates_file = data_dir / "joining_dates.json"
-            
-            if not joining_dates_file.exists():
-                return None
-                
-            with open(joining_dates_file, "r", encoding="utf-8") as f:
-                joining_dates = json.load(f)
-            
             earliest_date = None
             from datetime import datetime
             
-            for group_id, students_list in joining_dates.items():
-                for student_entry in students_list:
-                    if student_entry.get("student_id") == student_id:
-                        join_date = student_entry.get("join_date")
-                        if join_date:
-                            try:
-                                current_date = datetime.strptime(join_date, "%d/%m/%Y")
-                                if not earliest_date:
-                                    earliest_date = current_date
-                                    earliest_date_str = join_date
-                                elif current_date < earliest_date:
-                                    earliest_date = current_date
-                                    earliest_date_str = join_date
-                            except ValueError:
-                                continue
+            join_dates = DataStore.instance().student_join_dates(student_id)
+            if pending is not None:
+                join_dates = [(g, d) for g, d in join_dates if str(g) != str(pending[0])] + [pending]
+            for group_id, join_date in join_dates:
+                if join_date:
+                    try:
+                        current_date = datetime.strptime(join_date, "%d/%m/%Y")
+                        if not earliest_date:
+                            earliest_date = current_date
+                            earliest_date_str = join_date
+                        elif current_date < earliest_date:
+                            earliest_date = current_date
+                            earliest_date_str = join_date
+                    except ValueError:
+                        continue
             
             return earliest_date_str if earliest_date else None
             
@@ -185,71 +151,21 @@ class StudentEditView:
     def _get_payment_display_status(self):
         """Get the display status for payment using current rules
         """
-        student_groups = self.student.get('groups', [])
-        student_id = self.student.get('id', '')
-
-        payments = self.student.get('payments', [])
-        amount_paid = 0.0
-        for payment in payments:
-            try:
-                amount = payment.get('amount', 0)
-                if isinstance(amount, str):
-                    amount = float(amount) if amount.strip() else 0
-                elif isinstance(amount, (int, float)):
-                    amount = float(amount)
-                else:
-                    amount = 0
-                amount_paid += amount
-            except (ValueError, AttributeError):
-                continue
-
-        payment_calculator = PaymentCalculator()
-
         try:
-            total_owed_until_now = payment_calculator.get_student_payment_amount_until_now(student_id) if student_id else 0
-            total_course_payment = 0
-            groups_with_dates = payment_calculator.get_student_groups_with_join_dates(student_id)
-            latest_end_date = None
-            from datetime import datetime
-            for g in groups_with_dates:
-                end = g.get("end_date")
-                if end:
-                    try:
-                        dt = datetime.strptime(end, "%d/%m/%Y")
-                        if latest_end_date is None or dt > latest_end_date:
-                            latest_end_date = dt
-                    except Exception:
-                        continue
-
-            if latest_end_date:
-                periods = payment_calculator.create_discount_periods_for_student(student_id, latest_end_date)
-                for period in periods:
-                    pr = payment_calculator.calculate_period_payment_with_discount_rules(student_id, period)
-                    if pr.get("success"):
-                        total_course_payment += pr.get("total_payment", 0)
-
-            if total_course_payment and amount_paid >= total_course_payment:
-                if amount_paid == total_course_payment:
-                    return "שולם במלואו", ft.Colors.GREEN_600
-                else:
-                    return "שילם יותר (זיכוי)", ft.Colors.GREEN_600
-            else:
-                try:
-                    total_owed_until_now = float(total_owed_until_now)
-                except Exception:
-                    total_owed_until_now = 0
-
-                if amount_paid >= total_owed_until_now and total_owed_until_now > 0:
-                    return "שולם חלקית", ft.Colors.ORANGE_600
-                elif amount_paid < total_owed_until_now:
-                    return "חוב", ft.Colors.RED_600
-                else:
-                    return "לא ידוע", ft.Colors.GREY_600
-
+            status = PaymentStatusEngine().compute(self.student)["status"]
         except Exception as e:
             print(f"Error calculating payment status: {e}")
             return self.student.get('payment_status', 'לא ידוע'), ft.Colors.GREY_600
 
+        if status in ("שולם במלואו", "שילם יותר (זיכוי)"):
+            return status, ft.Colors.GREEN_600
+        elif status == "שולם חלקית":
+            return status, ft.Colors.ORANGE_600
+        elif status == "חוב":
+            return status, ft.Colors.RED_600
+        else:
+            return status, ft.Colors.GREY_600
+
     def _create_payment_status_display(self):
         """Create payment status display (read-only)"""
         status_text, status_color = self._get_payment_display_status()
@@ -512,47 +428,13 @@ class StudentEditView:
         return False, "תאריך לא קיים (בדקי יום/חודש/שנה)"
 
 
-    def _update_joining_dates(self, student_id: str, name: str, join_date: str):
-        """Update joining_dates.json with the new date only for the current group"""
-        try:
-            data_dir = ManageJSON.get_appdata_path() / "data"
-            joining_dates_file = data_dir / "joining_dates.json"
-
-            if joining_dates_file.exists():
-                with open(joining_dates_file, "r", encoding="utf-8") as f:
-                    joining_dates = json.load(f)
-            else:
-                joining_dates = {}
-
-            if not self.group_id:
-                print("No group_id provided, skipping update.")
-                return
-
-            if self.group_id not in joining_dates:
-                joining_dates[self.group_id] = []
-
-            student_exists = False
-            for student in joining_dates[self.group_id]:
-                if student.get("student_id") == student_id:
-                    student["student_name"] = name
-                    student["join_date"] = join_date
-                    student_exists = True
-                    break
-
-            if not student_exists:
-                joining_dates[self.group_id].append({
-                    "student_id": student_id,
-                    "student_name": name,
-                    "join_date": join_date
-                })
-
-            with open(joining_dates_file, "w", encoding="utf-8") as f:
-                json.dump(joining_dates, f, ensure_ascii=False, indent=2)
-
-            print(f"Successfully updated joining date for student {student_id} in group {self.group_id}")
+    def _update_joining_dates(self, student_id: str, name: str, join_date: str, tx):
+        """Stage the new date in joining_dates.json, only for the current group"""
+        if not self.group_id:
+            print("No group_id provided, skipping update.")
+            return
 
-        except Exception as e:
-            print(f"Error updating joining_dates for student {student_id}: {e}")
+        DataStore.instance().set_join_date(self.group_id, student_id, name, join_date, tx=tx)
 
     def _save_student(self, e):
         """Save student changes with validation and loading state"""
@@ -588,20 +470,12 @@ class StudentEditView:
             self._show_field_error(self.join_date_field, date_result)
             return
 
-        self._update_joining_dates(
-            student_id=self.student['id'],
-            name=form_data["name"],
-            join_date=date_result
+        earliest_join_date = self._get_earliest_join_date_from_joining_dates(
+            self.student['id'], pending=(self.group_id, date_result) if self.group_id else None
         )
-
-        earliest_join_date = self._get_earliest_join_date_from_joining_dates(self.student['id'])
         
-        students_file = ManageJSON.get_appdata_path() / "data" / "students.json"
-        students_data = []
-        if students_file.exists():
-            with open(students_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                students_data = data.get("students", [])
+        store = DataStore.instance()
+        students_data = store.load_students(copy=True)
 
         for student in students_data:
             if isinstance(student, dict) and student.get("id") == self.student["id"]:
@@ -617,8 +491,22 @@ class StudentEditView:
                     student["join_date"] = date_result
                 break
 
-        with open(students_file, "w", encoding="utf-8") as f:
-            json.dump({"students": students_data}, f, ensure_ascii=False, indent=2)
+        # The join date and the student are saved together, or not at all
+        try:
+            with store.transaction() as tx:
+                self._update_joining_dates(
+                    student_id=self.student['id'],
+                    name=form_data["name"],
+                    join_date=date_result,
+                    tx=tx
+                )
+                tx.write(store.students_file, {"students": students_data},
+                         change=DataChange(STUDENTS_CHANGED, UPDATED, student_ids=[self.student["id"]]))
+        except Exception as e:
+            print(f"Error saving student {self.student['id']}: {e}")
+            self._set_loading_state(False)
+            self.dialog.show_error("שגיאה בשמירת התלמידה")
+            return
 
         self._set_loading_state(False)
         self._show_success_message()
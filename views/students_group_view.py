@@ -1,22 +1,29 @@
 import flet as ft
 from components.modern_card import ModernCard
 from components.clean_button import CleanButton
+from utils.payment_utils import PaymentCalculator
+from utils.background_tasks import BackgroundTasks
 
 class StudentsGroupView:
     """View for displaying students list"""
     
+    STATUS_CHUNK_SIZE = 8
+    
     def __init__(self, parent):
         self.parent = parent
         self.page = parent.page
         self.group_name = parent.group_name
         self.data_manager = parent.data_manager
+        self.payment_calculator = PaymentCalculator()
+        self.status_controls = {}
 
     def render(self):
         """Render the students list view"""
         header = self._create_header()
         self.parent.layout.controls.append(header)
         
-        students = self.data_manager.get_students_by_group(self.group_name)
+        self.status_controls = {}
+        students = self.data_manager.get_students_by_group(self.group_name, with_status=False)
         
         if not students:
             self._render_empty_state()
@@ -27,6 +34,9 @@ class StudentsGroupView:
         self.parent.layout.controls.append(actions)
         
         self.page.update()
+        
+        if students:
+            self._load_payment_statuses(students)
 
     def _create_header(self):
         """Create page header"""
@@ -79,6 +89,9 @@ class StudentsGroupView:
         )
         self.parent.layout.controls.append(count_text)
         
+        self.progress_bar = ft.ProgressBar(value=0, color=ft.Colors.BLUE_600, bgcolor=ft.Colors.GREY_200)
+        self.parent.layout.controls.append(self.progress_bar)
+        
         students_grid = ft.Container(
             content=ft.Column([
                 ft.ResponsiveRow([
@@ -95,13 +108,11 @@ class StudentsGroupView:
     def _is_student_in_multiple_groups(self, student_id):
         """Check if student is in multiple groups"""
         try:
-            all_students = self.data_manager.get_all_students()
+            student = self.data_manager.store.students_by_id().get(student_id)
             
-            if all_students:
-                for student in all_students:
-                    if isinstance(student, dict) and student.get('id') == student_id:
-                        student_groups = self._get_student_groups(student)
-                        return len(student_groups) > 1
+            if isinstance(student, dict):
+                student_groups = self._get_student_groups(student)
+                return len(student_groups) > 1
             return False
             
         except Exception as e:
@@ -118,81 +129,36 @@ class StudentsGroupView:
         else:
             return []
 
-    def _get_payment_display_status(self, student):
-        """Get payment status for display with 'paid until now' logic"""
-        from utils.payment_utils import PaymentCalculator        
-        payment_calculator = PaymentCalculator()
-
-        payments = student.get('payments', [])
-        total_paid = 0.0
-        for payment in payments:
-            try:
-                amount = payment.get('amount', 0)
-                if isinstance(amount, str):
-                    amount = float(amount) if amount.strip() else 0
-                elif isinstance(amount, (int, float)):
-                    amount = float(amount)
-                else:
-                    amount = 0
-                total_paid += amount
-            except (ValueError, AttributeError):
-                continue
-
-        student_id = student.get('id', '')
-        if student_id:
-            total_owed_until_now = payment_calculator.get_student_payment_amount_until_now(student_id)
-        else:
-            student_groups = student.get('groups', [])
-            total_owed_until_now = 0
-            for group_name in student_groups:
-                group_id = payment_calculator.get_group_id_by_name(group_name)
-                if group_id:
-                    join_date = payment_calculator.get_student_join_date_for_group(student_id, group_id)
-                    if join_date:
-                        group_payment = payment_calculator.get_payment_amount_until_now(group_id, join_date)
-                        total_owed_until_now += group_payment
-
-        total_course_payment = 0
-        try:
-            groups_with_dates = payment_calculator.get_student_groups_with_join_dates(student_id)
-            latest_end_date = None
-            from datetime import datetime
-            for g in groups_with_dates:
-                end = g.get("end_date")
-                if end:
-                    try:
-                        dt = datetime.strptime(end, "%d/%m/%Y")
-                        if latest_end_date is None or dt > latest_end_date:
-                            latest_end_date = dt
-                    except Exception:
-                        continue
-
-            if latest_end_date:
-                periods = payment_calculator.create_discount_periods_for_student(student_id, latest_end_date)
-                for period in periods:
-                    pr = payment_calculator.calculate_period_payment_with_discount_rules(student_id, period)
-                    if pr.get("success"):
-                        total_course_payment += pr.get("total_payment", 0)
-        except Exception:
-            total_course_payment = 0
-
-        try:
-            total_owed_until_now = float(total_owed_until_now)
-        except Exception:
-            total_owed_until_now = 0
-
-        if total_course_payment and total_paid >= total_course_payment:
-            if total_paid == total_course_payment:
-                return "שולם במלואו"
-            else:
-                return "שילם יותר (זיכוי)"
-        else:
-            if total_paid >= total_owed_until_now and total_owed_until_now > 0:
-                return "שולם חלקית"
-            else:
-                return "חוב"
-
-
+    def _load_payment_statuses(self, students):
+        """Compute payment statuses in the background, filling in the cards chunk by chunk"""
+        size = self.STATUS_CHUNK_SIZE
+        chunks = [students[i:i + size] for i in range(0, len(students), size)]
+        
+        def show_statuses(chunk, statuses):
+            for student in chunk:
+                controls = self.status_controls.get(student.get('id'))
+                status = statuses.get(student.get('id'))
+                if controls and status:
+                    status_dot, status_text = controls
+                    status_text.value = status
+                    status_dot.bgcolor = self._get_payment_status_color(status)
+        
+        def show_progress(done, total):
+            self.progress_bar.value = done / total
+            self.page.update()
+        
+        def hide_progress():
+            self.progress_bar.visible = False
+            self.page.update()
+        
+        BackgroundTasks.instance().run_many(
+            "students_group_statuses",
+            chunks,
+            self.data_manager.payment_statuses,
+            on_result=show_statuses,
+            on_progress=show_progress,
+            on_complete=hide_progress
+        )
 
     def _create_student_card(self, student):
         """Create a student card"""
@@ -213,15 +179,19 @@ class StudentsGroupView:
             alignment=ft.alignment.center,
         )
         
-        display_payment_status = self._get_payment_display_status(student)
-        status_color = self._get_payment_status_color(display_payment_status)
-        
         status_dot = ft.Container(
             width=8,
             height=8,
-            bgcolor=status_color,
+            bgcolor=ft.Colors.GREY_400,
             border_radius=4
         )
+        status_text = ft.Text(
+            "מחשב סטטוס...", 
+            size=12,
+            color=ft.Colors.GREY_600,
+            overflow=ft.TextOverflow.ELLIPSIS
+        )
+        self.status_controls[student['id']] = (status_dot, status_text)
         
         name_controls = [
             ft.Text(
@@ -252,12 +222,7 @@ class StudentsGroupView:
                     name_row,
                     ft.Row([
                         status_dot,
-                        ft.Text(
-                            display_payment_status, 
-                            size=12,
-                            color=ft.Colors.GREY_600,
-                            overflow=ft.TextOverflow.ELLIPSIS
-                        )
+                        status_text
                     ], spacing=6)
                 ], spacing=2, expand=True)
             ], spacing=12),
@@ -277,12 +242,10 @@ class StudentsGroupView:
 
     def _create_contact_info(self, student):
         """Create contact information section"""
-        from utils.payment_utils import PaymentCalculator
-        
         display_join_date = student.get('join_date', 'לא ידוע') 
         
         try:
-            payment_calculator = PaymentCalculator()
+            payment_calculator = self.payment_calculator
             group_id = payment_calculator.get_group_id_by_name(self.group_name)
             student_id = student.get('id', '')
             
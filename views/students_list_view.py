@@ -2,6 +2,9 @@ import flet as ft
 from components.stats_cards import StatsCards
 from components.students_table import StudentsTable
 from components.no_results_dialog import NoResultsDialog
+from utils.data_events import (
+    GROUPS_CHANGED, JOINING_DATES_CHANGED, PAYMENTS_CHANGED, PRICING_CHANGED, STUDENTS_CHANGED, UPDATED,
+)
 
 
 class StudentsListView:
@@ -16,10 +19,16 @@ class StudentsListView:
         self.search_field = None  
         self.stats_container = None 
         self.table_container = None  
+        self.students_table_container = None
         
         self.current_students = []
         self.filtered_students = []
         
+        self.data_manager.store.events().subscribe(
+            [STUDENTS_CHANGED, PAYMENTS_CHANGED, GROUPS_CHANGED, PRICING_CHANGED, JOINING_DATES_CHANGED],
+            self.on_data_changed
+        )
+        
     def create_header(self) -> ft.Container:
         """Create page header"""
         return ft.Container(
@@ -45,7 +54,7 @@ class StudentsListView:
     def create_search_section(self) -> ft.Container:
         """Create search section"""
         self.search_field = ft.TextField(
-            hint_text="חיפוש לפי שם, קבוצה, טלפון או כל פרט אחר...",
+            hint_text="חיפוש לפי שם, ת.ז, טלפון, שם הורה או קבוצה...",
             hint_style=ft.TextStyle(color=ft.Colors.GREY_400),
             text_size=14,
             height=50,
@@ -120,7 +129,9 @@ class StudentsListView:
             self.table_container = self.create_empty_state()
         else:
             self.students_table.update(self.filtered_students)
-            self.table_container = self.students_table.get_container()
+            if self.students_table_container is None:
+                self.students_table_container = self.students_table.get_container()
+            self.table_container = self.students_table_container
         
         return self.table_container
     
@@ -159,7 +170,7 @@ class StudentsListView:
         query = e.control.value.strip() if e and e.control and e.control.value else ""
         
         if not query:
-            self.filtered_students = self.current_students.copy()
+            self.filtered_students = self.current_students
         else:
             self.filtered_students = self.data_manager.filter_students(self.current_students, query)
             
@@ -180,13 +191,51 @@ class StudentsListView:
         self.page.snack_bar.open = True
         self.page.update()
     
+    def on_data_changed(self, change):
+        """Patch the rows of changed students, or reload the list when the set of students changed"""
+        try:
+            # Payments and join dates only change the status column of the students named
+            rows_only = change.topic in (PAYMENTS_CHANGED, JOINING_DATES_CHANGED) or \
+                (change.topic == STUDENTS_CHANGED and change.action == UPDATED)
+            if rows_only and change.student_ids is not None:
+                self.patch_students(change.student_ids)
+            else:
+                self.reload_data()
+        except Exception as e:
+            print(f"Error applying data change to students list: {e}")
+
+    def patch_students(self, student_ids):
+        """Refresh the given students in place, keeping the search and scroll position"""
+        self.current_students = self.data_manager.load_students()
+        if self.search_field and self.search_field.value:
+            students_by_id = self.data_manager.store.students_by_id()
+            self.filtered_students = [students_by_id.get(s.get("id"), s) for s in self.filtered_students]
+        else:
+            self.filtered_students = self.current_students
+        
+        if self.table_container is self.students_table_container and self.filtered_students:
+            self.students_table.patch_rows(self.filtered_students, student_ids)
+        
+        if self.stats_container:
+            stats = self.data_manager.get_students_stats(self.filtered_students)
+            self.stats_container.content = StatsCards.create_stats_row(stats)
+        self.page.update()
+
+    def reload_data(self):
+        """Reload the students and re-apply the current search"""
+        self.load_data()
+        query = self.search_field.value.strip() if self.search_field and self.search_field.value else ""
+        if query:
+            self.filtered_students = self.data_manager.filter_students(self.current_students, query)
+        self.update_components()
+
     def clear_search(self, e=None):
         """Clear search and show all students"""
         if self.search_field:
             self.search_field.value = ""
             self.search_field.update()
         
-        self.filtered_students = self.current_students.copy()
+        self.filtered_students = self.current_students
         self.update_components()
     
     def update_components(self):
@@ -194,22 +243,26 @@ class StudentsListView:
         if self.stats_container:
             stats = self.data_manager.get_students_stats(self.filtered_students)
             self.stats_container.content = StatsCards.create_stats_row(stats)
-            self.stats_container.update()
         
         if self.table_container:
-            for i, control in enumerate(self.parent.layout.controls):
-                if control == self.table_container:
-                    new_table = self.create_table_section()
-                    self.parent.layout.controls[i] = new_table
-                    self.table_container = new_table
-                    break
+            if self.filtered_students and self.table_container is self.students_table_container:
+                # Same table, new rows: only the first page is rebuilt
+                self.students_table.update(self.filtered_students)
+                self.students_table.list_view.scroll_to(offset=0, duration=0)
+            else:
+                for i, control in enumerate(self.parent.layout.controls):
+                    if control == self.table_container:
+                        new_table = self.create_table_section()
+                        self.parent.layout.controls[i] = new_table
+                        self.table_container = new_table
+                        break
         
         self.page.update()
     
     def load_data(self):
         """Load students data"""
         self.current_students = self.data_manager.load_students()
-        self.filtered_students = self.current_students.copy()
+        self.filtered_students = self.current_students
     
     def render(self):
         """Render the complete view"""